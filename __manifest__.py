@@ -1,6 +1,6 @@
 {
     'name': 'Employee Productivity Tracker',
-    'version': '18.0.1.0.0',
+    'version': '18.0.1.6.0',
     'category': 'Human Resources',
     'summary': 'Real-time employee productivity tracking with task timers and activity monitoring',
     'description': '''
@@ -14,9 +14,10 @@
     ''',
     'author': 'Your Company',
     'website': 'https://yourcompany.com',
-    'depends': ['base', 'hr', 'web'],
+    'depends': ['base', 'hr', 'web', 'bus'],
     'data': [
         'security/ir.model.access.csv',
+        'data/ir_cron_data.xml',
         'views/productivity_task_views.xml',
         # 'views/screenshot_log_views.xml',  # Screenshot functionality removed
         'views/activity_log_views.xml',
@@ -28,9 +29,11 @@
     ],
     'assets': {
         'web.assets_backend': [
+            'employee_productivity_tracker/static/src/js/event_transport.js',
             'employee_productivity_tracker/static/src/js/timer_widget.js',
             'employee_productivity_tracker/static/src/js/timer_widget.xml',
             'employee_productivity_tracker/static/src/js/activity_monitor.js',
+            'employee_productivity_tracker/static/src/js/scheduled_timer_service.js',
             'employee_productivity_tracker/static/src/css/timer_widget.css',
             'employee_productivity_tracker/static/src/css/timer_popup.css',
             'employee_productivity_tracker/static/src/css/styles.css',
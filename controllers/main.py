@@ -1,7 +1,66 @@
 from odoo import http, fields
-from odoo.http import request
+from odoo.http import request, Response
+from datetime import date, datetime, timedelta
+from werkzeug.wsgi import wrap_file
 import base64
+import csv
+import io
 import json
+import tempfile
+import zlib
+
+EXPORT_CHUNK_SIZE = 2000
+CSV_CHUNK_SIZE = 64 * 1024
+XLSX_MAX_ROWS = 1048576
+
+CHANGE_FEED_MODELS = ('productivity.task', 'activity.log', 'app.usage.log')
+CHANGE_FEED_MAX_LIMIT = 50000
+CHANGE_FEED_SETTLE_SECONDS = 300
+
+# (sheet title, headers, keyset-paginated query) of each export section
+EXPORT_SHEETS = [
+    ('Productivity Report',
+     ['Employee', 'Task Name', 'Start Time', 'Stop Time', 'State', 'Working Hours', 'Paused Hours'],
+     """
+        SELECT t.id, e.name, t.name, t.start_time, t.stop_time, t.state,
+               t.total_working_time, t.total_paused_time
+        FROM productivity_task t
+        JOIN hr_employee e ON e.id = t.employee_id
+        WHERE t.employee_id = ANY(%(employee_ids)s)
+        AND t.work_date BETWEEN %(date_from)s AND %(date_to)s
+        AND t.id > %(last_id)s
+        ORDER BY t.id
+        LIMIT %(limit)s
+     """),
+    ('App Usage',
+     ['Employee', 'Task Name', 'Application', 'Category', 'Start Time', 'End Time', 'Duration (Minutes)', 'Restricted'],
+     """
+        SELECT a.id, e.name, t.name, a.app_name, a.app_category, a.start_time, a.end_time,
+               a.duration, a.is_restricted
+        FROM app_usage_log a
+        JOIN hr_employee e ON e.id = a.employee_id
+        JOIN productivity_task t ON t.id = a.task_id
+        WHERE a.employee_id = ANY(%(employee_ids)s)
+        AND a.work_date BETWEEN %(date_from)s AND %(date_to)s
+        AND a.id > %(last_id)s
+        ORDER BY a.id
+        LIMIT %(limit)s
+     """),
+    ('Activity',
+     ['Employee', 'Task Name', 'Activity Type', 'Start Time', 'End Time', 'Duration (Minutes)', 'Description'],
+     """
+        SELECT l.id, e.name, t.name, l.activity_type, l.start_time, l.end_time,
+               l.duration, l.description
+        FROM activity_log l
+        JOIN hr_employee e ON e.id = l.employee_id
+        JOIN productivity_task t ON t.id = l.task_id
+        WHERE l.employee_id = ANY(%(employee_ids)s)
+        AND l.work_date BETWEEN %(date_from)s AND %(date_to)s
+        AND l.id > %(last_id)s
+        ORDER BY l.id
+        LIMIT %(limit)s
+     """),
+]
 
 
 class ProductivityTrackerController(http.Controller):
@@ -14,9 +73,7 @@ class ProductivityTrackerController(http.Controller):
             task_name = kwargs.get('task_name', 'Unnamed Task')
             description = kwargs.get('description', '')
             
-            employee = request.env['hr.employee'].search([
-                ('user_id', '=', request.env.user.id)
-            ], limit=1)
+            employee = request.env['hr.employee'].get_productivity_employee()
             
             if not employee:
                 return {'status': 'error', 'message': 'Employee not found'}
@@ -79,6 +136,31 @@ class ProductivityTrackerController(http.Controller):
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
 
+    @http.route('/api/productivity/tasks/transition', type='json', auth='user', methods=['POST'])
+    def transition_tasks(self, **kwargs):
+        """Start, stop, pause or resume many tasks in one call"""
+        try:
+            actions = {
+                'start': 'action_start_timer',
+                'stop': 'action_stop_timer',
+                'pause': 'action_pause_timer',
+                'resume': 'action_resume_timer',
+            }
+            action = kwargs.get('action')
+            if action not in actions:
+                return {'status': 'error', 'message': f'Unknown action: {action}'}
+
+            tasks = request.env['productivity.task'].browse(kwargs.get('task_ids') or []).exists()
+            getattr(tasks, actions[action])()
+
+            # The full timer state lets the caller update its view without reading the tasks again
+            return {
+                'status': 'success',
+                'tasks': [dict(task._get_timer_state(action), id=task.id) for task in tasks],
+            }
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}
+
     # Screenshot functionality removed
     # @http.route('/api/productivity/upload_screenshot', type='json', auth='user', methods=['POST'])
     # def upload_screenshot(self, **kwargs):
@@ -139,6 +221,24 @@ class ProductivityTrackerController(http.Controller):
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
 
+    @http.route('/api/productivity/ingest', type='json', auth='user', methods=['POST'])
+    def ingest(self, **kwargs):
+        """Apply a batch of app usage, activity and pause/resume events in one transaction"""
+        try:
+            events = kwargs.get('events') or []
+            if not isinstance(events, list):
+                return {'status': 'error', 'message': 'events must be a list'}
+
+            results = request.env['productivity.ingest'].ingest_events(events)
+
+            return {
+                'status': 'success',
+                'results': results,
+                'message': f'{len(events)} events processed'
+            }
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}
+
     @http.route('/api/productivity/end_app_usage/<int:app_usage_id>', type='json', auth='user', methods=['POST'])
     def end_app_usage(self, app_usage_id, **kwargs):
         """End app usage logging"""
@@ -160,13 +260,8 @@ class ProductivityTrackerController(http.Controller):
         try:
             app_names = kwargs.get('app_names', [])
             
-            config = request.env['productivity.config'].get_config()
-            restricted_apps = config.get_restricted_apps_list()
-            
-            detected_restricted = []
-            for app in app_names:
-                if any(restricted in app.lower() for restricted in [r.lower() for r in restricted_apps]):
-                    detected_restricted.append(app)
+            classifier = request.env['productivity.config']._get_app_classifier()
+            detected_restricted = [app for app in app_names if classifier.is_restricted(app)]
             
             return {
                 'status': 'success',
@@ -180,37 +275,69 @@ class ProductivityTrackerController(http.Controller):
     def get_task_summary(self, task_id, **kwargs):
         """Get task summary"""
         try:
-            task = request.env['productivity.task'].browse(task_id)
+            # A single row read: the log counts are stored on the task
+            task = request.env['productivity.task'].browse(task_id).read([
+                'name', 'state', 'total_working_time', 'total_paused_time', 'activity_count',
+                'app_usage_count', 'restricted_app_minutes', 'last_activity_time',
+            ])
+            if not task:
+                return {'status': 'error', 'message': 'Task not found'}
+            task = task[0]
             
             return {
                 'status': 'success',
-                'task_id': task.id,
-                'name': task.name,
-                'state': task.state,
-                'total_working_time': task.total_working_time,
-                'total_paused_time': task.total_paused_time,
+                'task_id': task['id'],
+                'name': task['name'],
+                'state': task['state'],
+                'total_working_time': task['total_working_time'],
+                'total_paused_time': task['total_paused_time'],
                 # 'screenshots_count': len(task.screenshot_ids),  # Screenshot functionality removed
-                'activities_count': len(task.activity_log_ids),
-                'app_usages_count': len(task.app_usage_ids),
+                'activities_count': task['activity_count'],
+                'app_usages_count': task['app_usage_count'],
+                'restricted_app_minutes': task['restricted_app_minutes'],
+                'last_activity_time': fields.Datetime.to_string(task['last_activity_time']),
             }
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
 
+    @http.route('/api/productivity/app_analytics', type='json', auth='user')
+    def app_analytics(self, **kwargs):
+        """App usage analytics (top apps, categories, histogram) of employees, departments or the company"""
+        try:
+            date_from = kwargs.get('date_from')
+            date_to = kwargs.get('date_to')
+            if not date_from or not date_to:
+                return {'status': 'error', 'message': 'Date range required'}
+
+            employee_ids = list(kwargs.get('employee_ids') or [])
+            if kwargs.get('employee_id'):
+                employee_ids.append(kwargs['employee_id'])
+            department_ids = list(kwargs.get('department_ids') or [])
+            if kwargs.get('department_id'):
+                department_ids.append(kwargs['department_id'])
+
+            analytics = request.env['app.usage.log'].get_app_usage_analytics(
+                date_from, date_to,
+                employee_ids=[int(i) for i in employee_ids],
+                department_ids=[int(i) for i in department_ids],
+                top_n=kwargs.get('top_n', 10),
+                bucket=kwargs.get('bucket') or 'day',
+                max_rows=kwargs.get('max_rows'),
+            )
+            return dict(analytics, status='success')
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}
+
     @http.route('/api/productivity/get_employee_active_task', type='json', auth='user')
     def get_employee_active_task(self, **kwargs):
         """Get currently active task for employee"""
         try:
-            employee = request.env['hr.employee'].search([
-                ('user_id', '=', request.env.user.id)
-            ], limit=1)
+            employee = request.env['hr.employee'].get_productivity_employee()
             
             if not employee:
                 return {'status': 'error', 'message': 'Employee not found'}
             
-            active_task = request.env['productivity.task'].search([
-                ('employee_id', '=', employee.id),
-                ('state', 'in', ['running', 'paused']),
-            ], limit=1)
+            active_task = request.env['productivity.task'].get_employee_active_task(employee)
             
             if active_task:
                 return {
@@ -225,14 +352,39 @@ class ProductivityTrackerController(http.Controller):
         except Exception as e:
             return {'status': 'error', 'message': str(e)}
 
+    @http.route('/api/productivity/away_interval', type='json', auth='user', methods=['POST'])
+    def away_interval(self, **kwargs):
+        """Record a period away from Odoo: pause, away app usage and resume in one transaction"""
+        try:
+            task_id = kwargs.get('task_id')
+            if not task_id:
+                return {'status': 'error', 'message': 'Task ID required'}
+
+            task = request.env['productivity.task'].browse(task_id)
+            if not task.exists():
+                return {'status': 'error', 'message': 'Task not found'}
+
+            ingest = request.env['productivity.ingest']
+            if kwargs.get('client_event_id') and ingest._find_client_events(
+                    'app.usage.log', [kwargs['client_event_id']]):
+                return {'status': 'duplicate', 'state': task.state}
+
+            return task.record_away_interval(
+                ingest._parse_timestamp(kwargs.get('away_start')),
+                ingest._parse_timestamp(kwargs.get('away_end')),
+                application_name=kwargs.get('application_name'),
+                client_event_id=kwargs.get('client_event_id'),
+            )
+        except Exception as e:
+            return {'status': 'error', 'message': str(e)}
+
     @http.route('/api/productivity/log_away_time', type='json', auth='user', methods=['POST'])
     def log_away_time(self, **kwargs):
-        """Log time spent away from Odoo"""
+        """Log time spent away from Odoo (kept for older clients, see /api/productivity/away_interval)"""
         try:
             task_id = kwargs.get('task_id')
             away_start = kwargs.get('away_start')
             away_end = kwargs.get('away_end')
-            duration_seconds = kwargs.get('duration_seconds')
             application_name = kwargs.get('application_name', 'Unknown Application')
 
             if not task_id:
@@ -242,33 +394,14 @@ class ProductivityTrackerController(http.Controller):
             if not task.exists():
                 return {'status': 'error', 'message': 'Task not found'}
 
-            # Create activity log for away time
-            request.env['activity.log'].create({
-                'task_id': task_id,
-                'employee_id': task.employee_id.id,
-                'activity_type': 'away',
-                'start_time': away_start,
-                'end_time': away_end,
-                'duration': duration_seconds / 3600.0,  # Convert to hours
-                'description': f'User was away from Odoo on {application_name}',
-                'app_name': application_name,
-            })
-
-            # Also log as app usage
-            request.env['app.usage.log'].create({
-                'task_id': task_id,
-                'employee_id': task.employee_id.id,
-                'app_name': application_name,
-                'app_path': 'External Application',
-                'window_title': f'Away from Odoo - {application_name}',
-                'start_time': away_start,
-                'end_time': away_end,
-                'duration': duration_seconds / 3600.0,
-                'is_restricted': True,  # Mark as restricted since user left Odoo
-            })
+            ingest = request.env['productivity.ingest']
+            away_start = ingest._parse_timestamp(away_start)
+            away_end = ingest._parse_timestamp(away_end)
+            result = task.record_away_interval(away_start, away_end, application_name=application_name)
+            duration_seconds = (away_end - away_start).total_seconds()
 
             return {
-                'status': 'success',
+                'status': result['status'],
                 'message': f'Logged {duration_seconds}s away time',
                 'duration': duration_seconds
             }
@@ -276,37 +409,39 @@ class ProductivityTrackerController(http.Controller):
             return {'status': 'error', 'message': str(e)}
 
     @http.route('/web/productivity/export_report', type='http', auth='user')
-    def export_productivity_report(self, employee_id, date_from, date_to, **kwargs):
-        """Export productivity report to Excel"""
+    def export_productivity_report(self, date_from, date_to, employee_id=None, employee_ids=None,
+                                   department_ids=None, export_format=None, **kwargs):
+        """Export productivity report to Excel, streamed so any range and number of employees fits in memory
+
+        Employees are selected with ``employee_id``, ``employee_ids`` and/or
+        ``department_ids`` (comma-separated ids); without any, every
+        employee the user can read is exported. ``export_format=csv``
+        forces CSV.
+        """
         try:
-            import io
-            from datetime import datetime
-            
             # Try to import xlsxwriter, fallback to CSV if not available
             try:
                 import xlsxwriter
-                has_xlsx = True
+                has_xlsx = export_format != 'csv'
             except ImportError:
                 has_xlsx = False
             
-            employee = request.env['hr.employee'].browse(int(employee_id))
-            date_from_dt = datetime.strptime(date_from, '%Y-%m-%d').date()
-            date_to_dt = datetime.strptime(date_to, '%Y-%m-%d').date()
+            employees = self._get_export_employees(employee_id, employee_ids, department_ids)
+            params = {
+                'employee_ids': employees.ids,
+                'date_from': datetime.strptime(date_from, '%Y-%m-%d').date(),
+                'date_to': datetime.strptime(date_to, '%Y-%m-%d').date(),
+            }
+            for model_name in ('productivity.task', 'app.usage.log', 'activity.log'):
+                request.env[model_name].flush_model()
             
-            # Get tasks in date range
-            tasks = request.env['productivity.task'].search([
-                ('employee_id', '=', employee.id),
-                ('start_time', '>=', fields.Datetime.to_string(datetime.combine(date_from_dt, datetime.min.time()))),
-                ('start_time', '<=', fields.Datetime.to_string(datetime.combine(date_to_dt, datetime.max.time()))),
-            ])
+            name = employees.name if len(employees) == 1 else 'employees'
+            filename = f'productivity_report_{name}_{date_from}_{date_to}'
             
             if has_xlsx:
-                # Create Excel file
-                output = io.BytesIO()
-                workbook = xlsxwriter.Workbook(output)
-                worksheet = workbook.add_worksheet('Productivity Report')
-                
-                # Formats
+                # Rows are written to temporary files as they are read, then the file is streamed
+                output = tempfile.TemporaryFile()
+                workbook = xlsxwriter.Workbook(output, {'constant_memory': True})
                 header_format = workbook.add_format({
                     'bold': True,
                     'bg_color': '#4472C4',
@@ -314,90 +449,47 @@ class ProductivityTrackerController(http.Controller):
                     'border': 1
                 })
                 
-                # Write headers
-                headers = ['Task Name', 'Start Time', 'Stop Time', 'State', 
-                          'Working Hours', 'Paused Hours']  # Screenshot columns removed
-                
-                for col, header in enumerate(headers):
-                    worksheet.write(0, col, header, header_format)
-                
-                # Write data
-                row = 1
-                for task in tasks:
-                    # productive_ss = len(task.screenshot_ids.filtered(lambda s: s.is_productive))  # Screenshot functionality removed
-                    # unproductive_ss = len(task.screenshot_ids.filtered(lambda s: not s.is_productive))  # Screenshot functionality removed
-                    
-                    worksheet.write(row, 0, task.name or '')
-                    worksheet.write(row, 1, str(task.start_time) if task.start_time else '')
-                    worksheet.write(row, 2, str(task.stop_time) if task.stop_time else '')
-                    worksheet.write(row, 3, task.state or '')
-                    worksheet.write(row, 4, round(task.total_working_time, 2))
-                    worksheet.write(row, 5, round(task.total_paused_time, 2))
-                    # worksheet.write(row, 6, len(task.screenshot_ids))  # Screenshot functionality removed
-                    # worksheet.write(row, 7, productive_ss)  # Screenshot functionality removed
-                    # worksheet.write(row, 8, unproductive_ss)  # Screenshot functionality removed
-                    row += 1
+                for title, headers, query in EXPORT_SHEETS:
+                    worksheet = workbook.add_worksheet(title)
+                    worksheet.write_row(0, 0, headers, header_format)
+                    row, part = 1, 1
+                    for values in self._iter_export_rows(request.env.cr, query, params):
+                        if row >= XLSX_MAX_ROWS:
+                            # Continue on a new sheet when one is full
+                            part += 1
+                            worksheet = workbook.add_worksheet(f'{title} ({part})')
+                            worksheet.write_row(0, 0, headers, header_format)
+                            row = 1
+                        worksheet.write_row(row, 0, values)
+                        row += 1
                 
                 # Add summary section
-                row += 2
-                worksheet.write(row, 0, 'SUMMARY', header_format)
-                row += 1
-                worksheet.write(row, 0, 'Total Tasks:')
-                worksheet.write(row, 1, len(tasks))
-                row += 1
-                worksheet.write(row, 0, 'Total Working Hours:')
-                worksheet.write(row, 1, round(sum(tasks.mapped('total_working_time')), 2))
-                row += 1
-                worksheet.write(row, 0, 'Total Paused Hours:')
-                worksheet.write(row, 1, round(sum(tasks.mapped('total_paused_time')), 2))
+                worksheet = workbook.add_worksheet('Summary')
+                worksheet.write(0, 0, 'SUMMARY', header_format)
+                for row, (label, value) in enumerate(self._get_export_summary(request.env.cr, params), start=1):
+                    worksheet.write(row, 0, label)
+                    worksheet.write(row, 1, value)
                 
                 workbook.close()
                 output.seek(0)
                 
-                filename = f'productivity_report_{employee.name}_{date_from}_{date_to}.xlsx'
-                
-                return request.make_response(
-                    output.read(),
+                return Response(
+                    wrap_file(request.httprequest.environ, output),
                     headers=[
                         ('Content-Type', 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
-                        ('Content-Disposition', f'attachment; filename={filename}'),
-                    ]
+                        ('Content-Disposition', f'attachment; filename={filename}.xlsx'),
+                    ],
+                    direct_passthrough=True,
                 )
             else:
-                # Fallback to CSV
-                import csv
-                output = io.StringIO()
-                writer = csv.writer(output)
-                
-                # Write headers
-                writer.writerow(['Task Name', 'Start Time', 'Stop Time', 'State', 
-                               'Working Hours', 'Paused Hours'])  # Screenshot columns removed
-                
-                # Write data
-                for task in tasks:
-                    # productive_ss = len(task.screenshot_ids.filtered(lambda s: s.is_productive))  # Screenshot functionality removed
-                    # unproductive_ss = len(task.screenshot_ids.filtered(lambda s: not s.is_productive))  # Screenshot functionality removed
-                    
-                    writer.writerow([
-                        task.name or '',
-                        str(task.start_time) if task.start_time else '',
-                        str(task.stop_time) if task.stop_time else '',
-                        task.state or '',
-                        round(task.total_working_time, 2),
-                        round(task.total_paused_time, 2),
-                        # len(task.screenshot_ids),  # Screenshot functionality removed
-                        # productive_ss,  # Screenshot functionality removed
-                        # unproductive_ss  # Screenshot functionality removed
-                    ])
-                
-                filename = f'productivity_report_{employee.name}_{date_from}_{date_to}.csv'
-                
-                return request.make_response(
-                    output.getvalue(),
+                # Fallback to CSV, generated chunk by chunk while it is sent
+                return Response(
+                    self._stream_csv(request.env.registry, params),
                     headers=[
                         ('Content-Type', 'text/csv'),
-                        ('Content-Disposition', f'attachment; filename={filename}'),
-                    ]
+                        ('Content-Disposition', f'attachment; filename={filename}.csv'),
+                    ],
+                    direct_passthrough=True,
                 )
                 
         except Exception as e:
@@ -405,3 +497,167 @@ class ProductivityTrackerController(http.Controller):
                 f'Error generating report: {str(e)}',
                 headers=[('Content-Type', 'text/plain')]
             )
+
+    def _get_export_employees(self, employee_id=None, employee_ids=None, department_ids=None):
+        """Employees selected for an export, limited to the ones the user can read"""
+        ids = [int(i) for i in ','.join(filter(None, [employee_id, employee_ids])).split(',') if i.strip()]
+        departments = [int(i) for i in (department_ids or '').split(',') if i.strip()]
+        domain = []
+        if ids and departments:
+            domain = ['|', ('id', 'in', ids), ('department_id', 'child_of', departments)]
+        elif ids:
+            domain = [('id', 'in', ids)]
+        elif departments:
+            domain = [('department_id', 'child_of', departments)]
+        return request.env['hr.employee'].search(domain)
+
+    def _iter_export_rows(self, cr, query, params):
+        """Yield the formatted rows of an export query, read in keyset-paginated chunks
+
+        The query selects the row id first and filters on ``%(last_id)s`` and
+        ``%(limit)s``, ordered by id.
+        """
+        last_id = 0
+        while True:
+            cr.execute(query, dict(params, last_id=last_id, limit=EXPORT_CHUNK_SIZE))
+            rows = cr.fetchall()
+            for row in rows:
+                yield [self._format_export_value(value) for value in row[1:]]
+            if len(rows) < EXPORT_CHUNK_SIZE:
+                return
+            last_id = rows[-1][0]
+
+    def _format_export_value(self, value):
+        if value is None:
+            return ''
+        if isinstance(value, float):
+            return round(value, 2)
+        if isinstance(value, (datetime, date)):
+            return str(value)
+        return value
+
+    def _get_export_summary(self, cr, params):
+        cr.execute("""
+            SELECT COUNT(*), COALESCE(SUM(total_working_time), 0), COALESCE(SUM(total_paused_time), 0)
+            FROM productivity_task
+            WHERE employee_id = ANY(%(employee_ids)s) AND work_date BETWEEN %(date_from)s AND %(date_to)s
+        """, params)
+        total_tasks, working_hours, paused_hours = cr.fetchone()
+        return [
+            ('Total Tasks:', total_tasks),
+            ('Total Working Hours:', round(working_hours, 2)),
+            ('Total Paused Hours:', round(paused_hours, 2)),
+        ]
+
+    def _stream_csv(self, registry, params):
+        """Generate the CSV export in chunks"""
+        with registry.cursor() as cr:
+            output = io.StringIO()
+            writer = csv.writer(output)
+            for title, headers, query in EXPORT_SHEETS:
+                writer.writerow([title])
+                writer.writerow(headers)
+                for values in self._iter_export_rows(cr, query, params):
+                    writer.writerow(values)
+                    if output.tell() >= CSV_CHUNK_SIZE:
+                        yield output.getvalue().encode()
+                        output.seek(0)
+                        output.truncate()
+                writer.writerow([])
+            writer.writerow(['SUMMARY'])
+            for label, value in self._get_export_summary(cr, params):
+                writer.writerow([label, value])
+            yield output.getvalue().encode()
+
+    @http.route('/api/productivity/changes', type='http', auth='user', methods=['GET'])
+    def export_changes(self, model, cursor=None, limit=None, **kwargs):
+        """Stream the records of a tracker model changed since a cursor, as gzipped NDJSON
+
+        Records are ordered by (write_date, id). The last line is
+        ``{"cursor": ..., "has_more": ...}``: pass that cursor to get the next
+        changes. Records changed in the last few minutes are held back so
+        transactions still running when the feed was read are not skipped.
+
+        The feed only carries inserted and updated records, it has no
+        tombstones. Records removed by the log retention, the rollup purges
+        or ``unlink()`` silently disappear, consumers mirroring a model must
+        reconcile deletions themselves (e.g. by a periodic id comparison).
+        """
+        try:
+            if model not in CHANGE_FEED_MODELS:
+                raise ValueError(f'Unsupported model: {model}')
+            Model = request.env[model]
+            Model.check_access('read')
+            Model.flush_model()
+            
+            after = self._decode_change_cursor(model, cursor)
+            limit = CHANGE_FEED_MAX_LIMIT if limit is None else int(limit)
+            if limit < 1:
+                raise ValueError('limit must be positive')
+            limit = min(limit, CHANGE_FEED_MAX_LIMIT)
+            columns = [
+                name for name, field in Model._fields.items()
+                if field.store and field.column_type and field.type != 'binary'
+            ]
+            settled_before = fields.Datetime.now() - timedelta(seconds=CHANGE_FEED_SETTLE_SECONDS)
+            
+            return Response(
+                self._stream_changes(request.env.registry, model, Model._table, columns, after, settled_before, limit),
+                headers=[
+                    ('Content-Type', 'application/x-ndjson'),
+                    ('Content-Encoding', 'gzip'),
+                ],
+                direct_passthrough=True,
+            )
+        except Exception as e:
+            return request.make_response(
+                json.dumps({'status': 'error', 'message': str(e)}),
+                headers=[('Content-Type', 'application/json')],
+                status=400,
+            )
+
+    def _decode_change_cursor(self, model, cursor):
+        """Return the (write_date, id) a cursor token points after"""
+        if not cursor:
+            return (datetime.min, 0)
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if data.get('model') != model:
+            raise ValueError('Cursor belongs to another model')
+        return (fields.Datetime.to_datetime(data['write_date']), int(data['id']))
+
+    def _encode_change_cursor(self, model, write_date, record_id):
+        data = {'model': model, 'write_date': fields.Datetime.to_string(write_date), 'id': record_id}
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).decode()
+
+    def _stream_changes(self, registry, model, table, columns, after, settled_before, limit):
+        """Generate the gzipped NDJSON change feed"""
+        compressor = zlib.compressobj(wbits=31)  # gzip container
+        query = f"""
+            SELECT {', '.join(f'"{column}"' for column in columns)}
+            FROM {table}
+            WHERE (write_date, id) > (%s, %s) AND write_date < %s
+            ORDER BY write_date, id
+            LIMIT %s
+        """
+        write_date_index, id_index = columns.index('write_date'), columns.index('id')
+        sent = 0
+        last = after
+        with registry.cursor() as cr:
+            while sent < limit:
+                chunk_size = min(EXPORT_CHUNK_SIZE, limit - sent)
+                cr.execute(query, [last[0], last[1], settled_before, chunk_size])
+                rows = cr.fetchall()
+                if not rows:
+                    break
+                lines = [json.dumps(dict(zip(columns, row)), default=str) for row in rows]
+                yield compressor.compress(('\n'.join(lines) + '\n').encode())
+                sent += len(rows)
+                last = (rows[-1][write_date_index], rows[-1][id_index])
+                if len(rows) < chunk_size:
+                    break
+        trailer = {
+            'cursor': self._encode_change_cursor(model, last[0], last[1]),
+            'has_more': sent >= limit,
+        }
+        yield compressor.compress((json.dumps(trailer) + '\n').encode())
+        yield compressor.flush()
@@ -4,113 +4,437 @@ Productivity Tracker Migration Guide
 Helps migrate data from other productivity tracking systems to this Odoo module
 """
 
-from datetime import datetime
+from bisect import bisect_right
+from itertools import groupby
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlparse
 import json
+import logging
+import time
+
+_logger = logging.getLogger(__name__)
+
+CHECKPOINT_NAME = 'import:%s'
+MAX_ERRORS = 1000
+
+
+class ProductivityBulkImporter:
+    """Import tasks and their activity/app usage rows in batches
+
+    Records are consumed from any iterable, so files are streamed and never
+    loaded whole. Employees are resolved once per batch, tasks and logs are
+    created with one multi-record create per model and batch, and with
+    ``auto_commit`` every batch is committed together with a checkpoint: a
+    run that is interrupted resumes after the last committed batch.
+    Invalid records are skipped and reported, the batch goes on without them.
+    Imported days that are already rolled up are queued for a new rollup
+    by the log models, so the history shows up in reports.
+    """
+
+    def __init__(self, env, batch_size=2000, auto_commit=True):
+        self.env = env
+        self.batch_size = batch_size
+        self.auto_commit = auto_commit
+        self.known_employees = set()
+        self.missing_employees = set()
+        self.activity_types = env['activity.log']._fields['activity_type'].get_values(env)
+        self.result = {
+            'tasks_created': 0,
+            'activities_created': 0,
+            'app_usages_created': 0,
+            'skipped': 0,
+            'error_count': 0,
+            'errors': [],
+        }
+
+    def run(self, records, checkpoint):
+        """Import task dicts, skipping the ones already imported under this checkpoint name"""
+        done = int(self.env['productivity.checkpoint']._get_checkpoint(CHECKPOINT_NAME % checkpoint, 0))
+        started = time.monotonic()
+        batch = []
+        position = 0
+        for position, record in enumerate(records, start=1):
+            if position <= done:
+                continue
+            batch.append((position, record))
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch, checkpoint, position)
+                batch = []
+                _logger.info("Imported %s records (%.0f/s)", position,
+                             (position - done) / max(time.monotonic() - started, 1e-6))
+        if batch:
+            self._import_batch(batch, checkpoint, position)
+        return self.result
+
+    def _error(self, message):
+        self.result['error_count'] += 1
+        if len(self.result['errors']) < MAX_ERRORS:
+            self.result['errors'].append(message)
+
+    def _resolve_employees(self, employee_ids):
+        """Check the employee ids of a batch with one query, caching the answer"""
+        unknown = set(employee_ids) - self.known_employees - self.missing_employees
+        if unknown:
+            found = set(self.env['hr.employee'].with_context(active_test=False).search([
+                ('id', 'in', list(unknown)),
+            ]).ids)
+            self.known_employees |= found
+            self.missing_employees |= unknown - found
+
+    def _import_batch(self, batch, checkpoint, position):
+        rows = []
+        for row_position, record in batch:
+            try:
+                rows.append((row_position, record, int(record.get('employee_id'))))
+            except (TypeError, ValueError):
+                self._error(f"Record {row_position}: invalid employee {record.get('employee_id')}")
+        self._resolve_employees({employee_id for __, __, employee_id in rows})
+
+        imports = []  # (position, task vals, (activity vals, app usage vals))
+        for row_position, record, employee_id in rows:
+            if employee_id not in self.known_employees:
+                self._error(f"Record {row_position}: employee {employee_id} not found")
+                self.result['skipped'] += 1
+                continue
+            try:
+                imports.append((row_position, {
+                    'name': record.get('task_name') or record.get('name') or 'Imported Task',
+                    'description': record.get('description', ''),
+                    'employee_id': employee_id,
+                    'start_time': _parse_datetime(record.get('start_time')),
+                    'stop_time': _parse_datetime(record.get('stop_time')),
+                    'state': 'completed',
+                }, (
+                    [self._activity_vals(log, employee_id) for log in record.get('activities') or []],
+                    [self._app_usage_vals(log, employee_id) for log in record.get('app_usage') or []],
+                )))
+            except (TypeError, ValueError) as e:
+                self._error(f"Record {row_position}: {e}")
+                self.result['skipped'] += 1
+
+        try:
+            with self.env.cr.savepoint():
+                self._create_records(imports)
+        except Exception:
+            # A record the validation let through broke the batch, create them one by one to skip only it
+            _logger.warning("Batch ending at record %s failed, importing its records one by one", position)
+            for item in imports:
+                try:
+                    with self.env.cr.savepoint():
+                        self._create_records([item])
+                except Exception as e:
+                    self._error(f"Record {item[0]}: {e}")
+                    self.result['skipped'] += 1
+
+        # The checkpoint is committed with the batch it covers
+        self.env['productivity.checkpoint']._set_checkpoint(CHECKPOINT_NAME % checkpoint, str(position))
+        if self.auto_commit:
+            self.env.cr.commit()
+            self.env.invalidate_all()
+
+    def _create_records(self, imports):
+        """Create the tasks and logs of ``imports`` with one create per model"""
+        tasks = self.env['productivity.task'].create([task_vals for __, task_vals, __ in imports])
+        activity_vals, app_usage_vals = [], []
+        for task, (__, __, (activities, app_usages)) in zip(tasks, imports):
+            activity_vals.extend(dict(vals, task_id=task.id) for vals in activities)
+            app_usage_vals.extend(dict(vals, task_id=task.id) for vals in app_usages)
+        self.env['activity.log'].create(activity_vals)
+        self.env['app.usage.log'].create(app_usage_vals)
+        self.result['tasks_created'] += len(tasks)
+        self.result['activities_created'] += len(activity_vals)
+        self.result['app_usages_created'] += len(app_usage_vals)
+
+    def _activity_vals(self, log, employee_id):
+        if log.get('activity_type') not in self.activity_types:
+            raise ValueError(f"invalid activity type {log.get('activity_type')}")
+        return self._log_vals(log, employee_id)
+
+    def _app_usage_vals(self, log, employee_id):
+        if not log.get('app_name'):
+            raise ValueError("app usage without app_name")
+        return self._log_vals(log, employee_id)
+
+    def _log_vals(self, log, employee_id):
+        vals = {
+            key: log[key] for key in (
+                'activity_type', 'description', 'app_name', 'app_path', 'window_title',
+                'keyboard_events', 'mouse_events', 'client_event_id',
+            ) if log.get(key) is not None
+        }
+        vals['employee_id'] = employee_id
+        vals['start_time'] = _parse_datetime(log.get('start_time'))
+        if not vals['start_time']:
+            raise ValueError("log without start_time")
+        if log.get('end_time'):
+            vals['end_time'] = _parse_datetime(log['end_time'])
+        return vals
+
+
+def _parse_datetime(value):
+    """Parse an ISO 8601 string into a naive UTC datetime"""
+    if not value:
+        return False
+    moment = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if moment.tzinfo:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return moment
+
+
+def _iter_json_tasks(json_file_path):
+    """Yield the tasks of a JSON or NDJSON file without loading it whole when possible"""
+    if json_file_path.endswith(('.ndjson', '.jsonl')):
+        with open(json_file_path, 'r') as jsonfile:
+            for line in jsonfile:
+                if line.strip():
+                    yield json.loads(line)
+        return
+
+    with open(json_file_path, 'rb') as jsonfile:
+        head = jsonfile.read(1024).lstrip()
+        jsonfile.seek(0)
+        try:
+            import ijson
+        except ImportError:
+            ijson = None
+        if ijson:
+            yield from ijson.items(jsonfile, 'item' if head.startswith(b'[') else 'tasks.item')
+            return
+        _logger.warning("ijson is not installed, loading %s in memory", json_file_path)
+        data = json.load(jsonfile)
+        yield from (data if isinstance(data, list) else data.get('tasks', []))
+
+
+class ActivityWatchImporter:
+    """Import ActivityWatch bucket exports into app usage and activity logs
+
+    Window and web events become app usage rows, AFK periods become idle
+    activity rows. Events are streamed one at a time and adjacent identical
+    events merged on the fly; each merged event is attached to the task
+    of the employee running at its start. Every row gets a deterministic
+    ``client_event_id``, so importing the same export again creates nothing.
+    Imported days that are already rolled up are queued for a new rollup
+    by the log models.
+    """
+
+    def __init__(self, env, employee_id, batch_size=5000, merge_gap_seconds=1, auto_commit=True):
+        self.env = env
+        self.employee_id = employee_id
+        self.batch_size = batch_size
+        self.merge_gap = timedelta(seconds=merge_gap_seconds)
+        self.auto_commit = auto_commit
+        self.result = {
+            'app_usages_created': 0,
+            'activities_created': 0,
+            'duplicates': 0,
+            'unattached': 0,
+        }
+        tasks = env['productivity.task'].search_read([
+            ('employee_id', '=', employee_id),
+            ('start_time', '!=', False),
+        ], ['start_time', 'stop_time'], order='start_time')
+        self.task_ids = [task['id'] for task in tasks]
+        self.task_starts = [task['start_time'] for task in tasks]
+        self.task_stops = [task['stop_time'] or datetime.max for task in tasks]
+
+    def run(self, events):
+        """Import ``(bucket_id, bucket_type, event)`` triples, streamed bucket after bucket"""
+        for (bucket_id, bucket_type), bucket_events in groupby(events, key=lambda item: item[:2]):
+            bucket_events = (event for __, __, event in bucket_events)
+            if bucket_type == 'afkstatus':
+                self._import_events(bucket_id, bucket_events, 'activity.log', self._afk_vals)
+            elif bucket_type == 'currentwindow' or bucket_type.startswith('web.tab'):
+                self._import_events(bucket_id, bucket_events, 'app.usage.log', self._window_vals)
+        return self.result
+
+    def _find_task(self, moment):
+        """Id of the task running at a moment, using the tasks sorted by start time"""
+        index = bisect_right(self.task_starts, moment) - 1
+        if index >= 0 and moment < self.task_stops[index]:
+            return self.task_ids[index]
+        return False
+
+    def _merged_events(self, events):
+        """Merge the adjacent events with the same data, in stream order
+
+        ActivityWatch exports buckets newest first. An event is merged into
+        the current one when it touches it on either side, so the events
+        are neither sorted nor held in memory.
+        """
+        current = None
+        for event in events:
+            start = _parse_datetime(event.get('timestamp'))
+            if not start:
+                continue
+            end = start + timedelta(seconds=float(event.get('duration') or 0))
+            data = event.get('data') or {}
+            if (current and data == current[2]
+                    and start - current[1] <= self.merge_gap and current[0] - end <= self.merge_gap):
+                current[0] = min(current[0], start)
+                current[1] = max(current[1], end)
+                continue
+            if current:
+                yield current
+            current = [start, end, data]
+        if current:
+            yield current
+
+    def _window_vals(self, start, end, data):
+        url = data.get('url')
+        return {
+            'app_name': data.get('app') or (url and urlparse(url).hostname) or 'Unknown',
+            'app_path': url or False,
+            'window_title': data.get('title') or False,
+            'start_time': start,
+            'end_time': end,
+            'session_closed': True,
+        }
+
+    def _afk_vals(self, start, end, data):
+        if data.get('status') != 'afk':
+            return None
+        return {
+            'activity_type': 'idle_detected',
+            'start_time': start,
+            'end_time': end,
+            'description': 'Away from keyboard (imported)',
+        }
+
+    def _import_events(self, bucket_id, events, model_name, make_vals):
+        batch = []
+        for start, end, data in self._merged_events(events):
+            vals = make_vals(start, end, data)
+            if vals is None:
+                continue
+            task_id = self._find_task(start)
+            if not task_id:
+                self.result['unattached'] += 1
+                continue
+            vals.update({
+                'task_id': task_id,
+                'employee_id': self.employee_id,
+                'client_event_id': f'aw:{bucket_id}:{start.isoformat()}',
+            })
+            batch.append(vals)
+            if len(batch) >= self.batch_size:
+                self._create_batch(model_name, batch)
+                batch = []
+        if batch:
+            self._create_batch(model_name, batch)
+
+    def _create_batch(self, model_name, batch):
+        """Create the rows of a batch whose client_event_id is not stored yet"""
+        Model = self.env[model_name]
+        existing = self.env['productivity.ingest']._find_client_events(
+            model_name, [vals['client_event_id'] for vals in batch])
+        new_vals = [vals for vals in batch if vals['client_event_id'] not in existing]
+        Model.create(new_vals)
+        self.result['duplicates'] += len(batch) - len(new_vals)
+        key = 'activities_created' if model_name == 'activity.log' else 'app_usages_created'
+        self.result[key] += len(new_vals)
+        if self.auto_commit:
+            self.env.cr.commit()
+            self.env.invalidate_all()
+
+
+def _iter_activitywatch_events(json_file_path):
+    """Yield the ``(bucket_id, bucket_type, event)`` of an ActivityWatch export, one event in memory at a time
+
+    A first pass reads the bucket types, which may come after the events
+    of their bucket; the second pass streams the events.
+    """
+    try:
+        import ijson
+        from ijson.common import ObjectBuilder
+    except ImportError:
+        ijson = None
+    if not ijson:
+        _logger.warning("ijson is not installed, loading %s in memory", json_file_path)
+        with open(json_file_path, 'rb') as jsonfile:
+            buckets = json.load(jsonfile).get('buckets', {})
+        for bucket_id, bucket in buckets.items():
+            for event in bucket.get('events') or []:
+                yield bucket_id, bucket.get('type') or '', event
+        return
+
+    types = {}
+    with open(json_file_path, 'rb') as jsonfile:
+        type_prefix = None
+        for prefix, event, value in ijson.parse(jsonfile):
+            if prefix == 'buckets' and event == 'map_key':
+                bucket_id, type_prefix = value, f'buckets.{value}.type'
+            elif prefix == type_prefix and event == 'string':
+                types[bucket_id] = value
+
+    with open(json_file_path, 'rb') as jsonfile:
+        events_prefix = builder = None
+        for prefix, event, value in ijson.parse(jsonfile, use_float=True):
+            if builder:
+                builder.event(event, value)
+                if prefix == events_prefix and event == 'end_map':
+                    yield bucket_id, types.get(bucket_id, ''), builder.value
+                    builder = None
+            elif prefix == 'buckets' and event == 'map_key':
+                bucket_id, events_prefix = value, f'buckets.{value}.events.item'
+            elif prefix == events_prefix and event == 'start_map':
+                builder = ObjectBuilder()
+                builder.event(event, value)
 
 
 class ProductivityDataMigrator:
     """Utility class for migrating productivity data"""
-    
+
     @staticmethod
-    def migrate_from_csv(csv_file_path, env):
+    def migrate_from_csv(csv_file_path, env, batch_size=2000, auto_commit=True):
         """
         Migrate productivity data from CSV file
-        
+
         Expected CSV columns:
         - employee_id, task_name, start_time, stop_time, description
+
+        Rows are read and imported in batches; running it again on the same
+        file resumes after the last committed batch.
         """
         import csv
-        
-        tasks_created = 0
-        errors = []
-        
+
+        importer = ProductivityBulkImporter(env, batch_size=batch_size, auto_commit=auto_commit)
         try:
             with open(csv_file_path, 'r') as csvfile:
-                reader = csv.DictReader(csvfile)
-                
-                for row in reader:
-                    try:
-                        # Find employee
-                        employee = env['hr.employee'].search([
-                            ('id', '=', int(row.get('employee_id')))
-                        ], limit=1)
-                        
-                        if not employee:
-                            errors.append(f"Employee {row.get('employee_id')} not found")
-                            continue
-                        
-                        # Create task
-                        task = env['productivity.task'].create({
-                            'name': row.get('task_name'),
-                            'description': row.get('description', ''),
-                            'employee_id': employee.id,
-                            'start_time': datetime.fromisoformat(row.get('start_time')),
-                            'stop_time': datetime.fromisoformat(row.get('stop_time')),
-                            'state': 'completed',
-                        })
-                        
-                        tasks_created += 1
-                        
-                    except Exception as e:
-                        errors.append(f"Error processing row {row}: {str(e)}")
-        
+                return importer.run(csv.DictReader(csvfile), csv_file_path)
         except Exception as e:
-            errors.append(f"Error reading CSV file: {str(e)}")
-        
-        return {
-            'tasks_created': tasks_created,
-            'errors': errors,
-        }
-    
+            importer._error(f"Error reading CSV file: {str(e)}")
+        return importer.result
+
     @staticmethod
-    def migrate_from_json(json_file_path, env):
-        """Migrate productivity data from JSON file"""
-        tasks_created = 0
-        errors = []
-        
+    def migrate_from_json(json_file_path, env, batch_size=2000, auto_commit=True):
+        """
+        Migrate productivity data from JSON file
+
+        The file holds a list of tasks, an object with a ``tasks`` list, or
+        one task per line (``.ndjson``/``.jsonl``). A task may carry
+        ``activities`` and ``app_usage`` lists, imported with it.
+        """
+        importer = ProductivityBulkImporter(env, batch_size=batch_size, auto_commit=auto_commit)
         try:
-            with open(json_file_path, 'r') as jsonfile:
-                data = json.load(jsonfile)
-                
-                if isinstance(data, list):
-                    tasks = data
-                else:
-                    tasks = data.get('tasks', [])
-                
-                for task_data in tasks:
-                    try:
-                        employee = env['hr.employee'].search([
-                            ('id', '=', task_data.get('employee_id'))
-                        ], limit=1)
-                        
-                        if not employee:
-                            errors.append(f"Employee {task_data.get('employee_id')} not found")
-                            continue
-                        
-                        task = env['productivity.task'].create({
-                            'name': task_data.get('name'),
-                            'description': task_data.get('description', ''),
-                            'employee_id': employee.id,
-                            'start_time': task_data.get('start_time'),
-                            'stop_time': task_data.get('stop_time'),
-                            'state': 'completed',
-                        })
-                        
-                        tasks_created += 1
-                        
-                    except Exception as e:
-                        errors.append(f"Error processing task {task_data.get('name')}: {str(e)}")
-        
+            return importer.run(_iter_json_tasks(json_file_path), json_file_path)
         except Exception as e:
-            errors.append(f"Error reading JSON file: {str(e)}")
-        
-        return {
-            'tasks_created': tasks_created,
-            'errors': errors,
-        }
+            importer._error(f"Error reading JSON file: {str(e)}")
+        return importer.result
+
+    @staticmethod
+    def migrate_from_activitywatch(json_file_path, env, employee_id, batch_size=5000, auto_commit=True):
+        """
+        Migrate raw window, web and AFK events of an ActivityWatch export
+
+        Events are attached to the employee's tasks by time; importing the
+        same export again skips the events already imported.
+        """
+        importer = ActivityWatchImporter(env, employee_id, batch_size=batch_size, auto_commit=auto_commit)
+        return importer.run(_iter_activitywatch_events(json_file_path))
 
 
 if __name__ == '__main__':
     print("Productivity Tracker Migration Utility")
     print("This script helps migrate data from other systems to the Odoo module")
-    print("\nUsage: Call ProductivityDataMigrator.migrate_from_csv() or migrate_from_json()")
+    print("\nUsage: Call ProductivityDataMigrator.migrate_from_csv(), migrate_from_json()"
+          " or migrate_from_activitywatch()")
@@ -0,0 +1,46 @@
+"""Backfill the pause/work accumulators of productivity.task from activity_log"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        WITH pauses AS (
+            SELECT task_id,
+                   COALESCE(SUM(EXTRACT(EPOCH FROM end_time - start_time)) FILTER (WHERE end_time IS NOT NULL), 0) AS closed_seconds,
+                   MAX(start_time) FILTER (WHERE end_time IS NULL) AS open_start
+            FROM activity_log
+            WHERE activity_type = 'pause'
+            GROUP BY task_id
+        ),
+        segments AS (
+            SELECT t.id,
+                   COALESCE(p.closed_seconds, 0) AS paused_seconds,
+                   CASE
+                       WHEN t.state = 'completed' THEN COALESCE(t.stop_time, t.start_time)
+                       WHEN t.state = 'paused' THEN COALESCE(t.pause_time, p.open_start, NOW() AT TIME ZONE 'UTC')
+                       ELSE NOW() AT TIME ZONE 'UTC'
+                   END AS segment_start
+            FROM productivity_task t
+            LEFT JOIN pauses p ON p.task_id = t.id
+            WHERE t.start_time IS NOT NULL
+        )
+        UPDATE productivity_task t
+        SET paused_seconds = s.paused_seconds,
+            worked_seconds = GREATEST(0, EXTRACT(EPOCH FROM s.segment_start - t.start_time) - s.paused_seconds),
+            segment_start = CASE WHEN t.state IN ('running', 'paused') THEN s.segment_start END
+        FROM segments s
+        WHERE t.id = s.id
+    """)
+
+    cr.execute("""
+        UPDATE productivity_task
+        SET total_working_time = worked_seconds / 3600.0,
+            total_paused_time = (paused_seconds + CASE
+                WHEN state = 'paused' AND segment_start IS NOT NULL
+                THEN GREATEST(0, EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC') - segment_start))
+                ELSE 0
+            END) / 3600.0
+        WHERE start_time IS NOT NULL
+    """)
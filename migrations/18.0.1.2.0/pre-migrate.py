@@ -0,0 +1,8 @@
+"""productivity_dashboard becomes a table, drop the SQL view it replaces"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("DROP VIEW IF EXISTS productivity_dashboard")
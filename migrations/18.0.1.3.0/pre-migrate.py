@@ -0,0 +1,18 @@
+"""Create and fill the work_date columns with SQL so the ORM does not recompute them row by row"""
+
+TABLES = ('productivity_task', 'activity_log', 'app_usage_log')
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    for table in TABLES:
+        cr.execute(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS work_date date")
+        cr.execute(f"""
+            UPDATE {table} rec
+            SET work_date = (COALESCE(rec.start_time, rec.create_date) AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(r.tz, 'UTC'))::date
+            FROM hr_employee e
+            JOIN resource_resource r ON r.id = e.resource_id
+            WHERE e.id = rec.employee_id
+        """)
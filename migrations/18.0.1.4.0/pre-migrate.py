@@ -0,0 +1,12 @@
+"""app_usage_log.start_time becomes required (the work date used by rollups and retention is derived from it)"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        UPDATE app_usage_log
+        SET start_time = COALESCE(create_date, NOW() AT TIME ZONE 'UTC')
+        WHERE start_time IS NULL
+    """)
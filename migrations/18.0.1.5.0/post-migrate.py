@@ -0,0 +1,11 @@
+"""Backfill the log counters of productivity.task from activity_log and app_usage_log"""
+
+from odoo import api, SUPERUSER_ID
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    env = api.Environment(cr, SUPERUSER_ID, {})
+    env['productivity.task']._recompute_log_counters()
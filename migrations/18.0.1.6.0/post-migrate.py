@@ -0,0 +1,26 @@
+"""Move the rollup watermark and import checkpoints from ir.config_parameter to productivity_checkpoint,
+drop the unused app_usage_log (employee_id, start_time) index"""
+
+
+def migrate(cr, version):
+    if not version:
+        return
+
+    cr.execute("""
+        INSERT INTO productivity_checkpoint (name, value, write_date)
+        SELECT CASE
+                   WHEN key = 'employee_productivity_tracker.rollup_watermark' THEN 'rollup_watermark'
+                   ELSE 'import:' || substr(key, length('employee_productivity_tracker.import_checkpoint.') + 1)
+               END,
+               value, NOW() AT TIME ZONE 'UTC'
+        FROM ir_config_parameter
+        WHERE key = 'employee_productivity_tracker.rollup_watermark'
+           OR key LIKE 'employee\\_productivity\\_tracker.import\\_checkpoint.%'
+        ON CONFLICT (name) DO NOTHING
+    """)
+    cr.execute("""
+        DELETE FROM ir_config_parameter
+        WHERE key = 'employee_productivity_tracker.rollup_watermark'
+           OR key LIKE 'employee\\_productivity\\_tracker.import\\_checkpoint.%'
+    """)
+    cr.execute("DROP INDEX IF EXISTS app_usage_log_employee_start_idx")
@@ -1,7 +1,13 @@
+from . import work_date_mixin
+from . import hr_employee
 from . import productivity_task
 # from . import screenshot_log  # Screenshot functionality removed
 from . import activity_log
 from . import app_usage_log
+from . import productivity_checkpoint
 from . import productivity_config
+from . import productivity_rollup
 from . import productivity_report
 from . import productivity_dashboard
+from . import productivity_input
+from . import productivity_ingest
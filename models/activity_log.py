@@ -1,8 +1,9 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 
 
 class ActivityLog(models.Model):
     _name = 'activity.log'
+    _inherit = ['productivity.work.date.mixin']
     _description = 'Activity Log'
     _order = 'start_time desc'
 
@@ -34,8 +35,28 @@ class ActivityLog(models.Model):
     keyboard_events = fields.Integer(string='Keyboard Events', default=0)
     mouse_events = fields.Integer(string='Mouse Events', default=0)
     
+    client_event_id = fields.Char(string='Client Event ID', readonly=True, copy=False)
+    
     create_date = fields.Datetime(string='Created', readonly=True)
 
+    _sql_constraints = [
+        ('client_event_id_unique', 'unique(client_event_id)', 'Client event ID must be unique.'),
+    ]
+
+    # Fields the daily rollups are computed from
+    ROLLUP_FIELDS = {'employee_id', 'start_time', 'end_time', 'activity_type', 'keyboard_events', 'mouse_events'}
+
+    def init(self):
+        """Indexes for the per-task event lookups, the per-day queries and the change feed"""
+        tools.create_index(self._cr, 'activity_log_task_type_start_idx', self._table,
+                           ['task_id', 'activity_type', 'start_time DESC'])
+        tools.create_index(self._cr, 'activity_log_open_pause_idx', self._table,
+                           ['task_id', 'start_time DESC'], where="activity_type = 'pause' AND end_time IS NULL")
+        tools.create_index(self._cr, 'activity_log_employee_work_date_idx', self._table,
+                           ['employee_id', 'work_date'])
+        tools.create_index(self._cr, 'activity_log_write_date_id_idx', self._table,
+                           ['write_date', 'id'])
+
     @api.depends('start_time', 'end_time')
     def _compute_duration(self):
         """Compute duration in minutes"""
@@ -46,6 +67,35 @@ class ActivityLog(models.Model):
             else:
                 record.duration = 0
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        logs = super().create(vals_list)
+        self.env['productivity.task']._add_log_counters(logs._get_task_counter_deltas())
+        self.env['productivity.app.usage.daily']._mark_days_dirty(logs.mapped('work_date'))
+        return logs
+
+    def write(self, vals):
+        recount = bool({'task_id', 'start_time'} & set(vals))
+        if recount:
+            removed = self._get_task_counter_deltas(-1)
+        rolled_up = bool(self.ROLLUP_FIELDS & set(vals))
+        work_dates = self.mapped('work_date') if rolled_up else []
+        result = super().write(vals)
+        if recount:
+            self.env['productivity.task']._add_log_counters(removed + self._get_task_counter_deltas())
+        if rolled_up:
+            self.env['productivity.app.usage.daily']._mark_days_dirty(work_dates + self.mapped('work_date'))
+        return result
+
+    def unlink(self):
+        self.env['productivity.task']._add_log_counters(self._get_task_counter_deltas(-1))
+        self.env['productivity.app.usage.daily']._mark_days_dirty(self.mapped('work_date'))
+        return super().unlink()
+
+    def _get_task_counter_deltas(self, sign=1):
+        """Contribution of the logs to their tasks' counters, see productivity.task._add_log_counters"""
+        return [(log.task_id.id, sign, 0, 0, log.start_time if sign > 0 else None) for log in self]
+
     @api.model
     def log_activity(self, task_id, employee_id, activity_type, description='', app_name=None, **kwargs):
         """Log an activity"""
@@ -79,18 +129,31 @@ class ActivityLog(models.Model):
         
         return summary
 
+    @api.model
+    def get_employee_activity_summary(self, employee_id, date_from, date_to):
+        """Get the number of activities and their duration per type for an employee in a date range
+
+        Days already compacted are read from the daily rollups.
+        """
+        activity_query, activity_params = self.env['productivity.activity.daily']._get_activity_query()
+        self.env.cr.execute("""
+            SELECT activity_type, SUM(event_count), SUM(duration)
+            FROM (""" + activity_query + """) activities
+            WHERE employee_id = %s AND work_date BETWEEN %s AND %s
+            GROUP BY activity_type
+        """, activity_params + [employee_id, fields.Date.to_date(date_from), fields.Date.to_date(date_to)])
+        
+        return {
+            activity_type: {'count': count, 'duration': duration}
+            for activity_type, count, duration in self.env.cr.fetchall()
+        }
+
     @api.model
     def get_employee_daily_summary(self, employee_id, date):
         """Get daily summary for an employee"""
-        from datetime import datetime, timedelta
-        
-        start_of_day = datetime.combine(date, datetime.min.time())
-        end_of_day = datetime.combine(date, datetime.max.time())
-        
         activities = self.search([
             ('employee_id', '=', employee_id),
-            ('start_time', '>=', start_of_day),
-            ('start_time', '<=', end_of_day),
+            ('work_date', '=', date),
         ])
         
         return activities
@@ -0,0 +1,119 @@
+"""
+Application classifier shared by app usage logging and restricted app detection.
+
+Keywords are compiled once into an Aho-Corasick automaton so that an
+application name is matched against every restricted and category keyword
+in a single pass over its characters.
+"""
+
+from collections import deque
+
+
+DEFAULT_RESTRICTED_APPS = [
+    'whatsapp', 'youtube', 'spotify', 'facebook',
+    'instagram', 'tiktok', 'twitter', 'reddit',
+    'netflix', 'discord', 'telegram', 'steam',
+    'twitch', 'snapchat', 'pinterest', 'tinder',
+    'bumble', 'hulu', 'amazon prime', 'disneyplus'
+]
+
+WORK_APPS = [
+    'outlook', 'excel', 'word', 'powerpoint',
+    'slack', 'teams', 'zoom', 'chrome', 'firefox',
+    'vscode', 'notepad', 'visual studio', 'datagrip',
+    'jira', 'confluence', 'salesforce', 'sap'
+]
+
+COMMUNICATION_APPS = ['slack', 'teams', 'outlook', 'telegram', 'whatsapp']
+
+ENTERTAINMENT_APPS = ['youtube', 'netflix', 'spotify', 'hulu', 'twitch']
+
+SOCIAL_MEDIA_APPS = ['facebook', 'instagram', 'twitter', 'tiktok', 'reddit']
+
+# Order matters: the first matching category wins
+CATEGORY_APPS = [
+    ('work', WORK_APPS),
+    ('communication', COMMUNICATION_APPS),
+    ('entertainment', ENTERTAINMENT_APPS),
+    ('social_media', SOCIAL_MEDIA_APPS),
+]
+
+
+class AppClassifier:
+    """Classify application names into a category and a restricted flag"""
+
+    RESTRICTED = 1
+    CACHE_SIZE = 10000
+
+    def __init__(self, restricted_apps, category_apps=CATEGORY_APPS):
+        self._categories = [category for category, __ in category_apps]
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [0]
+        self._results = {}
+
+        for keyword in restricted_apps:
+            self._add(keyword, self.RESTRICTED)
+        for position, (__, keywords) in enumerate(category_apps):
+            for keyword in keywords:
+                self._add(keyword, 1 << (position + 1))
+        self._build_failure_links()
+
+    def _add(self, keyword, flag):
+        keyword = (keyword or '').strip().lower()
+        if not keyword:
+            return
+        state = 0
+        for char in keyword:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append(0)
+                self._goto[state][char] = next_state
+            state = next_state
+        self._output[state] |= flag
+
+    def _build_failure_links(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # A state also matches every keyword that is a suffix of it
+                self._output[next_state] |= self._output[self._fail[next_state]]
+
+    def _match(self, text):
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        flags = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            flags |= output[state]
+        return flags
+
+    def classify(self, app_name):
+        """Return ``(category, is_restricted)`` for an application name"""
+        text = (app_name or '').lower()
+        result = self._results.get(text)
+        if result is None:
+            flags = self._match(text)
+            category = next(
+                (name for position, name in enumerate(self._categories) if flags & (1 << (position + 1))),
+                'other',
+            )
+            result = (category, bool(flags & self.RESTRICTED))
+            if len(self._results) >= self.CACHE_SIZE:
+                self._results.clear()
+            self._results[text] = result
+        return result
+
+    def is_restricted(self, app_name):
+        return self.classify(app_name)[1]
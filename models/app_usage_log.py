@@ -1,8 +1,12 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+from datetime import timedelta
+
+from .app_classifier import DEFAULT_RESTRICTED_APPS, WORK_APPS
 
 
 class AppUsageLog(models.Model):
     _name = 'app.usage.log'
+    _inherit = ['productivity.work.date.mixin']
     _description = 'Application Usage Log'
     _order = 'start_time desc'
 
@@ -13,10 +17,12 @@ class AppUsageLog(models.Model):
     app_name = fields.Char(string='Application Name', required=True)
     app_path = fields.Char(string='Application Path')
     
-    start_time = fields.Datetime(string='Start Time', default=lambda self: fields.Datetime.now())
+    start_time = fields.Datetime(string='Start Time', required=True, default=lambda self: fields.Datetime.now())
     end_time = fields.Datetime(string='End Time')
     
     duration = fields.Float(string='Duration (Minutes)', compute='_compute_duration', store=True)
+    session_closed = fields.Boolean(string='Session Closed', default=False, readonly=True,
+                                    help='Closed sessions are never extended by later samples')
     
     is_restricted = fields.Boolean(string='Is Restricted App', compute='_compute_restricted', store=True)
     
@@ -30,22 +36,37 @@ class AppUsageLog(models.Model):
     
     window_title = fields.Char(string='Window Title')
     
+    client_event_id = fields.Char(string='Client Event ID', readonly=True, copy=False,
+                                  help='Idempotency key generated by the browser so replayed events are not stored twice')
+    
     create_date = fields.Datetime(string='Created', readonly=True)
 
-    RESTRICTED_APPS = [
-        'whatsapp', 'youtube', 'spotify', 'facebook',
-        'instagram', 'tiktok', 'twitter', 'reddit',
-        'netflix', 'discord', 'telegram', 'steam',
-        'twitch', 'snapchat', 'pinterest', 'tinder',
-        'bumble', 'hulu', 'amazon prime', 'disneyplus'
+    _sql_constraints = [
+        ('client_event_id_unique', 'unique(client_event_id)', 'Client event ID must be unique.'),
     ]
 
-    WORK_APPS = [
-        'outlook', 'excel', 'word', 'powerpoint',
-        'slack', 'teams', 'zoom', 'chrome', 'firefox',
-        'vscode', 'notepad', 'visual studio', 'datagrip',
-        'jira', 'confluence', 'salesforce', 'sap'
-    ]
+    RESTRICTED_APPS = DEFAULT_RESTRICTED_APPS
+
+    WORK_APPS = WORK_APPS
+
+    # Histogram granularities of the analytics and the cap on their number of points
+    ANALYTICS_BUCKETS = ('hour', 'day')
+    ANALYTICS_MAX_ROWS = 2000
+
+    # Fields changing the task counters (count, restricted minutes, last activity)
+    COUNTED_FIELDS = {'task_id', 'start_time', 'end_time', 'app_name', 'is_restricted'}
+
+    # Fields the daily rollups are computed from
+    ROLLUP_FIELDS = {'employee_id', 'start_time', 'end_time', 'app_name', 'app_category'}
+
+    def init(self):
+        """Indexes for the open session lookup, the per-day queries and the change feed"""
+        tools.create_index(self._cr, 'app_usage_log_task_start_idx', self._table,
+                           ['task_id', 'start_time DESC NULLS LAST', 'id DESC'])
+        tools.create_index(self._cr, 'app_usage_log_employee_work_date_idx', self._table,
+                           ['employee_id', 'work_date'])
+        tools.create_index(self._cr, 'app_usage_log_write_date_id_idx', self._table,
+                           ['write_date', 'id'])
 
     @api.depends('start_time', 'end_time')
     def _compute_duration(self):
@@ -60,47 +81,117 @@ class AppUsageLog(models.Model):
     @api.depends('app_name')
     def _compute_restricted(self):
         """Check if app is in restricted list"""
+        classifier = self.env['productivity.config']._get_app_classifier()
         for record in self:
-            app_lower = record.app_name.lower() if record.app_name else ''
-            record.is_restricted = any(
-                restricted in app_lower for restricted in self.RESTRICTED_APPS
-            )
+            record.is_restricted = classifier.is_restricted(record.app_name)
 
-    @api.model
-    def create(self, vals):
-        """Create app usage log and categorize app"""
-        if vals.get('app_name'):
-            app_name = vals['app_name'].lower()
-            
-            # Categorize app
-            if any(work in app_name for work in self.WORK_APPS):
-                vals['app_category'] = 'work'
-            elif any(comm in app_name for comm in ['slack', 'teams', 'outlook', 'telegram', 'whatsapp']):
-                vals['app_category'] = 'communication'
-            elif any(ent in app_name for ent in ['youtube', 'netflix', 'spotify', 'hulu', 'twitch']):
-                vals['app_category'] = 'entertainment'
-            elif any(social in app_name for social in ['facebook', 'instagram', 'twitter', 'tiktok', 'reddit']):
-                vals['app_category'] = 'social_media'
+    @api.model_create_multi
+    def create(self, vals_list):
+        """Create app usage logs and categorize apps"""
+        classifier = self.env['productivity.config']._get_app_classifier()
+        for vals in vals_list:
+            if vals.get('app_name'):
+                category = classifier.classify(vals['app_name'])[0]
+                if category != 'other':
+                    vals['app_category'] = category
         
-        return super().create(vals)
+        logs = super().create(vals_list)
+        self.env['productivity.dashboard']._mark_dirty(logs.employee_id.ids)
+        self.env['productivity.task']._add_log_counters(logs._get_task_counter_deltas())
+        self.env['productivity.app.usage.daily']._mark_days_dirty(logs.mapped('work_date'))
+        return logs
+
+    def write(self, vals):
+        employee_ids = self.employee_id.ids
+        recount = bool(self.COUNTED_FIELDS & set(vals))
+        if recount:
+            removed = self._get_task_counter_deltas(-1)
+        rolled_up = bool(self.ROLLUP_FIELDS & set(vals))
+        work_dates = self.mapped('work_date') if rolled_up else []
+        result = super().write(vals)
+        self.env['productivity.dashboard']._mark_dirty(employee_ids + self.employee_id.ids)
+        if recount:
+            self.env['productivity.task']._add_log_counters(removed + self._get_task_counter_deltas())
+        if rolled_up:
+            self.env['productivity.app.usage.daily']._mark_days_dirty(work_dates + self.mapped('work_date'))
+        return result
+
+    def unlink(self):
+        employee_ids = self.employee_id.ids
+        self.env['productivity.task']._add_log_counters(self._get_task_counter_deltas(-1))
+        self.env['productivity.app.usage.daily']._mark_days_dirty(self.mapped('work_date'))
+        result = super().unlink()
+        self.env['productivity.dashboard']._mark_dirty(employee_ids)
+        return result
+
+    def _get_task_counter_deltas(self, sign=1):
+        """Contribution of the logs to their tasks' counters, see productivity.task._add_log_counters"""
+        return [(
+            log.task_id.id,
+            0,
+            sign,
+            sign * log.duration if log.is_restricted else 0,
+            (log.end_time or log.start_time) if sign > 0 else None,
+        ) for log in self]
+
+    @api.model
+    def _reclassify_all(self):
+        """Recompute category and restricted flag of every log, one UPDATE per outcome
+
+        Each distinct application name is classified once, so the cost is
+        driven by the number of distinct apps rather than by the number of rows.
+        """
+        classifier = self.env['productivity.config']._get_app_classifier()
+        self.flush_model(['app_name', 'app_category', 'is_restricted'])
+        self.env.cr.execute("SELECT DISTINCT app_name FROM app_usage_log WHERE app_name IS NOT NULL")
+        groups = {}
+        for (app_name,) in self.env.cr.fetchall():
+            groups.setdefault(classifier.classify(app_name), []).append(app_name)
+        work_dates = set()
+        for (category, is_restricted), app_names in groups.items():
+            self.env.cr.execute("""
+                UPDATE app_usage_log
+                SET app_category = %s, is_restricted = %s,
+                    write_uid = %s, write_date = NOW() AT TIME ZONE 'UTC'
+                WHERE app_name = ANY(%s)
+                AND (app_category IS DISTINCT FROM %s OR is_restricted IS DISTINCT FROM %s)
+                RETURNING work_date
+            """, [category, is_restricted, self.env.uid, app_names, category, is_restricted])
+            work_dates.update(row[0] for row in self.env.cr.fetchall())
+        self.invalidate_model(['app_category', 'is_restricted', 'write_uid', 'write_date'])
+        self.env['productivity.task']._recompute_log_counters()
+        self.env['productivity.app.usage.daily']._mark_days_dirty(work_dates)
 
     @api.model
     def get_app_usage_summary(self, task_id):
         """Get summary of app usage for a task"""
-        apps = self.search([('task_id', '=', task_id)])
-        
+        self.flush_model(['task_id', 'app_name', 'app_category', 'duration', 'is_restricted'])
+        self.env.cr.execute("""
+            SELECT app_name,
+                   SUM(duration),
+                   SUM(count),
+                   (ARRAY_AGG(app_category ORDER BY duration DESC, app_category))[1],
+                   BOOL_OR(is_restricted)
+            FROM (
+                SELECT app_name, COALESCE(app_category, 'other') AS app_category,
+                       COALESCE(SUM(duration), 0) AS duration, COUNT(*) AS count,
+                       BOOL_OR(is_restricted) AS is_restricted
+                FROM app_usage_log
+                WHERE task_id = %s
+                GROUP BY app_name, COALESCE(app_category, 'other')
+            ) usage
+            GROUP BY app_name
+        """, [task_id])
+
         summary = {}
-        for app in apps:
-            if app.app_name not in summary:
-                summary[app.app_name] = {
-                    'duration': 0,
-                    'count': 0,
-                    'category': app.app_category,
-                    'is_restricted': app.is_restricted,
-                }
-            summary[app.app_name]['duration'] += app.duration or 0
-            summary[app.app_name]['count'] += 1
-        
+        for app_name, duration, count, category, is_restricted in self.env.cr.fetchall():
+            summary[app_name] = {
+                'duration': duration,
+                'count': count,
+                'category': category,
+                'is_restricted': bool(is_restricted),
+            }
+
         return summary
 
     @api.model
@@ -120,28 +211,275 @@ class AppUsageLog(models.Model):
         
         return self.create(vals)
 
+    @api.model
+    def record_app_samples(self, samples):
+        """Fold app samples into usage sessions instead of inserting one row per sample
+
+        Each sample is a dict with ``task`` (productivity.task record),
+        ``app_name``, ``timestamp`` and optionally ``app_path``,
+        ``window_title`` and ``final`` (the client stopped sampling, e.g. on
+        pause). The latest row of a task is the open session: a
+        sample of the same app within the configured gap only extends its
+        ``end_time``. A different app, or a sample after the gap, starts a
+        new session; on a change within the gap the previous session is
+        closed at the time of the switch.
+
+        Samples older than the open session are already accounted for and
+        are ignored, which makes replaying samples harmless.
+
+        Returns the session id for each sample (False when ignored).
+        """
+        if not samples:
+            return []
+        config = self.env['productivity.config'].sudo().get_config()
+        gap = timedelta(seconds=config.app_session_gap_seconds or 0)
+
+        task_ids = list({sample['task'].id for sample in samples})
+        self.flush_model(['task_id', 'start_time'])
+        self.env.cr.execute("""
+            SELECT DISTINCT ON (task_id) id
+            FROM app_usage_log
+            WHERE task_id = ANY(%s)
+            ORDER BY task_id, start_time DESC NULLS LAST, id DESC
+        """, [task_ids])
+        sessions = {}
+        for usage in self.browse([row[0] for row in self.env.cr.fetchall()]):
+            if not (usage.end_time or usage.start_time):
+                continue
+            sessions[usage.task_id.id] = {
+                'record': usage,
+                'app_name': usage.app_name,
+                'end_time': usage.end_time or usage.start_time,
+                'closed': usage.session_closed,
+                'changed': False,
+            }
+        existing_sessions = list(sessions.values())
+
+        new_sessions = []
+        session_of_sample = []
+        for sample in samples:
+            task = sample['task']
+            timestamp = sample['timestamp']
+            session = sessions.get(task.id)
+
+            if session and timestamp <= session['end_time']:
+                # Already covered by (or older than) the open session
+                session_of_sample.append(session if sample['app_name'] == session['app_name'] else None)
+                continue
+
+            within_gap = session and not session['closed'] and timestamp - session['end_time'] <= gap
+            if within_gap and sample['app_name'] == session['app_name']:
+                session['end_time'] = timestamp
+                session['closed'] = bool(sample.get('final'))
+                session['changed'] = True
+                session_of_sample.append(session)
+                continue
+
+            if within_gap:
+                # The switch happened between two samples, close the previous session there
+                session['end_time'] = timestamp
+                session['changed'] = True
+
+            vals = {
+                'task_id': task.id,
+                'employee_id': task.employee_id.id,
+                'app_name': sample['app_name'],
+                'start_time': timestamp,
+                'end_time': timestamp,
+            }
+            if sample.get('app_path'):
+                vals['app_path'] = sample['app_path']
+            if sample.get('window_title'):
+                vals['window_title'] = sample['window_title']
+            session = {
+                'record': None,
+                'vals': vals,
+                'app_name': sample['app_name'],
+                'end_time': timestamp,
+                'closed': bool(sample.get('final')),
+                'changed': False,
+            }
+            sessions[task.id] = session
+            new_sessions.append(session)
+            session_of_sample.append(session)
+
+        # Extend existing sessions, grouped by their new end time
+        to_write = {}
+        for session in existing_sessions:
+            if session['changed']:
+                key = (session['end_time'], session['closed'])
+                to_write.setdefault(key, self.browse())
+                to_write[key] |= session['record']
+        for session in new_sessions:
+            session['vals']['end_time'] = session['end_time']
+            session['vals']['session_closed'] = session['closed']
+        for (end_time, closed), records in to_write.items():
+            records.write({'end_time': end_time, 'session_closed': closed})
+
+        if new_sessions:
+            created = self.create([session['vals'] for session in new_sessions])
+            for session, record in zip(new_sessions, created):
+                session['record'] = record
+
+        return [session['record'].id if session else False for session in session_of_sample]
+
     @api.model
     def get_employee_app_summary(self, employee_id, date_from, date_to):
-        """Get app usage summary for an employee in a date range"""
-        apps = self.search([
-            ('employee_id', '=', employee_id),
-            ('start_time', '>=', date_from),
-            ('start_time', '<=', date_to),
-        ])
-        
+        """Get app usage summary for an employee in a date range
+
+        Days already compacted are read from the daily rollups, so the
+        summary stays available after old raw logs are deleted.
+        """
         summary = {}
-        for app in apps:
-            if app.app_name not in summary:
-                summary[app.app_name] = {
-                    'duration': 0,
-                    'count': 0,
-                    'category': app.app_category,
-                }
-            summary[app.app_name]['duration'] += app.duration or 0
-            summary[app.app_name]['count'] += 1
-        
+        for app in self._get_app_totals([employee_id], date_from, date_to):
+            summary[app['app_name']] = {
+                'duration': app['duration'],
+                'count': app['count'],
+                'category': app['category'],
+            }
+
         return summary
 
+    @api.model
+    def _get_app_totals(self, employee_ids, date_from, date_to, limit=None):
+        """Usage per application of some employees over a date range, longest first
+
+        The category of an application is the one it was used the longest
+        under. Returns a list of dicts with ``app_name``, ``category``,
+        ``duration``, ``restricted_duration`` and ``count`` (sessions).
+        """
+        usage_query, usage_params = self.env['productivity.app.usage.daily']._get_app_usage_query()
+        self.env.cr.execute("""
+            SELECT app_name,
+                   SUM(duration) AS duration,
+                   SUM(restricted_duration),
+                   SUM(session_count),
+                   (ARRAY_AGG(app_category ORDER BY duration DESC, app_category))[1]
+            FROM (
+                SELECT app_name, app_category,
+                       SUM(duration) AS duration,
+                       SUM(restricted_duration) AS restricted_duration,
+                       SUM(session_count) AS session_count
+                FROM (""" + usage_query + """) usage
+                WHERE employee_id = ANY(%s) AND work_date BETWEEN %s AND %s
+                GROUP BY app_name, app_category
+            ) per_category
+            GROUP BY app_name
+            ORDER BY duration DESC, app_name
+            LIMIT %s
+        """, usage_params + [list(employee_ids), fields.Date.to_date(date_from), fields.Date.to_date(date_to), limit])
+        return [{
+            'app_name': app_name,
+            'category': category,
+            'duration': duration,
+            'restricted_duration': restricted_duration,
+            'count': count,
+        } for app_name, duration, restricted_duration, count, category in self.env.cr.fetchall()]
+
+    @api.model
+    def _get_analytics_employees(self, employee_ids=None, department_ids=None):
+        """Employees in the analytics scope: the given employees and departments, else the whole company"""
+        domain = [('company_id', 'in', self.env.companies.ids)]
+        if employee_ids and department_ids:
+            domain += ['|', ('id', 'in', employee_ids), ('department_id', 'child_of', department_ids)]
+        elif employee_ids:
+            domain.append(('id', 'in', employee_ids))
+        elif department_ids:
+            domain.append(('department_id', 'child_of', department_ids))
+        return self.env['hr.employee'].with_context(active_test=False).search(domain).ids
+
+    @api.model
+    def get_app_usage_analytics(self, date_from, date_to, employee_ids=None, department_ids=None,
+                                top_n=10, bucket='day', max_rows=None):
+        """App usage analytics of employees, departments or the company over a date range
+
+        Everything is aggregated in SQL so the payload only depends on
+        ``top_n`` and the number of histogram buckets, not on the number of
+        logged sessions. The histogram has one point per ``bucket`` ('day'
+        or 'hour', in the employee timezone) and is cut after ``max_rows``
+        points, ``truncated`` tells when that happened. Both limits are capped
+        at ``ANALYTICS_MAX_ROWS``.
+
+        Daily totals also cover days compacted into the rollups. Hourly
+        points are read from the raw logs, a session counts in the hour it
+        started.
+        """
+        if bucket not in self.ANALYTICS_BUCKETS:
+            raise ValueError(f"Unknown histogram bucket: {bucket}")
+        date_from = fields.Date.to_date(date_from)
+        date_to = fields.Date.to_date(date_to)
+        max_rows = self.ANALYTICS_MAX_ROWS if max_rows is None else int(max_rows)
+        top_n = int(top_n)
+        if max_rows < 1 or top_n < 1:
+            raise ValueError("top_n and max_rows must be positive")
+        max_rows = min(max_rows, self.ANALYTICS_MAX_ROWS)
+        top_n = min(top_n, max_rows)
+        employee_ids = self._get_analytics_employees(employee_ids, department_ids)
+        cr = self.env.cr
+
+        top_apps = self._get_app_totals(employee_ids, date_from, date_to, limit=top_n)
+
+        usage_query, usage_params = self.env['productivity.app.usage.daily']._get_app_usage_query()
+        cr.execute("""
+            SELECT app_category, SUM(duration), SUM(restricted_duration), SUM(session_count)
+            FROM (""" + usage_query + """) usage
+            WHERE employee_id = ANY(%s) AND work_date BETWEEN %s AND %s
+            GROUP BY app_category
+            ORDER BY SUM(duration) DESC, app_category
+        """, usage_params + [employee_ids, date_from, date_to])
+        categories = [{
+            'category': category,
+            'duration': duration,
+            'restricted_duration': restricted_duration,
+            'count': count,
+        } for category, duration, restricted_duration, count in cr.fetchall()]
+
+        if bucket == 'day':
+            cr.execute("""
+                SELECT work_date, SUM(duration), SUM(restricted_duration), SUM(session_count)
+                FROM (""" + usage_query + """) usage
+                WHERE employee_id = ANY(%s) AND work_date BETWEEN %s AND %s
+                GROUP BY work_date
+                ORDER BY work_date
+                LIMIT %s
+            """, usage_params + [employee_ids, date_from, date_to, max_rows + 1])
+        else:
+            self.flush_model(['employee_id', 'work_date', 'start_time', 'duration', 'is_restricted'])
+            cr.execute("""
+                SELECT date_trunc('hour', l.start_time AT TIME ZONE 'UTC' AT TIME ZONE COALESCE(r.tz, 'UTC')) AS hour,
+                       COALESCE(SUM(l.duration), 0),
+                       COALESCE(SUM(l.duration) FILTER (WHERE l.is_restricted), 0),
+                       COUNT(*)
+                FROM app_usage_log l
+                JOIN hr_employee e ON e.id = l.employee_id
+                LEFT JOIN resource_resource r ON r.id = e.resource_id
+                WHERE l.employee_id = ANY(%s) AND l.work_date BETWEEN %s AND %s
+                GROUP BY hour
+                ORDER BY hour
+                LIMIT %s
+            """, [employee_ids, date_from, date_to, max_rows + 1])
+        rows = cr.fetchall()
+        histogram = [{
+            'bucket': fields.Datetime.to_string(point) if bucket == 'hour' else fields.Date.to_string(point),
+            'duration': duration,
+            'restricted_duration': restricted_duration,
+            'count': count,
+        } for point, duration, restricted_duration, count in rows[:max_rows]]
+
+        return {
+            'date_from': fields.Date.to_string(date_from),
+            'date_to': fields.Date.to_string(date_to),
+            'employee_count': len(employee_ids),
+            'total_duration': sum(category['duration'] for category in categories),
+            'restricted_duration': sum(category['restricted_duration'] for category in categories),
+            'session_count': sum(category['count'] for category in categories),
+            'top_apps': top_apps,
+            'categories': categories,
+            'bucket': bucket,
+            'histogram': histogram,
+            'truncated': len(rows) > max_rows,
+        }
+
     def end_app_usage(self):
         """End app usage session"""
         self.ensure_one()
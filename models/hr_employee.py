@@ -0,0 +1,47 @@
+from odoo import models, api, tools
+
+
+class HrEmployee(models.Model):
+    _inherit = 'hr.employee'
+
+    # Changing any of these can change which employee a user is tracked as
+    _PRODUCTIVITY_CACHE_FIELDS = ('user_id', 'company_id', 'active')
+
+    @api.model
+    @tools.ormcache('user_id', 'company_id')
+    def _get_productivity_employee_id(self, user_id, company_id):
+        """Get the employee id a user is tracked as, preferring the given company"""
+        employees = self.sudo()
+        employee = employees.search([
+            ('user_id', '=', user_id),
+            ('company_id', '=', company_id),
+        ], limit=1)
+        return (employee or employees.search([('user_id', '=', user_id)], limit=1)).id
+
+    @api.model
+    def get_productivity_employee(self):
+        """Get the employee of the current user (cached per worker)"""
+        return self.browse(self._get_productivity_employee_id(self.env.uid, self.env.company.id))
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        employees = super().create(vals_list)
+        if any(vals.get('user_id') for vals in vals_list):
+            self.env.registry.clear_cache()
+        self.env['productivity.dashboard']._mark_dirty(employees.ids)
+        return employees
+
+    def write(self, vals):
+        result = super().write(vals)
+        if any(field in vals for field in self._PRODUCTIVITY_CACHE_FIELDS):
+            self.env.registry.clear_cache()
+        if any(field in vals for field in ('active', 'user_id', 'tz')):
+            self.env['productivity.dashboard']._mark_dirty(self.ids)
+        return result
+
+    def unlink(self):
+        has_users = any(self.mapped('user_id'))
+        result = super().unlink()
+        if has_users:
+            self.env.registry.clear_cache()
+        return result
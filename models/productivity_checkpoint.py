@@ -0,0 +1,37 @@
+from odoo import models, fields, api
+
+
+class ProductivityCheckpoint(models.AbstractModel):
+    _name = 'productivity.checkpoint'
+    _description = 'Progress of Productivity Jobs'
+
+    def init(self):
+        """Create the checkpoint table
+
+        Job progress (rollup watermark, import positions) is saved after
+        every batch; ir.config_parameter is not used for it because each of
+        its writes clears the registry cache of every worker.
+        """
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS productivity_checkpoint (
+                name VARCHAR PRIMARY KEY,
+                value VARCHAR,
+                write_date TIMESTAMP NOT NULL
+            )
+        """)
+
+    @api.model
+    def _get_checkpoint(self, name, default=None):
+        """Value saved under ``name``, or ``default``"""
+        self.env.cr.execute("SELECT value FROM productivity_checkpoint WHERE name = %s", [name])
+        row = self.env.cr.fetchone()
+        return row[0] if row else default
+
+    @api.model
+    def _set_checkpoint(self, name, value):
+        """Save ``value`` under ``name``, it is committed with the current transaction"""
+        self.env.cr.execute("""
+            INSERT INTO productivity_checkpoint (name, value, write_date)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (name) DO UPDATE SET value = EXCLUDED.value, write_date = EXCLUDED.write_date
+        """, [name, value, fields.Datetime.now()])
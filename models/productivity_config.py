@@ -1,4 +1,8 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
+from datetime import timedelta
+
+from .app_classifier import AppClassifier, DEFAULT_RESTRICTED_APPS
+from .productivity_rollup import LOGS_PURGED_CHECKPOINT, LOG_PURGE_BOUND_CHECKPOINT
 
 
 class ProductivityConfig(models.Model):
@@ -54,6 +58,12 @@ class ProductivityConfig(models.Model):
         help='Comma-separated list of apps to block. Pauses timer if detected.'
     )
     
+    app_session_gap_seconds = fields.Integer(
+        string='App Session Gap (seconds)',
+        default=120,
+        help='Consecutive samples of the same application closer than this are merged into one usage session'
+    )
+    
     # Activity tracking
     track_keyboard_events = fields.Boolean(
         string='Track Keyboard Events',
@@ -95,14 +105,20 @@ class ProductivityConfig(models.Model):
     
     # Data retention
     delete_old_activity_logs = fields.Boolean(
-        string='Auto-Delete Old Activity Logs',
+        string='Auto-Delete Old Logs',
         default=True
     )
     
     activity_log_retention_days = fields.Integer(
-        string='Activity Log Retention (days)',
+        string='Log Retention (days)',
         default=90,
-        help='Keep activity logs for X days, then delete'
+        help='Keep activity and app usage logs for X days, then delete them; their daily totals are kept'
+    )
+    
+    rollup_after_days = fields.Integer(
+        string='Roll Up Logs After (days)',
+        default=7,
+        help='Logs older than X days are compacted into daily totals used by reports'
     )
     
     company_id = fields.Many2one(
@@ -113,11 +129,19 @@ class ProductivityConfig(models.Model):
 
     @api.model
     def get_config(self):
-        """Get or create configuration"""
-        config = self.search([], limit=1)
-        if not config:
-            config = self.create({})
-        return config
+        """Get or create configuration of the current company"""
+        config_id = self._get_config_id(self.env.company.id)
+        if not config_id:
+            return self.create({})
+        return self.browse(config_id)
+
+    @api.model
+    @tools.ormcache('company_id')
+    def _get_config_id(self, company_id):
+        """Get the configuration id of a company, falling back to a shared one"""
+        configs = self.sudo()
+        config = configs.search([('company_id', 'in', [company_id, False])], order='company_id', limit=1)
+        return (config or configs.search([], limit=1)).id
 
     def get_restricted_apps_list(self):
         """Get list of restricted apps"""
@@ -126,26 +150,109 @@ class ProductivityConfig(models.Model):
         return []
 
     @api.model
-    def cleanup_old_data(self):
-        """Clean up old screenshots and activity logs based on retention settings"""
+    @tools.ormcache('self.env.company.id')
+    def _get_app_classifier(self):
+        """Get the compiled app classifier, built once per company and worker
+
+        The cache is cleared whenever a configuration is created or its
+        restricted apps change, which Odoo propagates to the other workers.
+        """
+        restricted_apps = [app for app in self.sudo().get_config().get_restricted_apps_list() if app]
+        return AppClassifier(restricted_apps or DEFAULT_RESTRICTED_APPS)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        configs = super().create(vals_list)
+        self.env.registry.clear_cache()
+        return configs
+
+    def write(self, vals):
+        result = super().write(vals)
+        if 'restricted_apps' in vals or 'company_id' in vals:
+            self.env.registry.clear_cache()
+        return result
+
+    def unlink(self):
+        result = super().unlink()
+        self.env.registry.clear_cache()
+        return result
+
+    def action_reclassify_app_usage(self):
+        """Apply the current restricted apps to all existing app usage logs"""
+        self.env['app.usage.log']._reclassify_all()
+        return True
+
+    @api.model
+    def cleanup_old_data(self, auto_commit=False):
+        """Clean up old screenshots, activity and app usage logs based on retention settings"""
         config = self.get_config()
         
         # Clean up old screenshots
-        if config.screenshot_retention_days > 0:
-            from datetime import datetime, timedelta
-            from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT
-            
-            cutoff_date = datetime.now() - timedelta(days=config.screenshot_retention_days)
+        if config.screenshot_retention_days > 0 and 'screenshot.log' in self.env:
+            cutoff_date = fields.Datetime.now() - timedelta(days=config.screenshot_retention_days)
             self.env['screenshot.log'].search([
-                ('create_date', '<', cutoff_date.strftime(DEFAULT_SERVER_DATETIME_FORMAT))
+                ('create_date', '<', cutoff_date)
             ]).unlink()
         
-        # Clean up old activity logs
-        if config.delete_old_activity_logs and config.activity_log_retention_days > 0:
-            from datetime import datetime, timedelta
-            from odoo.tools import DEFAULT_SERVER_DATETIME_FORMAT
-            
-            cutoff_date = datetime.now() - timedelta(days=config.activity_log_retention_days)
-            self.env['activity.log'].search([
-                ('create_date', '<', cutoff_date.strftime(DEFAULT_SERVER_DATETIME_FORMAT))
-            ]).unlink()
+        # Clean up old activity and app usage logs in batches. Logs not rolled up into the daily totals yet are kept.
+        watermark = self.env['productivity.app.usage.daily']._get_rollup_watermark()
+        if config.delete_old_activity_logs and config.activity_log_retention_days > 0 and watermark:
+            before_date = min(
+                fields.Date.today() - timedelta(days=config.activity_log_retention_days),
+                watermark + timedelta(days=1),
+            )
+            self._purge_logs(before_date, auto_commit=auto_commit)
+
+    @api.model
+    def _purge_logs(self, before_date, batch_size=10000, auto_commit=False):
+        """Delete the activity and app usage logs of the work dates before ``before_date`` in batches
+
+        The days changed since their rollup are rolled up again first, then
+        the highest log ids are saved as the purge bound: logs written into
+        the purged days later are added to the rollups instead of replacing
+        them. Each batch recounts the log counters of its tasks and is
+        committed when ``auto_commit`` is set. Returns the number of rows deleted.
+        """
+        rollup = self.env['productivity.app.usage.daily']
+        checkpoint = self.env['productivity.checkpoint']
+        purge_date = rollup._get_log_purge_date()
+        if purge_date:
+            # An interrupted or wider earlier purge is finished first
+            before_date = max(before_date, purge_date)
+        rollup._rollup_dirty_days(before=before_date)
+
+        models_bounds = []
+        for model_name in ('activity.log', 'app.usage.log'):
+            model = self.env[model_name]
+            model.flush_model()
+            self.env.cr.execute(f"SELECT MAX(id) FROM {model._table}")
+            bound = self.env.cr.fetchone()[0] or 0
+            checkpoint._set_checkpoint(LOG_PURGE_BOUND_CHECKPOINT % model._table, str(bound))
+            models_bounds.append((model, bound))
+        checkpoint._set_checkpoint(LOGS_PURGED_CHECKPOINT, fields.Date.to_string(before_date))
+        if auto_commit:
+            self.env.cr.commit()
+
+        deleted = 0
+        for model, bound in models_bounds:
+            while True:
+                self.env.cr.execute(f"""
+                    DELETE FROM {model._table} WHERE id IN (
+                        SELECT id FROM {model._table} WHERE work_date < %s AND id <= %s LIMIT %s
+                    )
+                    RETURNING task_id
+                """, [before_date, bound, batch_size])
+                rows = self.env.cr.fetchall()
+                deleted += len(rows)
+                model.invalidate_model()
+                self.env['productivity.task']._recompute_log_counters({task_id for task_id, in rows})
+                if auto_commit:
+                    self.env.cr.commit()
+                if len(rows) < batch_size:
+                    break
+        return deleted
+
+    @api.model
+    def _cron_maintain_log_storage(self):
+        """Scheduled action: apply the log retention"""
+        self.cleanup_old_data(auto_commit=True)
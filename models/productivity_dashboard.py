@@ -1,18 +1,22 @@
 from odoo import models, fields, api
 from datetime import datetime, timedelta
 
+# productivity.checkpoint name
+FULL_REFRESH_CHECKPOINT = 'dashboard_full_refresh'
+
 
 class ProductivityDashboard(models.Model):
     _name = 'productivity.dashboard'
     _description = 'Productivity Dashboard Statistics'
-    _auto = False  # This is a SQL view model
+    _order = 'employee_id'
 
-    employee_id = fields.Many2one('hr.employee', string='Employee', readonly=True)
+    # One row per active employee, kept up to date by _refresh_dashboard
+    employee_id = fields.Many2one('hr.employee', string='Employee', required=True, readonly=True, ondelete='cascade')
     user_id = fields.Many2one('res.users', string='User', readonly=True)
     
     # Current status
     is_currently_active = fields.Boolean(string='Currently Active', readonly=True)
-    current_task_id = fields.Many2one('productivity.task', string='Current Task', readonly=True)
+    current_task_id = fields.Many2one('productivity.task', string='Current Task', readonly=True, ondelete='set null')
     
     # Statistics (today)
     total_tasks_today = fields.Integer(string='Tasks Today', readonly=True)
@@ -20,7 +24,7 @@ class ProductivityDashboard(models.Model):
     total_paused_hours_today = fields.Float(string='Paused Hours Today', readonly=True)
     productive_time_today = fields.Float(string='Productive Time Today', readonly=True)
     
-    # Screenshots
+    # Screenshots - functionality removed, always 0
     total_screenshots_today = fields.Integer(string='Screenshots Today', readonly=True)
     productive_screenshots = fields.Integer(string='Productive Screenshots', readonly=True)
     unproductive_screenshots = fields.Integer(string='Unproductive Screenshots', readonly=True)
@@ -31,104 +35,186 @@ class ProductivityDashboard(models.Model):
     # Weekly stats
     total_working_hours_week = fields.Float(string='Working Hours This Week', readonly=True)
     total_tasks_week = fields.Integer(string='Tasks This Week', readonly=True)
-    
+
+    _sql_constraints = [
+        ('employee_id_unique', 'unique(employee_id)', 'There can only be one dashboard row per employee.'),
+    ]
+
+    # Every employee is refreshed at least this often, which moves each timezone's "today" window
+    FULL_REFRESH_INTERVAL = timedelta(hours=1)
+
     def init(self):
-        """Create SQL view for dashboard statistics"""
-        self._cr.execute("""
-            CREATE OR REPLACE VIEW productivity_dashboard AS (
-                SELECT 
-                    row_number() OVER () as id,
-                    e.id as employee_id,
-                    e.user_id as user_id,
-                    
-                    EXISTS(
-                        SELECT 1 FROM productivity_task pt 
-                        WHERE pt.employee_id = e.id 
-                        AND pt.state = 'running'
-                        LIMIT 1
-                    ) as is_currently_active,
-                    
-                    (
-                        SELECT id FROM productivity_task pt 
-                        WHERE pt.employee_id = e.id 
-                        AND pt.state = 'running'
-                        ORDER BY start_time DESC
-                        LIMIT 1
-                    ) as current_task_id,
-                    
-                    (
-                        SELECT COUNT(*) FROM productivity_task pt
-                        WHERE pt.employee_id = e.id
-                        AND DATE(pt.start_time AT TIME ZONE 'UTC') = CURRENT_DATE
-                    ) as total_tasks_today,
-                    
-                    (
-                        SELECT COALESCE(SUM(pt.total_working_time), 0) FROM productivity_task pt
-                        WHERE pt.employee_id = e.id
-                        AND DATE(pt.start_time AT TIME ZONE 'UTC') = CURRENT_DATE
-                    ) as total_working_hours_today,
-                    
-                    (
-                        SELECT COALESCE(SUM(pt.total_paused_time), 0) FROM productivity_task pt
-                        WHERE pt.employee_id = e.id
-                        AND DATE(pt.start_time AT TIME ZONE 'UTC') = CURRENT_DATE
-                    ) as total_paused_hours_today,
-                    
-                    (
-                        SELECT COALESCE(SUM(pt.total_working_time), 0) FROM productivity_task pt
-                        WHERE pt.employee_id = e.id
-                        AND DATE(pt.start_time AT TIME ZONE 'UTC') = CURRENT_DATE
-                    ) as productive_time_today,
-                    
-                    (
-                        SELECT COUNT(*) FROM screenshot_log sl
-                        INNER JOIN productivity_task pt ON sl.task_id = pt.id
-                        WHERE pt.employee_id = e.id
-                        AND DATE(sl.timestamp AT TIME ZONE 'UTC') = CURRENT_DATE
-                    ) as total_screenshots_today,
-                    
-                    (
-                        SELECT COUNT(*) FROM screenshot_log sl
-                        INNER JOIN productivity_task pt ON sl.task_id = pt.id
-                        WHERE pt.employee_id = e.id
-                        AND sl.is_productive = true
-                        AND DATE(sl.timestamp AT TIME ZONE 'UTC') = CURRENT_DATE
-                    ) as productive_screenshots,
-                    
-                    (
-                        SELECT COUNT(*) FROM screenshot_log sl
-                        INNER JOIN productivity_task pt ON sl.task_id = pt.id
-                        WHERE pt.employee_id = e.id
-                        AND sl.is_productive = false
-                        AND DATE(sl.timestamp AT TIME ZONE 'UTC') = CURRENT_DATE
-                    ) as unproductive_screenshots,
-                    
-                    (
-                        SELECT aul.app_name FROM app_usage_log aul
-                        INNER JOIN productivity_task pt ON aul.task_id = pt.id
-                        WHERE pt.employee_id = e.id
-                        AND DATE(aul.start_time AT TIME ZONE 'UTC') = CURRENT_DATE
-                        GROUP BY aul.app_name
-                        ORDER BY SUM(aul.duration) DESC
-                        LIMIT 1
-                    ) as most_used_app_today,
-                    
-                    (
-                        SELECT COALESCE(SUM(pt.total_working_time), 0) FROM productivity_task pt
-                        WHERE pt.employee_id = e.id
-                        AND pt.start_time >= (CURRENT_DATE - INTERVAL '7 days')
-                    ) as total_working_hours_week,
-                    
-                    (
-                        SELECT COUNT(*) FROM productivity_task pt
-                        WHERE pt.employee_id = e.id
-                        AND pt.start_time >= (CURRENT_DATE - INTERVAL '7 days')
-                    ) as total_tasks_week
-                    
-                FROM hr_employee e
-                WHERE e.active = true
+        """Create the queue of employees to refresh and fill the dashboard table on install and upgrade
+
+        The queue has no key: transactions only append to it, so they never
+        conflict with each other or with the refresh cron.
+        """
+        self.env.cr.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS productivity_dashboard_dirty (
+                employee_id INTEGER NOT NULL
             )
         """)
+        self._refresh_dashboard()
+
+    @api.model
+    def _refresh_dashboard(self, employee_ids=None):
+        """Recompute the dashboard rows of some employees (all when None) in one upsert
+
+        Rows are updated in place, so their ids stay stable and readers are
+        never blocked; rows whose values did not change are left untouched.
+        """
+        if employee_ids is not None and not employee_ids:
+            return
+        self.env['productivity.task'].flush_model()
+        self.env['app.usage.log'].flush_model()
+        self.env['hr.employee'].flush_model(['active', 'user_id', 'resource_id'])
+        self.env['resource.resource'].flush_model(['tz'])
+
+        params = {
+            'all': employee_ids is None,
+            'employee_ids': list(employee_ids or []),
+            'uid': self.env.uid,
+        }
+        # "Today" is the current day in the timezone of each employee
+        self.env.cr.execute("""
+            WITH employees AS (
+                SELECT e.id, e.user_id, (NOW() AT TIME ZONE COALESCE(r.tz, 'UTC'))::date AS today
+                FROM hr_employee e
+                JOIN resource_resource r ON r.id = e.resource_id
+                WHERE e.active AND (%(all)s OR e.id = ANY(%(employee_ids)s))
+            ),
+            task_times AS (
+                -- Stored totals stop at the last write, running and paused tasks add their open segment
+                SELECT pt.*,
+                       CASE WHEN pt.state = 'running' THEN (COALESCE(pt.worked_seconds, 0) + GREATEST(0,
+                           EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC') - COALESCE(pt.segment_start, pt.start_time))
+                       )) / 3600 ELSE pt.total_working_time END AS working_hours,
+                       CASE WHEN pt.state = 'paused' THEN (COALESCE(pt.paused_seconds, 0) + GREATEST(0,
+                           EXTRACT(EPOCH FROM (NOW() AT TIME ZONE 'UTC')
+                                   - COALESCE(pt.segment_start, pt.pause_time, pt.start_time))
+                       )) / 3600 ELSE pt.total_paused_time END AS paused_hours
+                FROM productivity_task pt
+                JOIN employees e ON e.id = pt.employee_id
+                WHERE pt.state = 'running' OR pt.work_date >= e.today - 7
+            ),
+            tasks AS (
+                SELECT pt.employee_id,
+                       BOOL_OR(pt.state = 'running') AS is_currently_active,
+                       (ARRAY_AGG(pt.id ORDER BY pt.start_time DESC NULLS LAST)
+                           FILTER (WHERE pt.state = 'running'))[1] AS current_task_id,
+                       COUNT(*) FILTER (WHERE pt.work_date = e.today) AS tasks_today,
+                       SUM(pt.working_hours) FILTER (WHERE pt.work_date = e.today) AS working_today,
+                       SUM(pt.paused_hours) FILTER (WHERE pt.work_date = e.today) AS paused_today,
+                       COUNT(*) FILTER (WHERE pt.work_date >= e.today - 7) AS tasks_week,
+                       SUM(pt.working_hours) FILTER (WHERE pt.work_date >= e.today - 7) AS working_week
+                FROM task_times pt
+                JOIN employees e ON e.id = pt.employee_id
+                GROUP BY pt.employee_id
+            ),
+            apps AS (
+                SELECT DISTINCT ON (employee_id) employee_id, app_name
+                FROM (
+                    SELECT aul.employee_id, aul.app_name, SUM(aul.duration) AS duration
+                    FROM app_usage_log aul
+                    JOIN employees e ON e.id = aul.employee_id
+                    WHERE aul.work_date = e.today
+                    GROUP BY aul.employee_id, aul.app_name
+                ) usage
+                ORDER BY employee_id, duration DESC NULLS LAST, app_name
+            )
+            INSERT INTO productivity_dashboard (
+                employee_id, user_id, is_currently_active, current_task_id,
+                total_tasks_today, total_working_hours_today, total_paused_hours_today, productive_time_today,
+                total_screenshots_today, productive_screenshots, unproductive_screenshots,
+                most_used_app_today, total_working_hours_week, total_tasks_week,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT e.id, e.user_id, COALESCE(t.is_currently_active, false), t.current_task_id,
+                   COALESCE(t.tasks_today, 0), COALESCE(t.working_today, 0), COALESCE(t.paused_today, 0),
+                   COALESCE(t.working_today, 0),
+                   0, 0, 0,
+                   a.app_name, COALESCE(t.working_week, 0), COALESCE(t.tasks_week, 0),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            FROM employees e
+            LEFT JOIN tasks t ON t.employee_id = e.id
+            LEFT JOIN apps a ON a.employee_id = e.id
+            ON CONFLICT (employee_id) DO UPDATE SET
+                user_id = EXCLUDED.user_id,
+                is_currently_active = EXCLUDED.is_currently_active,
+                current_task_id = EXCLUDED.current_task_id,
+                total_tasks_today = EXCLUDED.total_tasks_today,
+                total_working_hours_today = EXCLUDED.total_working_hours_today,
+                total_paused_hours_today = EXCLUDED.total_paused_hours_today,
+                productive_time_today = EXCLUDED.productive_time_today,
+                most_used_app_today = EXCLUDED.most_used_app_today,
+                total_working_hours_week = EXCLUDED.total_working_hours_week,
+                total_tasks_week = EXCLUDED.total_tasks_week,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date
+            WHERE (
+                productivity_dashboard.user_id, productivity_dashboard.is_currently_active,
+                productivity_dashboard.current_task_id, productivity_dashboard.total_tasks_today,
+                productivity_dashboard.total_working_hours_today, productivity_dashboard.total_paused_hours_today,
+                productivity_dashboard.most_used_app_today, productivity_dashboard.total_working_hours_week,
+                productivity_dashboard.total_tasks_week
+            ) IS DISTINCT FROM (
+                EXCLUDED.user_id, EXCLUDED.is_currently_active,
+                EXCLUDED.current_task_id, EXCLUDED.total_tasks_today,
+                EXCLUDED.total_working_hours_today, EXCLUDED.total_paused_hours_today,
+                EXCLUDED.most_used_app_today, EXCLUDED.total_working_hours_week,
+                EXCLUDED.total_tasks_week
+            )
+        """, params)
+
+        # Archived employees leave the dashboard
+        self.env.cr.execute("""
+            DELETE FROM productivity_dashboard d
+            USING hr_employee e
+            WHERE e.id = d.employee_id
+            AND NOT e.active
+            AND (%(all)s OR d.employee_id = ANY(%(employee_ids)s))
+        """, params)
+        self.invalidate_model()
+
+    @api.model
+    def _mark_dirty(self, employee_ids):
+        """Queue the dashboard rows of these employees for the next refresh, when the transaction commits"""
+        employee_ids = {employee_id for employee_id in employee_ids if employee_id}
+        if not employee_ids:
+            return
+        dirty = self.env.cr.precommit.data.setdefault('productivity.dashboard.dirty', set())
+        if not dirty:
+            self.env.cr.precommit.add(self._queue_dirty)
+        dirty.update(employee_ids)
+
+    @api.model
+    def _queue_dirty(self):
+        dirty = self.env.cr.precommit.data.pop('productivity.dashboard.dirty', set())
+        self.env.cr.execute("INSERT INTO productivity_dashboard_dirty (employee_id) SELECT unnest(%s::int[])",
+                            [list(dirty)])
+
+    @api.model
+    def _cron_refresh_dashboard(self):
+        """Scheduled action: refresh the queued employees and the ones with a running or paused task,
+        and every employee once per FULL_REFRESH_INTERVAL
+
+        This cron is the only writer of the dashboard rows. Working and paused
+        hours include the open segment of running and paused tasks up to the
+        refresh time.
+        """
+        checkpoint = self.env['productivity.checkpoint']
+        now = fields.Datetime.now()
+        last_full = checkpoint._get_checkpoint(FULL_REFRESH_CHECKPOINT)
+        self.env.cr.execute("DELETE FROM productivity_dashboard_dirty RETURNING employee_id")
+        employee_ids = {row[0] for row in self.env.cr.fetchall()}
+        if last_full and now - fields.Datetime.to_datetime(last_full) < self.FULL_REFRESH_INTERVAL:
+            self.env['productivity.task'].flush_model(['employee_id', 'state'])
+            self.env.cr.execute("SELECT DISTINCT employee_id FROM productivity_task WHERE state IN ('running', 'paused')")
+            employee_ids.update(row[0] for row in self.env.cr.fetchall())
+            self._refresh_dashboard(employee_ids)
+        else:
+            self._refresh_dashboard()
+            checkpoint._set_checkpoint(FULL_REFRESH_CHECKPOINT, fields.Datetime.to_string(now))
 
 
 class ProductivitySummaryReport(models.TransientModel):
@@ -153,8 +239,8 @@ class ProductivitySummaryReport(models.TransientModel):
         for record in self:
             tasks = self.env['productivity.task'].search([
                 ('employee_id', '=', record.employee_id.id),
-                ('start_time', '>=', fields.Datetime.to_string(datetime.combine(record.date_from, datetime.min.time()))),
-                ('start_time', '<=', fields.Datetime.to_string(datetime.combine(record.date_to, datetime.max.time()))),
+                ('work_date', '>=', record.date_from),
+                ('work_date', '<=', record.date_to),
             ])
             
             record.total_tasks = len(tasks)
@@ -184,8 +270,8 @@ class ProductivitySummaryReport(models.TransientModel):
             'view_mode': 'list,form',
             'domain': [
                 ('employee_id', '=', self.employee_id.id),
-                ('start_time', '>=', fields.Datetime.to_string(datetime.combine(self.date_from, datetime.min.time()))),
-                ('start_time', '<=', fields.Datetime.to_string(datetime.combine(self.date_to, datetime.max.time()))),
+                ('work_date', '>=', self.date_from),
+                ('work_date', '<=', self.date_to),
             ],
         }
     
@@ -194,8 +280,8 @@ class ProductivitySummaryReport(models.TransientModel):
         self.ensure_one()
         task_ids = self.env['productivity.task'].search([
             ('employee_id', '=', self.employee_id.id),
-            ('start_time', '>=', fields.Datetime.to_string(datetime.combine(self.date_from, datetime.min.time()))),
-            ('start_time', '<=', fields.Datetime.to_string(datetime.combine(self.date_to, datetime.max.time()))),
+            ('work_date', '>=', self.date_from),
+            ('work_date', '<=', self.date_to),
         ]).ids
         
         return {
@@ -0,0 +1,293 @@
+from odoo import models, fields, api
+from datetime import datetime, timezone
+
+
+class ProductivityIngest(models.AbstractModel):
+    _name = 'productivity.ingest'
+    _description = 'Productivity Event Ingestion'
+
+    EVENT_TYPES = ('app_start', 'app_end', 'app_sample', 'activity', 'pause', 'resume', 'heartbeat', 'input', 'away')
+
+    @api.model
+    def _parse_timestamp(self, value):
+        """Convert a client timestamp (ISO 8601, UTC or with offset) to a naive UTC datetime"""
+        if not value:
+            return fields.Datetime.now()
+        if isinstance(value, datetime):
+            parsed = value
+        else:
+            parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+        if parsed.tzinfo:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed.replace(microsecond=0)
+
+    @api.model
+    def _find_client_events(self, model_name, client_event_ids):
+        """Map already stored client event ids of ``model_name`` to record ids"""
+        client_event_ids = [key for key in client_event_ids if key]
+        if not client_event_ids:
+            return {}
+        records = self.env[model_name].search_read(
+            [('client_event_id', 'in', client_event_ids)], ['client_event_id'])
+        return {record['client_event_id']: record['id'] for record in records}
+
+    @api.model
+    def ingest_events(self, events):
+        """Apply an ordered list of tracker events in one transaction, returning one result dict per event
+
+        Log rows are buffered and created with one create per model, client
+        event ids already stored are reported as duplicates so a batch can
+        be replayed safely.
+        """
+        events = [event if isinstance(event, dict) else {} for event in events]
+        results = [None] * len(events)
+        task_ids = {event.get('task_id') for event in events if event.get('task_id')}
+        tasks = {task.id: task for task in self.env['productivity.task'].browse(list(task_ids)).exists()}
+        activity_types = self.env['activity.log']._fields['activity_type'].get_values(self.env)
+
+        # client ref -> app.usage.log id, for rows stored by earlier batches
+        known_refs = self._find_client_events('app.usage.log', {
+            event.get('client_event_id') if event.get('type') == 'app_start' else event.get('ref')
+            for event in events if event.get('type') in ('app_start', 'app_end')
+        })
+        known_activities = self._find_client_events('activity.log', {
+            event.get('client_event_id') for event in events if event.get('type') == 'activity'
+        })
+        known_aways = self._find_client_events('app.usage.log', {
+            event.get('client_event_id') for event in events if event.get('type') == 'away'
+        })
+
+        pending_app = []        # (result index, vals)
+        pending_activity = []   # (result index, vals)
+        pending_samples = []    # (result index, sample)
+        pending_refs = {}       # client ref -> (result index, vals) of a buffered app_start
+        seen_activities = {}    # client event id -> result index of a buffered activity
+        duplicates = []         # (result index, result index of the original event)
+        ended_ids = {}          # app.usage.log id -> (result index, end time)
+        heartbeats = {}         # task id -> (result indexes, latest input time)
+        input_samples = []      # (result index, sample)
+
+        def fail(indexes, error):
+            for index in indexes:
+                results[index] = {'status': 'error', 'message': str(error)}
+
+        def flush():
+            # Each create runs in a savepoint: a failure only fails the events it was buffering
+            for model_name, pending in (('app.usage.log', pending_app), ('activity.log', pending_activity)):
+                if not pending:
+                    continue
+                try:
+                    with self.env.cr.savepoint():
+                        records = self.env[model_name].create([vals for __, vals in pending])
+                except Exception as e:
+                    fail([index for index, __ in pending], e)
+                else:
+                    for (index, __), record in zip(pending, records):
+                        results[index] = {'status': 'success', 'id': record.id}
+                pending.clear()
+            for ref, (index, __) in pending_refs.items():
+                if results[index]['status'] == 'success':
+                    known_refs[ref] = results[index]['id']
+            pending_refs.clear()
+            if pending_samples:
+                try:
+                    with self.env.cr.savepoint():
+                        session_ids = self.env['app.usage.log'].record_app_samples(
+                            [sample for __, sample in pending_samples])
+                except Exception as e:
+                    fail([index for index, __ in pending_samples], e)
+                else:
+                    for (index, __), session_id in zip(pending_samples, session_ids):
+                        results[index] = {'status': 'success' if session_id else 'ignored', 'id': session_id}
+                pending_samples.clear()
+
+        for index, event in enumerate(events):
+            try:
+                event_type = event.get('type')
+                if event_type not in self.EVENT_TYPES:
+                    raise ValueError(f'Unknown event type: {event_type}')
+                timestamp = self._parse_timestamp(event.get('timestamp'))
+
+                if event_type == 'app_end':
+                    ref = event.get('ref')
+                    if ref in pending_refs:
+                        start_index, vals = pending_refs[ref]
+                        vals['end_time'] = timestamp
+                        duplicates.append((index, start_index))
+                    elif ref in known_refs or event.get('app_usage_id'):
+                        ended_ids[known_refs.get(ref) or int(event['app_usage_id'])] = (index, timestamp)
+                    else:
+                        raise ValueError('app_end requires a known ref or app_usage_id')
+                    continue
+
+                task = tasks.get(event.get('task_id'))
+                if not task:
+                    raise ValueError(f"Task {event.get('task_id')} not found")
+
+                client_event_id = event.get('client_event_id')
+
+                if event_type == 'app_start':
+                    ref = client_event_id or event.get('ref')
+                    if client_event_id and client_event_id in known_refs:
+                        results[index] = {'status': 'duplicate', 'id': known_refs[client_event_id]}
+                        continue
+                    if client_event_id and client_event_id in pending_refs:
+                        duplicates.append((index, pending_refs[client_event_id][0]))
+                        continue
+                    if not event.get('app_name'):
+                        raise ValueError('app_start requires app_name')
+                    vals = {
+                        'task_id': task.id,
+                        'employee_id': task.employee_id.id,
+                        'app_name': event['app_name'],
+                        'start_time': timestamp,
+                    }
+                    if client_event_id:
+                        vals['client_event_id'] = client_event_id
+                    if event.get('app_path'):
+                        vals['app_path'] = event['app_path']
+                    if event.get('window_title'):
+                        vals['window_title'] = event['window_title']
+                    pending_app.append((index, vals))
+                    if ref:
+                        pending_refs[ref] = (index, vals)
+                elif event_type == 'app_sample':
+                    if not event.get('app_name'):
+                        raise ValueError('app_sample requires app_name')
+                    pending_samples.append((index, {
+                        'task': task,
+                        'app_name': event['app_name'],
+                        'app_path': event.get('app_path'),
+                        'window_title': event.get('window_title'),
+                        'timestamp': timestamp,
+                        'final': bool(event.get('final')),
+                    }))
+                elif event_type == 'activity':
+                    if client_event_id and client_event_id in known_activities:
+                        results[index] = {'status': 'duplicate', 'id': known_activities[client_event_id]}
+                        continue
+                    if client_event_id and client_event_id in seen_activities:
+                        duplicates.append((index, seen_activities[client_event_id]))
+                        continue
+                    if event.get('activity_type') not in activity_types:
+                        raise ValueError(f"Unknown activity type: {event.get('activity_type')}")
+                    vals = {
+                        'task_id': task.id,
+                        'employee_id': task.employee_id.id,
+                        'activity_type': event.get('activity_type'),
+                        'description': event.get('description', ''),
+                        'start_time': timestamp,
+                    }
+                    if client_event_id:
+                        vals['client_event_id'] = client_event_id
+                        seen_activities[client_event_id] = index
+                    if event.get('app_name'):
+                        vals['app_name'] = event['app_name']
+                    pending_activity.append((index, vals))
+                elif event_type == 'heartbeat':
+                    indexes, latest = heartbeats.get(task.id, ([], timestamp))
+                    indexes.append(index)
+                    heartbeats[task.id] = (indexes, max(latest, timestamp))
+                elif event_type == 'input':
+                    input_samples.append((index, {
+                        'task': task,
+                        'timestamp': timestamp,
+                        'keyboard_events': event.get('keyboard_events'),
+                        'mouse_events': event.get('mouse_events'),
+                        'client_event_id': client_event_id,
+                    }))
+                elif event_type == 'away':
+                    if client_event_id and client_event_id in known_aways:
+                        results[index] = {'status': 'duplicate', 'id': known_aways[client_event_id]}
+                        continue
+                    flush()
+                    with self.env.cr.savepoint():
+                        result = task.record_away_interval(
+                            self._parse_timestamp(event.get('away_start')),
+                            self._parse_timestamp(event.get('away_end') or event.get('timestamp')),
+                            application_name=event.get('application_name'),
+                            client_event_id=client_event_id,
+                        )
+                    results[index] = dict(result, id=task.id)
+                    if client_event_id:
+                        known_aways[client_event_id] = task.id
+                elif event_type == 'pause':
+                    flush()
+                    if task.state == 'running':
+                        with self.env.cr.savepoint():
+                            task.action_pause_timer()
+                    results[index] = {'status': 'success', 'id': task.id, 'state': task.state}
+                elif event_type == 'resume':
+                    flush()
+                    if task.state == 'paused':
+                        with self.env.cr.savepoint():
+                            task.action_resume_timer()
+                    results[index] = {'status': 'success', 'id': task.id, 'state': task.state}
+            except Exception as e:
+                results[index] = {'status': 'error', 'message': str(e)}
+
+        flush()
+
+        if heartbeats or input_samples:
+            writable_ids = set(self.env['productivity.task'].browse(
+                list(heartbeats) + [sample['task'].id for __, sample in input_samples]
+            )._filtered_access('write').ids)
+
+            def task_result(task_id):
+                if task_id in writable_ids:
+                    return {'status': 'success', 'id': task_id}
+                return {'status': 'error', 'message': f'No write access to task {task_id}'}
+
+            try:
+                with self.env.cr.savepoint():
+                    self.env['productivity.task']._record_heartbeats({
+                        task_id: latest for task_id, (__, latest) in heartbeats.items() if task_id in writable_ids
+                    })
+            except Exception as e:
+                fail([index for indexes, __ in heartbeats.values() for index in indexes], e)
+            else:
+                for task_id, (indexes, __) in heartbeats.items():
+                    for index in indexes:
+                        results[index] = task_result(task_id)
+
+            writable_inputs = [(index, sample) for index, sample in input_samples if sample['task'].id in writable_ids]
+            try:
+                # Raw SQL only, no ORM write to flush
+                with self.env.cr.savepoint(flush=False):
+                    counted = self.env['productivity.input.counter']._record_input(
+                        [sample for __, sample in writable_inputs])
+            except Exception as e:
+                fail([index for index, __ in input_samples], e)
+            else:
+                for index, sample in input_samples:
+                    results[index] = task_result(sample['task'].id)
+                for (index, __), is_counted in zip(writable_inputs, counted):
+                    if not is_counted:
+                        # Already counted (replay) or too old to be deduplicated
+                        results[index]['status'] = 'ignored'
+
+        for index, original_index in duplicates:
+            results[index] = dict(results[original_index])
+            if events[index].get('type') != 'app_end' and results[index]['status'] == 'success':
+                results[index]['status'] = 'duplicate'
+
+        if ended_ids:
+            usages = self.env['app.usage.log'].browse(list(ended_ids)).exists()
+            by_time = {}
+            for usage in usages:
+                index, end_time = ended_ids.pop(usage.id)
+                by_time.setdefault(end_time, [])
+                by_time[end_time].append((index, usage))
+            for end_time, ended in by_time.items():
+                try:
+                    with self.env.cr.savepoint():
+                        self.env['app.usage.log'].union(*[usage for __, usage in ended]).write({'end_time': end_time})
+                except Exception as e:
+                    fail([index for index, __ in ended], e)
+                else:
+                    for index, usage in ended:
+                        results[index] = {'status': 'success', 'id': usage.id}
+            for usage_id, (index, __) in ended_ids.items():
+                results[index] = {'status': 'error', 'message': f'App usage {usage_id} not found'}
+
+        return results
@@ -0,0 +1,143 @@
+from odoo import models, fields, api
+from collections import defaultdict
+from datetime import timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+
+class ProductivityInputCounter(models.AbstractModel):
+    _name = 'productivity.input.counter'
+    _description = 'Input Counters per Task and Minute'
+
+    # Input events are deduplicated for this long, about as long as a client queue replays;
+    # older input events are ignored
+    INPUT_EVENT_RETENTION_HOURS = 6
+
+    def init(self):
+        """Create the counter table: unlogged, it only buffers counts until the next compaction
+
+        The client event ids of the recently counted input events are kept,
+        unlogged as well, so a replayed event is not counted twice even
+        after its counts were compacted.
+        """
+        self.env.cr.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS productivity_input_event (
+                client_event_id VARCHAR PRIMARY KEY,
+                received_at TIMESTAMP NOT NULL
+            )
+        """)
+        self.env.cr.execute("""
+            CREATE UNLOGGED TABLE IF NOT EXISTS productivity_input_counter (
+                task_id INTEGER NOT NULL REFERENCES productivity_task(id) ON DELETE CASCADE,
+                minute TIMESTAMP NOT NULL,
+                employee_id INTEGER NOT NULL,
+                keyboard_events INTEGER NOT NULL DEFAULT 0,
+                mouse_events INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (task_id, minute)
+            )
+        """)
+
+    @api.model
+    def _record_input(self, samples):
+        """Add input counts to the per-minute counters with a single upsert
+
+        ``samples`` is a list of dicts with ``task`` (a productivity.task),
+        ``timestamp``, ``keyboard_events``, ``mouse_events`` and optionally
+        ``client_event_id``. A sample whose client event id was already
+        counted, or older than the deduplication window, is skipped. Counts
+        of input types disabled in the configuration are dropped.
+        Returns whether each sample was counted.
+        """
+        config = self.env['productivity.config'].sudo().get_config()
+        now = fields.Datetime.now()
+        oldest = now - timedelta(hours=self.INPUT_EVENT_RETENTION_HOURS)
+
+        client_event_ids = list({
+            sample['client_event_id'] for sample in samples
+            if sample.get('client_event_id') and sample['timestamp'] >= oldest
+        })
+        new_event_ids = set()
+        if client_event_ids:
+            self.env.cr.execute("""
+                INSERT INTO productivity_input_event (client_event_id, received_at)
+                SELECT unnest(%s::varchar[]), %s
+                ON CONFLICT (client_event_id) DO NOTHING
+                RETURNING client_event_id
+            """, [client_event_ids, now])
+            new_event_ids = {row[0] for row in self.env.cr.fetchall()}
+
+        counters = defaultdict(lambda: [0, 0])
+        employees = {}
+        counted = []
+        for sample in samples:
+            client_event_id = sample.get('client_event_id')
+            if sample['timestamp'] < oldest or (client_event_id and client_event_id not in new_event_ids):
+                counted.append(False)
+                continue
+            # Repeated within the batch: only the first one counts
+            new_event_ids.discard(client_event_id)
+            counted.append(True)
+            task = sample['task']
+            key = (task.id, sample['timestamp'].replace(second=0, microsecond=0))
+            employees[task.id] = task.employee_id.id
+            if config.track_keyboard_events:
+                counters[key][0] += max(int(sample.get('keyboard_events') or 0), 0)
+            if config.track_mouse_events:
+                counters[key][1] += max(int(sample.get('mouse_events') or 0), 0)
+        counters = {key: counts for key, counts in counters.items() if any(counts)}
+        if not counters:
+            return counted
+
+        keys = list(counters)
+        self.env.cr.execute("""
+            INSERT INTO productivity_input_counter AS c (task_id, minute, employee_id, keyboard_events, mouse_events)
+            SELECT * FROM unnest(%s::int[], %s::timestamp[], %s::int[], %s::int[], %s::int[])
+            ON CONFLICT (task_id, minute) DO UPDATE
+            SET keyboard_events = c.keyboard_events + EXCLUDED.keyboard_events,
+                mouse_events = c.mouse_events + EXCLUDED.mouse_events
+        """, [
+            [task_id for task_id, __ in keys],
+            [minute for __, minute in keys],
+            [employees[task_id] for task_id, __ in keys],
+            [counters[key][0] for key in keys],
+            [counters[key][1] for key in keys],
+        ])
+        return counted
+
+    @api.model
+    def _cron_compact_input_counters(self):
+        """Scheduled action: fold the counters of past minutes into ``user_activity`` activity rows
+
+        The counters are deleted and returned in one statement, then each
+        task gets one row spanning its compacted minutes. Counters of the
+        current minute are left for the next run. Client event ids older
+        than the deduplication window are pruned.
+        """
+        now = fields.Datetime.now()
+        self.env.cr.execute("DELETE FROM productivity_input_event WHERE received_at < %s",
+                            [now - timedelta(hours=self.INPUT_EVENT_RETENTION_HOURS)])
+        before = now.replace(second=0, microsecond=0)
+        self.env.cr.execute("""
+            WITH compacted AS (
+                DELETE FROM productivity_input_counter WHERE minute < %s
+                RETURNING *
+            )
+            SELECT task_id, employee_id, MIN(minute), MAX(minute),
+                   SUM(keyboard_events), SUM(mouse_events), COUNT(*)
+            FROM compacted
+            GROUP BY task_id, employee_id
+        """, [before])
+        rows = self.env.cr.fetchall()
+        self.env['activity.log'].create([{
+            'task_id': task_id,
+            'employee_id': employee_id,
+            'activity_type': 'user_activity',
+            'start_time': first_minute,
+            'end_time': last_minute + timedelta(minutes=1),
+            'keyboard_events': keyboard_events,
+            'mouse_events': mouse_events,
+            'description': f'Input during {active_minutes} active minute(s)',
+        } for task_id, employee_id, first_minute, last_minute, keyboard_events, mouse_events, active_minutes in rows])
+        if rows:
+            _logger.info("Compacted input counters of %s tasks", len(rows))
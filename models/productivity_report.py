@@ -1,5 +1,9 @@
-from odoo import models, fields, api
-from datetime import datetime, timedelta
+from odoo import models, fields, api, tools, Command
+from datetime import datetime, time, timedelta
+import logging
+import pytz
+
+_logger = logging.getLogger(__name__)
 
 
 class ProductivityReport(models.Model):
@@ -53,6 +57,11 @@ class ProductivityReport(models.Model):
     
     create_date = fields.Datetime(string='Created', readonly=True)
 
+    def init(self):
+        """Index for the existing report lookups"""
+        tools.create_index(self._cr, 'productivity_report_employee_period_idx', self._table,
+                           ['employee_id', 'report_type', 'period_start', 'period_end'])
+
     @api.depends('employee_id', 'period_start', 'period_end', 'report_type')
     def _compute_name(self):
         """Compute report name"""
@@ -66,74 +75,109 @@ class ProductivityReport(models.Model):
 
     @api.depends('period_start', 'period_end', 'employee_id')
     def _compute_metrics(self):
-        """Compute productivity metrics"""
+        """Compute productivity metrics for all reports with grouped queries"""
+        periods = {}
         for record in self:
             if record.employee_id and record.period_start and record.period_end:
-                # Get all tasks for this employee in the period
-                tasks = self.env['productivity.task'].search([
-                    ('employee_id', '=', record.employee_id.id),
-                    ('create_date', '>=', f"{record.period_start} 00:00:00"),
-                    ('create_date', '<=', f"{record.period_end} 23:59:59"),
-                ])
-                
-                total_work = sum(task.total_working_time for task in tasks)
-                total_paused = sum(task.total_paused_time for task in tasks)
-                
+                periods.setdefault(record._get_metric_period(), len(periods))
+        task_metrics, app_metrics = self._read_period_metrics(periods)
+
+        for record in self:
+            if record.employee_id and record.period_start and record.period_end:
+                key = periods[record._get_metric_period()]
+                total_work, total_paused, completed, task_ids = task_metrics.get(key, (0, 0, 0, []))
+
                 # Calculate metrics
                 record.total_working_hours = total_work
                 record.total_paused_hours = total_paused
-                record.tasks_completed = len(tasks.filtered(lambda t: t.state == 'completed'))
-                
-                # Screenshots - functionality removed
-                # screenshots = self.env['screenshot.log'].search([
-                #     ('employee_id', '=', record.employee_id.id),
-                #     ('create_date', '>=', f"{record.period_start} 00:00:00"),
-                #     ('create_date', '<=', f"{record.period_end} 23:59:59"),
-                # ])
-                # record.screenshot_ids = screenshots
-                # record.screenshots_captured = len(screenshots)
-                
+                record.total_idle_hours = 0
+                record.tasks_completed = completed
+
                 # Calculate productivity percentage
                 total_time = total_work + total_paused
                 if total_time > 0:
                     record.productivity_percentage = (total_work / total_time) * 100
                 else:
                     record.productivity_percentage = 0
-                
-                # Get app usage summary
-                app_usage = self.env['app.usage.log'].search([
-                    ('employee_id', '=', record.employee_id.id),
-                    ('start_time', '>=', f"{record.period_start} 00:00:00"),
-                    ('start_time', '<=', f"{record.period_end} 23:59:59"),
-                ])
-                
-                if app_usage:
-                    # Find most used app
-                    app_durations = {}
-                    for usage in app_usage:
-                        if usage.app_name not in app_durations:
-                            app_durations[usage.app_name] = 0
-                        app_durations[usage.app_name] += usage.duration or 0
-                    
-                    if app_durations:
-                        most_used = max(app_durations, key=app_durations.get)
-                        record.most_used_app = most_used
-                    
-                    # Calculate restricted app time
-                    restricted_time = sum(
-                        usage.duration or 0 for usage in app_usage
-                        if usage.is_restricted
-                    )
-                    record.restricted_app_time = restricted_time / 60  # Convert to hours
-                
-                record.task_ids = tasks
+
+                if key in app_metrics:
+                    most_used, restricted_minutes = app_metrics[key]
+                    record.most_used_app = most_used
+                    record.restricted_app_time = restricted_minutes / 60  # Convert to hours
+
+                record.task_ids = [Command.set(task_ids)]
             else:
                 record.total_working_hours = 0
                 record.total_paused_hours = 0
                 record.total_idle_hours = 0
                 record.productivity_percentage = 0
                 record.tasks_completed = 0
-                # record.screenshots_captured = 0  # Screenshot functionality removed
+
+    def _get_metric_period(self):
+        """Employee and work dates covered by the report"""
+        return (self.employee_id._origin.id, self.period_start, self.period_end)
+
+    def _read_period_metrics(self, periods):
+        """Aggregate task and app usage metrics for many (employee, start, end) periods
+
+        ``periods`` maps ``(employee_id, date_from, date_to)`` to a key, the
+        dates being inclusive work dates in the employee timezone.
+        Returns two dicts keyed by that key: ``(working hours, paused hours,
+        completed tasks, task ids)`` and ``(most used app, restricted minutes)``.
+        """
+        if not periods:
+            return {}, {}
+        self.env['productivity.task'].flush_model(
+            ['employee_id', 'work_date', 'state', 'total_working_time', 'total_paused_time'])
+
+        keys, employee_ids, dates_from, dates_to = [], [], [], []
+        for (employee_id, date_from, date_to), key in periods.items():
+            keys.append(key)
+            employee_ids.append(employee_id)
+            dates_from.append(date_from)
+            dates_to.append(date_to)
+        params = [keys, employee_ids, dates_from, dates_to]
+        periods_sql = """
+            WITH periods AS (
+                SELECT * FROM unnest(%s::int[], %s::int[], %s::date[], %s::date[])
+                    AS p(key, employee_id, date_from, date_to)
+            )
+        """
+
+        self.env.cr.execute(periods_sql + """
+            SELECT p.key,
+                   COALESCE(SUM(t.total_working_time), 0),
+                   COALESCE(SUM(t.total_paused_time), 0),
+                   COUNT(*) FILTER (WHERE t.state = 'completed'),
+                   ARRAY_AGG(t.id ORDER BY t.id)
+            FROM periods p
+            JOIN productivity_task t
+              ON t.employee_id = p.employee_id
+             AND t.work_date BETWEEN p.date_from AND p.date_to
+            GROUP BY p.key
+        """, params)
+        task_metrics = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+
+        # Per period: the app with the largest total duration and the restricted minutes,
+        # read from the daily rollups for compacted days and from the raw logs after them
+        usage_query, usage_params = self.env['productivity.app.usage.daily']._get_app_usage_query()
+        self.env.cr.execute(periods_sql + """
+            , apps AS (
+                SELECT p.key, a.app_name,
+                       SUM(a.duration) AS duration,
+                       SUM(a.restricted_duration) AS restricted
+                FROM periods p
+                JOIN (""" + usage_query + """) a
+                  ON a.employee_id = p.employee_id
+                 AND a.work_date BETWEEN p.date_from AND p.date_to
+                GROUP BY p.key, a.app_name
+            )
+            SELECT DISTINCT ON (key) key, app_name, SUM(restricted) OVER (PARTITION BY key)
+            FROM apps
+            ORDER BY key, duration DESC, app_name
+        """, params + usage_params)
+        app_metrics = {row[0]: row[1:] for row in self.env.cr.fetchall()}
+        return task_metrics, app_metrics
 
     @api.model
     def generate_report(self, employee_id, period_start, period_end, report_type='daily'):
@@ -159,19 +203,84 @@ class ProductivityReport(models.Model):
         return report
 
     @api.model
-    def generate_daily_reports(self):
-        """Generate daily reports for all employees"""
-        yesterday = datetime.now().date() - timedelta(days=1)
-        
-        employees = self.env['hr.employee'].search([])
-        
-        for employee in employees:
-            self.generate_report(
-                employee.id,
-                yesterday,
-                yesterday,
-                'daily'
+    def generate_daily_reports(self, report_date=None, batch_size=500, auto_commit=False):
+        """Generate daily reports for every employee with activity on a day
+
+        Only employees with tasks or app usage on ``report_date`` (yesterday
+        by default) get a report, and existing reports are skipped, so
+        running it again after a failure resumes where it stopped. Reports
+        are created ``batch_size`` at a time; with ``auto_commit`` each batch
+        is committed on its own to keep transactions and locks short.
+
+        Returns the number of reports created.
+        """
+        report_date = fields.Date.to_date(report_date) or (datetime.now().date() - timedelta(days=1))
+        employee_ids = self._get_employees_without_daily_report(report_date)
+
+        created = 0
+        for start in range(0, len(employee_ids), batch_size):
+            batch = employee_ids[start:start + batch_size]
+            self.create([{
+                'employee_id': employee_id,
+                'period_start': report_date,
+                'period_end': report_date,
+                'report_type': 'daily',
+                'state': 'generated',
+            } for employee_id in batch])
+            created += len(batch)
+            if auto_commit:
+                self.env['ir.cron']._notify_progress(done=created, remaining=len(employee_ids) - created)
+                self.env.cr.commit()
+        return created
+
+    @api.model
+    def _get_employees_without_daily_report(self, report_date):
+        """Ids of employees with activity on a day and no daily report for it yet"""
+        self.env['productivity.task'].flush_model(['employee_id', 'work_date'])
+        self.env['app.usage.log'].flush_model(['employee_id', 'work_date'])
+        self.flush_model(['employee_id', 'period_start', 'period_end', 'report_type'])
+        self.env.cr.execute("""
+            SELECT active.employee_id
+            FROM (
+                SELECT employee_id FROM productivity_task WHERE work_date = %(report_date)s
+                UNION
+                SELECT employee_id FROM app_usage_log WHERE work_date = %(report_date)s
+            ) active
+            WHERE NOT EXISTS (
+                SELECT 1 FROM productivity_report r
+                WHERE r.employee_id = active.employee_id
+                AND r.report_type = 'daily'
+                AND r.period_start = %(report_date)s
+                AND r.period_end = %(report_date)s
             )
+            ORDER BY active.employee_id
+        """, {'report_date': report_date})
+        return [row[0] for row in self.env.cr.fetchall()]
+
+    @api.model
+    def _cron_generate_daily_reports(self):
+        """Scheduled action: generate the daily reports once the configured time has passed
+
+        Reports only cover completed days: their metrics are stored when
+        the report is created, so work logged later would be missing. The
+        configured time (company timezone) is when the previous day is
+        reported; before it, the day before is completed (a no-op once it
+        is done).
+        """
+        config = self.env['productivity.config'].sudo().get_config()
+        if not config.auto_generate_reports:
+            return
+        tz = pytz.timezone(config.company_id.partner_id.tz or 'UTC')
+        now = datetime.now(pytz.utc).astimezone(tz)
+        try:
+            hour, minute = (int(part) for part in (config.report_generation_time or '').split(':'))
+            generation_time = time(hour, minute)
+        except ValueError:
+            _logger.warning("Invalid report generation time %r, using 18:00", config.report_generation_time)
+            generation_time = time(18, 0)
+        days_back = 1 if now.time() >= generation_time else 2
+        report_date = now.date() - timedelta(days=days_back)
+        self.generate_daily_reports(report_date, auto_commit=True)
 
     def export_to_pdf(self):
         """Export report to PDF"""
@@ -0,0 +1,325 @@
+from odoo import models, fields, api
+from datetime import date, timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
+
+# productivity.checkpoint names
+ROLLUP_WATERMARK_CHECKPOINT = 'rollup_watermark'
+LOGS_PURGED_CHECKPOINT = 'logs_purged_before'
+LOG_PURGE_BOUND_CHECKPOINT = 'logs_purged_id:%s'
+
+
+class ProductivityAppUsageDaily(models.Model):
+    _name = 'productivity.app.usage.daily'
+    _description = 'Daily App Usage Rollup'
+    _order = 'work_date desc, employee_id'
+
+    employee_id = fields.Many2one('hr.employee', string='Employee', required=True, readonly=True, ondelete='cascade')
+    work_date = fields.Date(string='Work Date', required=True, readonly=True)
+    app_name = fields.Char(string='Application Name', required=True, readonly=True)
+    app_category = fields.Selection([
+        ('work', 'Work'),
+        ('communication', 'Communication'),
+        ('entertainment', 'Entertainment'),
+        ('social_media', 'Social Media'),
+        ('other', 'Other'),
+    ], string='App Category', required=True, readonly=True)
+    duration = fields.Float(string='Duration (Minutes)', readonly=True)
+    restricted_duration = fields.Float(string='Restricted Duration (Minutes)', readonly=True)
+    session_count = fields.Integer(string='Sessions', readonly=True)
+
+    _sql_constraints = [
+        ('employee_day_app_unique', 'unique(employee_id, work_date, app_name, app_category)',
+         'There can only be one rollup row per employee, day and application.'),
+    ]
+
+    def init(self):
+        """Create the queue of rolled up work dates whose raw logs changed since"""
+        self.env.cr.execute("""
+            CREATE TABLE IF NOT EXISTS productivity_rollup_dirty_day (
+                work_date DATE PRIMARY KEY
+            )
+        """)
+
+    @api.model
+    def _get_rollup_watermark(self):
+        """Last work date compacted into the rollups, or None"""
+        value = self.env['productivity.checkpoint']._get_checkpoint(ROLLUP_WATERMARK_CHECKPOINT)
+        return fields.Date.to_date(value) if value else None
+
+    @api.model
+    def _get_log_purge_date(self):
+        """Work date before which the raw logs are deleted by the retention, or None"""
+        value = self.env['productivity.checkpoint']._get_checkpoint(LOGS_PURGED_CHECKPOINT)
+        return fields.Date.to_date(value) if value else None
+
+    @api.model
+    def _get_log_purge_bound(self, table):
+        """Highest id of ``table`` whose rows of the purged days are counted in the rollups"""
+        return int(self.env['productivity.checkpoint']._get_checkpoint(LOG_PURGE_BOUND_CHECKPOINT % table, 0))
+
+    @api.model
+    def _mark_days_dirty(self, work_dates):
+        """Queue already rolled up work dates for a new rollup, after their raw logs changed
+
+        Readers take these days from the rollups, so imported history and
+        late replays only show up once the day is rolled up again; the
+        rollup cron is triggered when a day is queued.
+        """
+        watermark = self._get_rollup_watermark()
+        work_dates = [day for day in set(work_dates) if day and watermark and day <= watermark]
+        if not work_dates:
+            return
+        self.env.cr.execute("""
+            INSERT INTO productivity_rollup_dirty_day (work_date)
+            SELECT unnest(%s::date[])
+            ON CONFLICT (work_date) DO NOTHING
+        """, [work_dates])
+        if self.env.cr.rowcount:
+            cron = self.env.ref('employee_productivity_tracker.ir_cron_rollup_logs', raise_if_not_found=False)
+            if cron:
+                cron.sudo()._trigger()
+
+    @api.model
+    def _rollup_dirty_days(self, before=None, auto_commit=False):
+        """Roll up again the queued work dates (only the ones before ``before`` if given)
+
+        Each day is removed from the queue before it is rolled up, so a log
+        written meanwhile queues it again instead of being missed.
+        """
+        while True:
+            self.env.cr.execute("""
+                DELETE FROM productivity_rollup_dirty_day
+                WHERE work_date = (
+                    SELECT MIN(work_date) FROM productivity_rollup_dirty_day
+                    WHERE %(before)s IS NULL OR work_date < %(before)s
+                )
+                RETURNING work_date
+            """, {'before': before})
+            row = self.env.cr.fetchone()
+            if not row:
+                return
+            self._rollup_day(row[0])
+            if auto_commit:
+                self.env.cr.commit()
+            _logger.info("Rolled up productivity logs of %s again", row[0])
+
+    @api.model
+    def _get_app_usage_query(self):
+        """SQL of the daily app usage: rollups up to the watermark, raw logs after it
+
+        Returns ``(query, params)``. The query selects employee_id, work_date,
+        app_name, app_category, duration, restricted_duration and
+        session_count, and can be used as a subquery.
+        """
+        self.env['app.usage.log'].flush_model(
+            ['employee_id', 'work_date', 'app_name', 'app_category', 'duration', 'is_restricted'])
+        watermark = self._get_rollup_watermark() or date.min
+        query = """
+            SELECT employee_id, work_date, app_name, app_category,
+                   duration, restricted_duration, session_count
+            FROM productivity_app_usage_daily
+            WHERE work_date <= %s
+            UNION ALL
+            SELECT employee_id, work_date, app_name, COALESCE(app_category, 'other'),
+                   COALESCE(duration, 0), CASE WHEN is_restricted THEN COALESCE(duration, 0) ELSE 0 END, 1
+            FROM app_usage_log
+            WHERE work_date > %s
+        """
+        return query, [watermark, watermark]
+
+    @api.model
+    def _rollup_day(self, work_date):
+        """Compact the raw logs of one work date into both rollup tables, replacing earlier rollups of that day
+
+        Days whose logs are being deleted by the retention are merged instead.
+        """
+        self.env['app.usage.log'].flush_model()
+        self.env['activity.log'].flush_model()
+        purge_date = self._get_log_purge_date()
+        if purge_date and work_date < purge_date:
+            self._merge_purged_day(work_date)
+            return
+        params = {'work_date': work_date, 'uid': self.env.uid}
+        self.env.cr.execute("""
+            DELETE FROM productivity_app_usage_daily WHERE work_date = %(work_date)s;
+            INSERT INTO productivity_app_usage_daily (
+                employee_id, work_date, app_name, app_category,
+                duration, restricted_duration, session_count,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT employee_id, work_date, app_name, COALESCE(app_category, 'other'),
+                   COALESCE(SUM(duration), 0),
+                   COALESCE(SUM(duration) FILTER (WHERE is_restricted), 0),
+                   COUNT(*),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            FROM app_usage_log
+            WHERE work_date = %(work_date)s
+            GROUP BY employee_id, work_date, app_name, COALESCE(app_category, 'other');
+
+            DELETE FROM productivity_activity_daily WHERE work_date = %(work_date)s;
+            INSERT INTO productivity_activity_daily (
+                employee_id, work_date, activity_type,
+                event_count, duration, keyboard_events, mouse_events,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT employee_id, work_date, activity_type,
+                   COUNT(*), COALESCE(SUM(duration), 0),
+                   COALESCE(SUM(keyboard_events), 0), COALESCE(SUM(mouse_events), 0),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            FROM activity_log
+            WHERE work_date = %(work_date)s
+            GROUP BY employee_id, work_date, activity_type;
+        """, params)
+        self.invalidate_model()
+        self.env['productivity.activity.daily'].invalidate_model()
+
+    @api.model
+    def _merge_purged_day(self, work_date):
+        """Add the logs written into a day of the retention period since its purge started to its rollups
+
+        The logs up to the purge bound are already counted and being
+        deleted by the retention, so only the later ones are added; they
+        are deleted once added.
+        """
+        params = {
+            'work_date': work_date,
+            'uid': self.env.uid,
+            'usage_bound': self._get_log_purge_bound('app_usage_log'),
+            'activity_bound': self._get_log_purge_bound('activity_log'),
+        }
+        self.env.cr.execute("""
+            INSERT INTO productivity_app_usage_daily AS d (
+                employee_id, work_date, app_name, app_category,
+                duration, restricted_duration, session_count,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT employee_id, work_date, app_name, COALESCE(app_category, 'other'),
+                   COALESCE(SUM(duration), 0),
+                   COALESCE(SUM(duration) FILTER (WHERE is_restricted), 0),
+                   COUNT(*),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            FROM app_usage_log
+            WHERE work_date = %(work_date)s AND id > %(usage_bound)s
+            GROUP BY employee_id, work_date, app_name, COALESCE(app_category, 'other')
+            ON CONFLICT (employee_id, work_date, app_name, app_category) DO UPDATE
+            SET duration = d.duration + EXCLUDED.duration,
+                restricted_duration = d.restricted_duration + EXCLUDED.restricted_duration,
+                session_count = d.session_count + EXCLUDED.session_count,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date;
+
+            INSERT INTO productivity_activity_daily AS d (
+                employee_id, work_date, activity_type,
+                event_count, duration, keyboard_events, mouse_events,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT employee_id, work_date, activity_type,
+                   COUNT(*), COALESCE(SUM(duration), 0),
+                   COALESCE(SUM(keyboard_events), 0), COALESCE(SUM(mouse_events), 0),
+                   %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            FROM activity_log
+            WHERE work_date = %(work_date)s AND id > %(activity_bound)s
+            GROUP BY employee_id, work_date, activity_type
+            ON CONFLICT (employee_id, work_date, activity_type) DO UPDATE
+            SET event_count = d.event_count + EXCLUDED.event_count,
+                duration = d.duration + EXCLUDED.duration,
+                keyboard_events = d.keyboard_events + EXCLUDED.keyboard_events,
+                mouse_events = d.mouse_events + EXCLUDED.mouse_events,
+                write_uid = EXCLUDED.write_uid,
+                write_date = EXCLUDED.write_date;
+        """, params)
+        self.env.cr.execute("""
+            WITH usages AS (
+                DELETE FROM app_usage_log WHERE work_date = %(work_date)s AND id > %(usage_bound)s
+                RETURNING task_id
+            ),
+            activities AS (
+                DELETE FROM activity_log WHERE work_date = %(work_date)s AND id > %(activity_bound)s
+                RETURNING task_id
+            )
+            SELECT task_id FROM usages UNION SELECT task_id FROM activities
+        """, params)
+        task_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.env['app.usage.log'].invalidate_model()
+        self.env['activity.log'].invalidate_model()
+        self.env['productivity.task']._recompute_log_counters(task_ids)
+        self.invalidate_model()
+        self.env['productivity.activity.daily'].invalidate_model()
+
+    @api.model
+    def _cron_rollup(self, auto_commit=True):
+        """Scheduled action: compact the days older than the configured delay, one day per transaction
+
+        The watermark moves forward after each day, so an interrupted run
+        resumes with the next day. Readers use rollups up to the watermark
+        and raw logs after it. Rolled up days whose logs changed since
+        (imports, late replays) are rolled up again first.
+        """
+        self._rollup_dirty_days(auto_commit=auto_commit)
+        config = self.env['productivity.config'].sudo().get_config()
+        last_day = fields.Date.today() - timedelta(days=max(config.rollup_after_days, 1))
+        watermark = self._get_rollup_watermark()
+        if watermark:
+            day = watermark + timedelta(days=1)
+        else:
+            self.env.cr.execute("""
+                SELECT MIN(work_date) FROM (
+                    SELECT MIN(work_date) AS work_date FROM app_usage_log
+                    UNION ALL
+                    SELECT MIN(work_date) FROM activity_log
+                ) first_days
+            """)
+            day = self.env.cr.fetchone()[0]
+            if not day:
+                return
+        while day <= last_day:
+            self._rollup_day(day)
+            self.env['productivity.checkpoint']._set_checkpoint(ROLLUP_WATERMARK_CHECKPOINT, fields.Date.to_string(day))
+            if auto_commit:
+                self.env.cr.commit()
+            _logger.info("Rolled up productivity logs of %s", day)
+            day += timedelta(days=1)
+
+
+class ProductivityActivityDaily(models.Model):
+    _name = 'productivity.activity.daily'
+    _description = 'Daily Activity Rollup'
+    _order = 'work_date desc, employee_id'
+
+    employee_id = fields.Many2one('hr.employee', string='Employee', required=True, readonly=True, ondelete='cascade')
+    work_date = fields.Date(string='Work Date', required=True, readonly=True)
+    activity_type = fields.Char(string='Activity Type', required=True, readonly=True)
+    event_count = fields.Integer(string='Events', readonly=True)
+    duration = fields.Float(string='Duration (Minutes)', readonly=True)
+    keyboard_events = fields.Integer(string='Keyboard Events', readonly=True)
+    mouse_events = fields.Integer(string='Mouse Events', readonly=True)
+
+    _sql_constraints = [
+        ('employee_day_type_unique', 'unique(employee_id, work_date, activity_type)',
+         'There can only be one rollup row per employee, day and activity type.'),
+    ]
+
+    @api.model
+    def _get_activity_query(self):
+        """SQL of the daily activity totals: rollups up to the watermark, raw logs after it
+
+        Returns ``(query, params)``. The query selects employee_id, work_date,
+        activity_type, event_count, duration, keyboard_events and mouse_events.
+        """
+        self.env['activity.log'].flush_model(
+            ['employee_id', 'work_date', 'activity_type', 'duration', 'keyboard_events', 'mouse_events'])
+        watermark = self.env['productivity.app.usage.daily']._get_rollup_watermark() or date.min
+        query = """
+            SELECT employee_id, work_date, activity_type,
+                   event_count, duration, keyboard_events, mouse_events
+            FROM productivity_activity_daily
+            WHERE work_date <= %s
+            UNION ALL
+            SELECT employee_id, work_date, activity_type,
+                   1, COALESCE(duration, 0), COALESCE(keyboard_events, 0), COALESCE(mouse_events, 0)
+            FROM activity_log
+            WHERE work_date > %s
+        """
+        return query, [watermark, watermark]
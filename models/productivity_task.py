@@ -1,12 +1,20 @@
-from odoo import models, fields, api
+from odoo import models, fields, api, tools
 from datetime import datetime, timedelta
+import logging
+
+_logger = logging.getLogger(__name__)
 
 
 class ProductivityTask(models.Model):
     _name = 'productivity.task'
+    _inherit = ['productivity.work.date.mixin']
     _description = 'Productivity Task'
     _order = 'create_date desc'
 
+    ACTIVE_STATES = ('running', 'paused')
+    AWAY_APP_PATH = 'External Application'
+    AWAY_COALESCE_SECONDS = 10  # an away interval starting this soon after the previous one extends it
+
     name = fields.Char(string='Task Name', required=True)
     employee_id = fields.Many2one('hr.employee', string='Employee', required=True, ondelete='cascade')
     user_id = fields.Many2one('res.users', string='User', related='employee_id.user_id')
@@ -29,21 +37,51 @@ class ProductivityTask(models.Model):
     pause_time = fields.Datetime(string='Last Pause Time')
     pause_count = fields.Integer(string='Pause Count', default=0)
     
+    # Running accumulators, updated by the timer actions
+    segment_start = fields.Datetime(string='Current Segment Start', readonly=True,
+                                    help='When the task last started, paused or resumed')
+    worked_seconds = fields.Float(string='Accumulated Working Seconds', default=0, readonly=True)
+    paused_seconds = fields.Float(string='Accumulated Paused Seconds', default=0, readonly=True)
+    
     # Activity tracking
     is_idle = fields.Boolean(string='Is Idle', default=False)
     idle_start_time = fields.Datetime(string='Idle Start Time')
+    last_heartbeat = fields.Datetime(string='Last Input', readonly=True, copy=False,
+                                     help='Last user input reported by the tracker for the current run')
     
     # Relations
     # screenshot_ids = fields.One2many('screenshot.log', 'task_id', string='Screenshots')  # Screenshot functionality removed
     activity_log_ids = fields.One2many('activity.log', 'task_id', string='Activity Logs')
     app_usage_ids = fields.One2many('app.usage.log', 'task_id', string='App Usage')
     
+    # Counters of the related logs, maintained by the log models
+    activity_count = fields.Integer(string='Activities', default=0, readonly=True, copy=False)
+    app_usage_count = fields.Integer(string='App Usages', default=0, readonly=True, copy=False)
+    restricted_app_minutes = fields.Float(string='Restricted App Time (Minutes)', default=0, readonly=True, copy=False)
+    last_activity_time = fields.Datetime(string='Last Activity', readonly=True, copy=False)
+    
     description = fields.Text(string='Description')
     notes = fields.Text(string='Notes')
     
     create_date = fields.Datetime(string='Created', readonly=True)
     write_date = fields.Datetime(string='Modified', readonly=True)
 
+    def init(self):
+        """Indexes for the active task lookup, the scheduler deadlines, the idle scan, the per-day queries
+        and the change feed"""
+        tools.create_index(self._cr, 'productivity_task_employee_active_idx', self._table,
+                           ['employee_id'], where="state IN ('running', 'paused')")
+        tools.create_index(self._cr, 'productivity_task_scheduled_start_idx', self._table,
+                           ['start_time'], where="state = 'draft' AND start_time IS NOT NULL")
+        tools.create_index(self._cr, 'productivity_task_active_stop_idx', self._table,
+                           ['stop_time'], where="state IN ('running', 'paused') AND stop_time IS NOT NULL")
+        tools.create_index(self._cr, 'productivity_task_running_heartbeat_idx', self._table,
+                           ['last_heartbeat'], where="state = 'running' AND last_heartbeat IS NOT NULL")
+        tools.create_index(self._cr, 'productivity_task_employee_work_date_idx', self._table,
+                           ['employee_id', 'work_date'])
+        tools.create_index(self._cr, 'productivity_task_write_date_id_idx', self._table,
+                           ['write_date', 'id'])
+
     @api.depends('start_time', 'state')
     def _compute_timer_display(self):
         """Compute real-time timer display - updated by frontend"""
@@ -57,164 +95,347 @@ class ProductivityTask(models.Model):
             else:
                 record.timer_display = "00:00:00"
 
-    @api.depends('start_time', 'stop_time', 'pause_time')
+    def _get_open_segment_seconds(self, now=None):
+        """Seconds spent in the current (not yet accumulated) running or paused segment"""
+        self.ensure_one()
+        segment_start = self.segment_start or (self.state == 'paused' and self.pause_time) or self.start_time
+        segment_end = self.stop_time if self.state == 'completed' else (now or fields.Datetime.now())
+        if not segment_start or not segment_end:
+            return 0
+        return max(0, (segment_end - segment_start).total_seconds())
+
+    def _close_open_segments(self, segment_ends, pause=False, idle=False):
+        """Add the open segment of the tasks, up to their end in ``segment_ends`` (task id to datetime),
+        to their worked or paused seconds with one UPDATE; ``pause`` (``idle``) starts a pause (idle
+        period) of the running tasks at that end"""
+        if not self:
+            return
+        accumulators = ['worked_seconds', 'paused_seconds', 'pause_count', 'pause_time', 'segment_start',
+                        'idle_start_time']
+        self.flush_recordset(accumulators + ['state', 'start_time'])
+        task_ids = list(segment_ends)
+        self.env.cr.execute("""
+            UPDATE productivity_task t
+            SET worked_seconds = COALESCE(t.worked_seconds, 0) + CASE WHEN t.state = 'running'
+                    THEN GREATEST(0, EXTRACT(EPOCH FROM s.segment_end - COALESCE(t.segment_start, t.start_time)))
+                    ELSE 0 END,
+                paused_seconds = COALESCE(t.paused_seconds, 0) + CASE WHEN t.state = 'paused'
+                    THEN GREATEST(0, EXTRACT(EPOCH FROM s.segment_end
+                                                        - COALESCE(t.segment_start, t.pause_time, t.start_time)))
+                    ELSE 0 END,
+                pause_count = CASE WHEN %(pause)s AND t.state = 'running'
+                    THEN COALESCE(t.pause_count, 0) + 1 ELSE t.pause_count END,
+                pause_time = CASE WHEN %(pause)s AND t.state = 'running' THEN s.segment_end ELSE t.pause_time END,
+                segment_start = CASE WHEN %(pause)s AND t.state = 'running'
+                    THEN s.segment_end ELSE t.segment_start END,
+                idle_start_time = CASE WHEN %(idle)s AND t.state = 'running'
+                    THEN s.segment_end ELSE t.idle_start_time END
+            FROM unnest(%(task_ids)s::int[], %(segment_ends)s::timestamp[]) AS s(id, segment_end)
+            WHERE t.id = s.id AND t.state IN ('running', 'paused')
+        """, {
+            'task_ids': task_ids,
+            'segment_ends': [segment_ends[task_id] for task_id in task_ids],
+            'pause': pause,
+            'idle': idle,
+        })
+        self.invalidate_recordset(accumulators)
+
+    @api.depends('state', 'start_time', 'stop_time', 'segment_start', 'worked_seconds')
     def _compute_total_time(self):
-        """Compute total working time in hours"""
+        """Compute total working time in hours from the accumulated segments"""
+        now = fields.Datetime.now()
         for record in self:
-            if record.start_time:
-                end_time = record.stop_time or fields.Datetime.now()
-                total_seconds = (end_time - record.start_time).total_seconds()
-                
-                # Subtract paused time
-                paused_records = self.env['activity.log'].search([
-                    ('task_id', '=', record.id),
-                    ('activity_type', '=', 'pause')
-                ])
-                
-                paused_seconds = 0
-                for pause in paused_records:
-                    if pause.end_time:
-                        paused_seconds += (pause.end_time - pause.start_time).total_seconds()
-                
-                total_working_seconds = max(0, total_seconds - paused_seconds)
-                record.total_working_time = total_working_seconds / 3600  # Convert to hours
-            else:
-                record.total_working_time = 0
+            seconds = record.worked_seconds
+            if record.state == 'running' or (record.state == 'completed' and record.segment_start):
+                seconds += record._get_open_segment_seconds(now)
+            record.total_working_time = seconds / 3600  # Convert to hours
 
-    @api.depends('total_working_time', 'start_time', 'stop_time')
+    @api.depends('state', 'pause_time', 'segment_start', 'paused_seconds')
     def _compute_paused_time(self):
-        """Compute total paused time in hours"""
+        """Compute total paused time in hours from the accumulated segments"""
+        now = fields.Datetime.now()
         for record in self:
-            if record.start_time:
-                paused_records = self.env['activity.log'].search([
-                    ('task_id', '=', record.id),
-                    ('activity_type', '=', 'pause')
-                ])
-                
-                total_paused_seconds = 0
-                for pause in paused_records:
-                    if pause.end_time:
-                        total_paused_seconds += (pause.end_time - pause.start_time).total_seconds()
-                
-                record.total_paused_time = total_paused_seconds / 3600  # Convert to hours
-            else:
-                record.total_paused_time = 0
+            seconds = record.paused_seconds
+            if record.state == 'paused':
+                seconds += record._get_open_segment_seconds(now)
+            record.total_paused_time = seconds / 3600  # Convert to hours
 
     def action_start_timer(self):
-        """Start the timer"""
-        self.ensure_one()
-        from datetime import timedelta
-        import logging
-        _logger = logging.getLogger(__name__)
-        
+        """Start the timers of the draft tasks"""
+        tasks = self.filtered(lambda task: task.state == 'draft')
+        if not tasks:
+            return True
         now = fields.Datetime.now()
-        
-        # If user set a stop_time, use it if it's in the future
-        # Otherwise default to 8 hours from now
-        if self.stop_time and self.stop_time > now:
-            stop_time = self.stop_time
-            _logger.info(f'Using user-defined stop_time: {stop_time} (in {(stop_time - now).total_seconds()} seconds)')
-        else:
-            # Default to 8 hours from now
-            stop_time = now + timedelta(hours=8)
-            _logger.info(f'Using default stop_time: {stop_time} (8 hours from now)')
-        
-        _logger.info(f'Timer starting - Now: {now}, Stop: {stop_time}')
-        
-        self.write({
+        vals = {
             'state': 'running',
             'start_time': now,
-            'stop_time': stop_time,
-        })
-        self.env['activity.log'].create({
-            'task_id': self.id,
-            'employee_id': self.employee_id.id,
-            'activity_type': 'timer_start',
-            'start_time': now,
-            'description': 'Timer started for task: ' + self.name,
-        })
+            'segment_start': now,
+            'worked_seconds': 0,
+            'paused_seconds': 0,
+            'last_heartbeat': False,
+            'is_idle': False,
+            'idle_start_time': False,
+        }
+        # Keep a stop time set by the user if it's in the future,
+        # otherwise default to 8 hours from now
+        keep_stop = tasks.filtered(lambda task: task.stop_time and task.stop_time > now)
+        if keep_stop:
+            keep_stop.write(vals)
+        if tasks - keep_stop:
+            (tasks - keep_stop).write(dict(vals, stop_time=now + timedelta(hours=8)))
+        _logger.info('Timer started for tasks %s at %s', tasks.ids, now)
+
+        tasks._log_timer_activity('timer_start', now, 'Timer started for task: ')
+        tasks._notify_timer_state('start')
         # Don't reload to prevent interrupting the timer widget
         return True
 
     def action_stop_timer(self):
-        """Stop the timer"""
-        self.ensure_one()
-        self.write({
+        """Stop the timers of the tasks not completed yet"""
+        tasks = self.filtered(lambda task: task.state != 'completed')
+        if not tasks:
+            return True
+        now = fields.Datetime.now()
+        paused = tasks.filtered(lambda task: task.state == 'paused')
+        tasks._close_open_segments(dict.fromkeys(tasks.ids, now))
+        tasks.write({
             'state': 'completed',
-            'stop_time': fields.Datetime.now(),
-        })
-        self.env['activity.log'].create({
-            'task_id': self.id,
-            'employee_id': self.employee_id.id,
-            'activity_type': 'timer_stop',
-            'start_time': fields.Datetime.now(),
-            'description': 'Timer stopped for task: ' + self.name,
+            'stop_time': now,
+            'segment_start': False,
         })
+        paused._close_open_logs('pause', now)
+        tasks._log_timer_activity('timer_stop', now, 'Timer stopped for task: ')
+        tasks._notify_timer_state('stop')
         return True
 
     def action_pause_timer(self):
-        """Pause the timer"""
-        self.ensure_one()
-        self.write({
-            'state': 'paused',
-            'pause_time': fields.Datetime.now(),
-            'pause_count': self.pause_count + 1,
-        })
-        self.env['activity.log'].create({
-            'task_id': self.id,
-            'employee_id': self.employee_id.id,
-            'activity_type': 'pause',
-            'start_time': fields.Datetime.now(),
-            'description': 'Timer paused for task: ' + self.name,
-        })
+        """Pause the running timers"""
+        tasks = self.filtered(lambda task: task.state == 'running')
+        if tasks:
+            now = fields.Datetime.now()
+            tasks._close_open_segments(dict.fromkeys(tasks.ids, now), pause=True)
+            tasks.write({'state': 'paused'})
+            tasks._log_timer_activity('pause', now, 'Timer paused for task: ')
+            tasks._notify_timer_state('pause')
         return {'type': 'ir.actions.client', 'tag': 'reload'}
 
     def action_resume_timer(self):
-        """Resume the timer"""
-        self.ensure_one()
-        self.write({
-            'state': 'running',
-            'pause_time': False,
-        })
-        last_pause = self.env['activity.log'].search([
-            ('task_id', '=', self.id),
-            ('activity_type', '=', 'pause')
-        ], order='start_time desc', limit=1)
-        
-        if last_pause:
-            last_pause.write({
-                'end_time': fields.Datetime.now(),
+        """Resume the paused timers"""
+        tasks = self.filtered(lambda task: task.state == 'paused')
+        if tasks:
+            now = fields.Datetime.now()
+            tasks._close_open_segments(dict.fromkeys(tasks.ids, now))
+            idle_tasks = tasks.filtered('is_idle')
+            tasks.write({
+                'state': 'running',
+                'pause_time': False,
+                'segment_start': now,
+                'is_idle': False,
+                'idle_start_time': False,
             })
-        
-        self.env['activity.log'].create({
-            'task_id': self.id,
-            'employee_id': self.employee_id.id,
-            'activity_type': 'resume',
-            'start_time': fields.Datetime.now(),
-            'description': 'Timer resumed for task: ' + self.name,
-        })
+            # The tracker reports input for these runs, restart their idle countdown
+            tasks.filtered('last_heartbeat').write({'last_heartbeat': now})
+
+            tasks._close_open_logs('pause', now)
+            idle_tasks._close_open_logs('idle_detected', now)
+            idle_tasks._log_timer_activity('idle_cleared', now, 'Activity detected again for task: ')
+            tasks._log_timer_activity('resume', now, 'Timer resumed for task: ')
+            tasks._notify_timer_state('resume')
         return {'type': 'ir.actions.client', 'tag': 'reload'}
 
+    def _log_timer_activity(self, activity_type, moment, description):
+        """Create one activity row per task with a single multi-record create"""
+        return self.env['activity.log'].create([{
+            'task_id': task.id,
+            'employee_id': task.employee_id.id,
+            'activity_type': activity_type,
+            'start_time': moment,
+            'description': description + task.name,
+        } for task in self])
+
+    def _close_open_logs(self, activity_type, end_time):
+        """End the open activity rows of a type (pause, idle_detected) of all tasks with one search"""
+        if not self:
+            return
+        self.env['activity.log'].search([
+            ('task_id', 'in', self.ids),
+            ('activity_type', '=', activity_type),
+            ('end_time', '=', False),
+        ]).write({'end_time': end_time})
+
     def detect_idle(self, idle_timeout_minutes=15):
-        """Check if system is idle and pause timer if needed"""
-        for record in self:
-            if record.state == 'running' and record.start_time:
-                # This would be called from the agent/cron job
-                # For now, marking as idle if needed
-                now = fields.Datetime.now()
-                # Idle detection logic would go here
-                pass
+        """Pause the running tasks without reported input for ``idle_timeout_minutes``, as of their last input"""
+        cutoff = fields.Datetime.now() - timedelta(minutes=idle_timeout_minutes)
+        idle_tasks = self.filtered(
+            lambda task: task.state == 'running' and task.last_heartbeat and task.last_heartbeat < cutoff)
+        if not idle_tasks:
+            return idle_tasks
+
+        idle_since = {
+            task.id: max(task.last_heartbeat, task.segment_start or task.last_heartbeat) for task in idle_tasks
+        }
+        log_vals = []
+        for task in idle_tasks:
+            log_vals += [{
+                'task_id': task.id,
+                'employee_id': task.employee_id.id,
+                'activity_type': 'idle_detected',
+                'start_time': idle_since[task.id],
+                'description': f'No input for {idle_timeout_minutes} minutes. Timer paused.',
+            }, {
+                'task_id': task.id,
+                'employee_id': task.employee_id.id,
+                'activity_type': 'pause',
+                'start_time': idle_since[task.id],
+                'description': 'Timer paused for task: ' + task.name,
+            }]
+        idle_tasks._close_open_segments(idle_since, pause=True, idle=True)
+        idle_tasks.write({'state': 'paused', 'is_idle': True})
+        self.env['activity.log'].create(log_vals)
+        idle_tasks.with_context(productivity_timer_auto=True)._notify_timer_state('pause')
+        return idle_tasks
+
+    @api.model
+    def _cron_detect_idle(self):
+        """Scheduled action: pause the running tasks idle for longer than the configured timeout"""
+        config = self.env['productivity.config'].sudo().get_config()
+        if not config.idle_detection_enabled or config.idle_timeout_minutes <= 0:
+            return
+        cutoff = fields.Datetime.now() - timedelta(minutes=config.idle_timeout_minutes)
+        idle_tasks = self.search([
+            ('state', '=', 'running'), ('last_heartbeat', '!=', False), ('last_heartbeat', '<', cutoff),
+        ])
+        idle_tasks.detect_idle(config.idle_timeout_minutes)
+
+    @api.model
+    def _record_heartbeats(self, heartbeats):
+        """Store the last input time of tasks (task id to datetime) with one UPDATE, resuming idle-paused
+        tasks; returns the ids of the tasks updated"""
+        if not heartbeats:
+            return []
+        now = fields.Datetime.now()
+        task_ids = list(heartbeats)
+        # A client clock ahead of the server must not keep tasks from going idle
+        times = [min(heartbeats[task_id], now) for task_id in task_ids]
+        self.flush_model(['state', 'last_heartbeat'])
+        self.env.cr.execute("""
+            UPDATE productivity_task t
+            SET last_heartbeat = h.heartbeat,
+                write_uid = %s,
+                write_date = NOW() AT TIME ZONE 'UTC'
+            FROM unnest(%s::int[], %s::timestamp[]) AS h(id, heartbeat)
+            WHERE t.id = h.id
+            AND t.state IN ('running', 'paused')
+            AND (t.last_heartbeat IS NULL OR t.last_heartbeat < h.heartbeat)
+            RETURNING t.id
+        """, [self.env.uid, task_ids, times])
+        updated_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model(['last_heartbeat', 'write_uid', 'write_date'])
+
+        self.browse(updated_ids).filtered(
+            lambda task: task.state == 'paused' and task.is_idle and task.last_heartbeat > task.idle_start_time
+        ).action_resume_timer()
+        return updated_ids
+
+    def record_away_interval(self, away_start, away_end, application_name=None, client_event_id=None):
+        """Record a period spent away from Odoo in one go: pause, away app usage and resume
+
+        A period starting shortly after the previous one (blur/focus flapping)
+        extends it; for a paused task only the app usage is recorded.
+        """
+        self.ensure_one()
+        now = fields.Datetime.now()
+        away_end = min(away_end, now)
+        application_name = application_name or 'Unknown Application'
+        if self.state not in self.ACTIVE_STATES or away_end <= away_start:
+            return {'status': 'ignored', 'state': self.state, 'coalesced': False}
+
+        usage_vals = {
+            'task_id': self.id,
+            'employee_id': self.employee_id.id,
+            'app_name': application_name,
+            'app_path': self.AWAY_APP_PATH,
+            'window_title': f'Away from Odoo - {application_name}',
+            'start_time': away_start,
+            'end_time': away_end,
+            'session_closed': True,
+        }
+        if client_event_id:
+            usage_vals['client_event_id'] = client_event_id
+        if self.state == 'paused':
+            self.env['app.usage.log'].create(usage_vals)
+            return {'status': 'success', 'state': self.state, 'coalesced': False}
+
+        segment_start = self.segment_start or self.start_time
+        if away_end <= segment_start:
+            return {'status': 'duplicate', 'state': self.state, 'coalesced': False}
+        away_start = max(away_start, segment_start)
+
+        previous = self._get_previous_away_interval(away_start)
+        if previous:
+            pause_log, usage, resume_log = previous
+            # The few seconds back in Odoo between the two periods are counted as away too
+            self.write({
+                'paused_seconds': self.paused_seconds + (away_end - segment_start).total_seconds(),
+                'segment_start': away_end,
+            })
+            (pause_log | usage).write({'end_time': away_end})
+            resume_log.write({'start_time': away_end})
+        else:
+            self.write({
+                'worked_seconds': self.worked_seconds + (away_start - segment_start).total_seconds(),
+                'paused_seconds': self.paused_seconds + (away_end - away_start).total_seconds(),
+                'pause_count': self.pause_count + 1,
+                'segment_start': away_end,
+            })
+            self.env['app.usage.log'].create(usage_vals)
+            self.env['activity.log'].create([{
+                'task_id': self.id,
+                'employee_id': self.employee_id.id,
+                'activity_type': 'pause',
+                'start_time': away_start,
+                'end_time': away_end,
+                'app_name': application_name,
+                'description': f'Timer paused while away from Odoo on {application_name}',
+            }, {
+                'task_id': self.id,
+                'employee_id': self.employee_id.id,
+                'activity_type': 'resume',
+                'start_time': away_end,
+                'description': 'Timer resumed for task: ' + self.name,
+            }])
+        self._notify_timer_state('away')
+        return {'status': 'success', 'state': self.state, 'coalesced': bool(previous)}
+
+    def _get_previous_away_interval(self, away_start):
+        """Pause row, app usage and resume row of the away period that ended the current segment,
+        if it ended at most ``AWAY_COALESCE_SECONDS`` before ``away_start``"""
+        segment_start = self.segment_start
+        if not segment_start or away_start - segment_start > timedelta(seconds=self.AWAY_COALESCE_SECONDS):
+            return None
+        logs = self.env['activity.log'].search([
+            ('task_id', '=', self.id),
+            '|',
+            '&', ('activity_type', '=', 'pause'), ('end_time', '=', segment_start),
+            '&', ('activity_type', '=', 'resume'), ('start_time', '=', segment_start),
+        ])
+        pause_log = logs.filtered(lambda log: log.activity_type == 'pause')[:1]
+        resume_log = logs.filtered(lambda log: log.activity_type == 'resume')[:1]
+        usage = self.env['app.usage.log'].search([
+            ('task_id', '=', self.id),
+            ('app_path', '=', self.AWAY_APP_PATH),
+            ('end_time', '=', segment_start),
+        ], limit=1)
+        if pause_log and resume_log and usage:
+            return pause_log, usage, resume_log
+        return None
 
     def detect_restricted_apps(self, detected_apps):
         """Check if restricted apps are running and pause if needed"""
-        restricted_apps = [
-            'whatsapp', 'youtube', 'spotify', 'facebook',
-            'instagram', 'tiktok', 'twitter', 'reddit',
-            'netflix', 'discord', 'telegram', 'steam'
-        ]
+        classifier = self.env['productivity.config']._get_app_classifier()
         
         for app in detected_apps:
-            if any(restricted in app.lower() for restricted in restricted_apps):
+            if classifier.is_restricted(app):
                 for record in self:
                     if record.state == 'running':
                         self.action_pause_timer()
@@ -228,12 +449,199 @@ class ProductivityTask(models.Model):
                         return
 
     @api.model
-    def create(self, vals):
+    def _cron_run_scheduled_timers(self, batch_size=500, auto_commit=True):
+        """Scheduled action: start and stop the due tasks in batches, then trigger itself at the next deadline"""
+        while True:
+            now = fields.Datetime.now()
+            to_start = self.search([
+                ('state', '=', 'draft'), ('start_time', '!=', False), ('start_time', '<=', now),
+            ], order='start_time', limit=batch_size)
+            to_stop = self.search([
+                ('state', 'in', list(self.ACTIVE_STATES)), ('stop_time', '!=', False), ('stop_time', '<=', now),
+            ], order='stop_time', limit=batch_size)
+            if not to_start and not to_stop:
+                break
+            to_start.with_context(productivity_timer_auto=True).action_start_timer()
+            to_stop.with_context(productivity_timer_auto=True).action_stop_timer()
+            if auto_commit:
+                self.env.cr.commit()
+        self._schedule_next_deadline()
+
+    @api.model
+    def _get_next_deadline(self):
+        """Earliest start time of a draft task or stop time of a running or paused one, or None"""
+        self.flush_model(['state', 'start_time', 'stop_time'])
+        self.env.cr.execute("""
+            SELECT LEAST(
+                (SELECT MIN(start_time) FROM productivity_task WHERE state = 'draft' AND start_time IS NOT NULL),
+                (SELECT MIN(stop_time) FROM productivity_task
+                 WHERE state IN ('running', 'paused') AND stop_time IS NOT NULL)
+            )
+        """)
+        return self.env.cr.fetchone()[0]
+
+    @api.model
+    def _schedule_next_deadline(self, deadline=None):
+        """Trigger the scheduler cron at ``deadline``, by default the next deadline of all tasks"""
+        deadline = deadline or self._get_next_deadline()
+        cron = self.env.ref('employee_productivity_tracker.ir_cron_run_scheduled_timers', raise_if_not_found=False)
+        if deadline and cron:
+            cron.sudo()._trigger(at=max(deadline, fields.Datetime.now()))
+
+    def _get_task_deadlines(self):
+        """Start times of the draft tasks and stop times of the running or paused ones"""
+        return [
+            task.start_time if task.state == 'draft' else task.stop_time
+            for task in self
+            if (task.state == 'draft' and task.start_time) or (task.state in self.ACTIVE_STATES and task.stop_time)
+        ]
+
+    def _get_timer_state(self, event, now=None):
+        """Timer state of the task as pushed on the bus and returned by the transition route"""
+        self.ensure_one()
+        return {
+            'event': event,
+            'auto': bool(self.env.context.get('productivity_timer_auto')),
+            'task_id': self.id,
+            'name': self.name,
+            'state': self.state,
+            'start_time': fields.Datetime.to_string(self.start_time),
+            'stop_time': fields.Datetime.to_string(self.stop_time),
+            'segment_start': fields.Datetime.to_string(self.segment_start),
+            'worked_seconds': self.worked_seconds,
+            'paused_seconds': self.paused_seconds,
+            'total_working_time': self.total_working_time,
+            'total_paused_time': self.total_paused_time,
+            'server_time': fields.Datetime.to_string(now or fields.Datetime.now()),
+        }
+
+    def _notify_timer_state(self, event):
+        """Push the timer state of the tasks to their employees' browsers"""
+        now = fields.Datetime.now()
+        for task in self:
+            partner = task.employee_id.user_id.partner_id
+            if not partner:
+                continue
+            partner._bus_send('productivity.timer', task._get_timer_state(event, now))
+
+    @api.model
+    def _add_log_counters(self, deltas):
+        """Add to the log counters of tasks with one UPDATE, ``deltas`` being a list of ``(task id,
+        activities, app usages, restricted minutes, last activity time)`` increments"""
+        totals = {}
+        for task_id, activities, app_usages, restricted_minutes, last_time in deltas:
+            total = totals.setdefault(task_id, [0, 0, 0, None])
+            total[0] += activities
+            total[1] += app_usages
+            total[2] += restricted_minutes
+            total[3] = max(filter(None, (total[3], last_time)), default=None)
+        deltas = {task_id: total for task_id, total in totals.items() if task_id and any(total)}
+        if not deltas:
+            return
+        task_ids = list(deltas)
+        self.flush_model(['activity_count', 'app_usage_count', 'restricted_app_minutes', 'last_activity_time'])
+        self.env.cr.execute("""
+            UPDATE productivity_task t
+            SET activity_count = COALESCE(t.activity_count, 0) + d.activities,
+                app_usage_count = COALESCE(t.app_usage_count, 0) + d.app_usages,
+                restricted_app_minutes = COALESCE(t.restricted_app_minutes, 0) + d.restricted_minutes,
+                last_activity_time = GREATEST(t.last_activity_time, d.last_activity_time),
+                write_uid = %s,
+                write_date = NOW() AT TIME ZONE 'UTC'
+            FROM unnest(%s::int[], %s::int[], %s::int[], %s::float8[], %s::timestamp[])
+                AS d(id, activities, app_usages, restricted_minutes, last_activity_time)
+            WHERE t.id = d.id
+        """, [self.env.uid, task_ids] + [[deltas[task_id][position] for task_id in task_ids] for position in range(4)])
+        self.invalidate_model(['activity_count', 'app_usage_count', 'restricted_app_minutes', 'last_activity_time',
+                               'write_uid', 'write_date'])
+
+    @api.model
+    def _recompute_log_counters(self, task_ids=None):
+        """Recount the log counters of the given tasks, or of all tasks, from the logs (install,
+        reclassification, retention)"""
+        if task_ids is not None and not task_ids:
+            return
+        self.env['activity.log'].flush_model()
+        self.env['app.usage.log'].flush_model()
+        self.env.cr.execute("""
+            WITH activities AS (
+                SELECT task_id, COUNT(*) AS n, MAX(start_time) AS last_time
+                FROM activity_log
+                WHERE %(task_ids)s::int[] IS NULL OR task_id = ANY(%(task_ids)s::int[])
+                GROUP BY task_id
+            ),
+            usages AS (
+                SELECT task_id, COUNT(*) AS n,
+                       COALESCE(SUM(duration) FILTER (WHERE is_restricted), 0) AS restricted_minutes,
+                       MAX(COALESCE(end_time, start_time)) AS last_time
+                FROM app_usage_log
+                WHERE %(task_ids)s::int[] IS NULL OR task_id = ANY(%(task_ids)s::int[])
+                GROUP BY task_id
+            )
+            UPDATE productivity_task t
+            SET activity_count = COALESCE(a.n, 0),
+                app_usage_count = COALESCE(u.n, 0),
+                restricted_app_minutes = COALESCE(u.restricted_minutes, 0),
+                last_activity_time = GREATEST(a.last_time, u.last_time),
+                write_uid = %(uid)s,
+                write_date = NOW() AT TIME ZONE 'UTC'
+            FROM productivity_task tt
+            LEFT JOIN activities a ON a.task_id = tt.id
+            LEFT JOIN usages u ON u.task_id = tt.id
+            WHERE t.id = tt.id
+            AND (%(task_ids)s::int[] IS NULL OR tt.id = ANY(%(task_ids)s::int[]))
+            AND (t.activity_count IS DISTINCT FROM COALESCE(a.n, 0)
+                 OR t.app_usage_count IS DISTINCT FROM COALESCE(u.n, 0)
+                 OR t.restricted_app_minutes IS DISTINCT FROM COALESCE(u.restricted_minutes, 0)
+                 OR t.last_activity_time IS DISTINCT FROM GREATEST(a.last_time, u.last_time))
+        """, {'task_ids': list(task_ids) if task_ids is not None else None, 'uid': self.env.uid})
+        self.invalidate_model(['activity_count', 'app_usage_count', 'restricted_app_minutes', 'last_activity_time',
+                               'write_uid', 'write_date'])
+
+    @api.model
+    def get_employee_active_task(self, employee):
+        """Get the running or paused task of an employee (served by productivity_task_employee_active_idx)"""
+        if not employee:
+            return self.browse()
+        return self.browse(self.sudo().search([
+            ('employee_id', '=', employee.id),
+            ('state', 'in', list(self.ACTIVE_STATES)),
+        ], limit=1).id)
+
+    @api.model_create_multi
+    def create(self, vals_list):
         """Override create to set employee from current user if not provided"""
-        if not vals.get('employee_id'):
-            employee = self.env['hr.employee'].search([
-                ('user_id', '=', self.env.user.id)
-            ], limit=1)
-            if employee:
-                vals['employee_id'] = employee.id
-        return super().create(vals)
+        employee = None
+        for vals in vals_list:
+            if not vals.get('employee_id'):
+                if employee is None:
+                    employee = self.env['hr.employee'].get_productivity_employee()
+                if employee:
+                    vals['employee_id'] = employee.id
+            # Tasks created already started (API, imports) open their first segment at start_time
+            if vals.get('start_time') and not vals.get('segment_start'):
+                vals['segment_start'] = vals['start_time']
+        tasks = super().create(vals_list)
+        self.env['productivity.dashboard']._mark_dirty(tasks.employee_id.ids)
+        deadlines = tasks._get_task_deadlines()
+        if deadlines:
+            self._schedule_next_deadline(min(deadlines))
+        return tasks
+
+    def write(self, vals):
+        employee_ids = self.employee_id.ids
+        result = super().write(vals)
+        self.env['productivity.dashboard']._mark_dirty(employee_ids + self.employee_id.ids)
+        # Pause, resume and idle keep the deadline: only a new start/stop time or a task
+        # put back to draft need a trigger
+        if {'start_time', 'stop_time'} & set(vals) or vals.get('state') == 'draft':
+            deadlines = self._get_task_deadlines()
+            if deadlines:
+                self._schedule_next_deadline(min(deadlines))
+        return result
+
+    def unlink(self):
+        employee_ids = self.employee_id.ids
+        result = super().unlink()
+        self.env['productivity.dashboard']._mark_dirty(employee_ids)
+        return result
@@ -0,0 +1,27 @@
+from odoo import models, fields, api
+import pytz
+
+
+class ProductivityWorkDateMixin(models.AbstractModel):
+    _name = 'productivity.work.date.mixin'
+    _description = 'Employee Local Work Date'
+
+    # Datetime fields the work date is taken from, first set one wins
+    _work_date_sources = ('start_time', 'create_date')
+
+    work_date = fields.Date(string='Work Date', compute='_compute_work_date', store=True, index=True,
+                            help='Day of the record in the timezone of the employee')
+
+    @api.depends(lambda self: list(self._work_date_sources) + ['employee_id.tz'])
+    def _compute_work_date(self):
+        """Compute the day of the record in the employee timezone"""
+        timezones = {}
+        for record in self:
+            moment = next((record[name] for name in self._work_date_sources if record[name]), False)
+            if not moment:
+                record.work_date = False
+                continue
+            tz_name = record.employee_id.tz or 'UTC'
+            if tz_name not in timezones:
+                timezones[tz_name] = pytz.timezone(tz_name)
+            record.work_date = pytz.utc.localize(moment).astimezone(timezones[tz_name]).date()
@@ -1,24 +1,77 @@
 /** @odoo-module **/
 
 import { registry } from "@web/core/registry";
-import { rpc } from "@web/core/network/rpc";
 
 /**
  * Activity Monitor Service
  * Monitors user activity, captures screenshots, and tracks application usage
  */
 export const activityMonitorService = {
-    dependencies: [],
+    dependencies: ["bus_service", "productivityTransport"],
 
-    start(env) {
+    start(env, { bus_service, productivityTransport }) {
         let activityCheckInterval = null;
         let currentTaskId = null;
-        let lastActiveWindow = null;
-        let currentAppUsageId = null;
-        let stopTimeCheckInterval = null; // For checking when to stop
-        let taskStopTime = null; // Store stop time
+        let lastActiveWindow = null; // application of the last sample
+        let lastActiveInfo = null;
+        let lastSampleTime = null;
 
         const ACTIVITY_CHECK_INTERVAL = 10 * 1000; // 10 seconds
+        const SAMPLE_KEEPALIVE = 60 * 1000; // must stay below the server session gap
+        const HEARTBEAT_INTERVAL = 60 * 1000; // must stay well below the idle timeout
+        const INPUT_REPORT_INTERVAL = 10 * 1000; // resolution of the input counters
+        const INPUT_EVENTS = ['keydown', 'mousedown', 'mousemove', 'wheel', 'touchstart'];
+        const MOUSE_COUNTED_EVENTS = ['mousedown', 'wheel', 'touchstart']; // mousemove only marks activity
+
+        let lastInputTime = null; // last keyboard/mouse input
+        let reportedInputTime = null; // last input already sent as heartbeat
+        let keyboardCount = 0;
+        let mouseCount = 0;
+
+        /**
+         * Remember the time of the last user input and count it
+         */
+        function onUserInput(ev) {
+            lastInputTime = Date.now();
+            if (ev.type === 'keydown') {
+                keyboardCount++;
+            } else if (MOUSE_COUNTED_EVENTS.includes(ev.type)) {
+                mouseCount++;
+            }
+        }
+
+        /**
+         * Send the input counts of the last interval; the server adds them to per-minute counters
+         */
+        function sendInputCounts() {
+            if (currentTaskId && activityCheckInterval && (keyboardCount || mouseCount)) {
+                productivityTransport.push({
+                    type: 'input',
+                    task_id: currentTaskId,
+                    keyboard_events: keyboardCount,
+                    mouse_events: mouseCount,
+                    timestamp: new Date().toISOString(),
+                });
+            }
+            keyboardCount = 0;
+            mouseCount = 0;
+        }
+
+        /**
+         * Report the last input time of the current task; the server pauses
+         * tasks without input (idle) and resumes them when input comes back
+         */
+        function sendHeartbeat() {
+            if (!currentTaskId || !lastInputTime || lastInputTime === reportedInputTime) {
+                return;
+            }
+            productivityTransport.push({
+                type: 'heartbeat',
+                task_id: currentTaskId,
+                timestamp: new Date(lastInputTime).toISOString(),
+            });
+            reportedInputTime = lastInputTime;
+        }
 
         /**
          * Detect current browser activity
@@ -70,41 +123,46 @@ export const activityMonitorService = {
             const activityInfo = await detectActivity();
             console.log('Current activity:', activityInfo);
             
-            // Check if window changed
-            const windowKey = `${activityInfo.application}:${activityInfo.title}`;
-            if (lastActiveWindow === windowKey) {
-                console.log('Same window, no need to log again');
+            // Only report changes, plus a keep-alive sample so the server keeps the session open
+            const now = new Date();
+            if (lastActiveWindow === activityInfo.application && now - lastSampleTime < SAMPLE_KEEPALIVE) {
+                console.log('Same application, no need to sample again');
                 return;
             }
 
-            // End previous app usage
-            if (currentAppUsageId) {
-                try {
-                    console.log('Ending previous app usage:', currentAppUsageId);
-                    await rpc('/api/productivity/end_app_usage/' + currentAppUsageId, {});
-                } catch (error) {
-                    console.error('Failed to end app usage:', error);
-                }
-            }
+            console.log('Sampling app usage:', activityInfo.application);
+            pushSample(activityInfo, now);
+        }
 
-            // Start new app usage
-            try {
-                console.log('Logging new app usage:', activityInfo.application);
-                const result = await rpc('/api/productivity/log_app_usage', {
-                    task_id: currentTaskId,
-                    app_name: activityInfo.application,
-                    app_path: activityInfo.url,
-                    window_title: activityInfo.title,
-                });
+        /**
+         * Queue an app sample; the server folds consecutive samples into one session
+         */
+        function pushSample(activityInfo, timestamp, final = false) {
+            productivityTransport.push({
+                type: 'app_sample',
+                task_id: currentTaskId,
+                app_name: activityInfo.application,
+                app_path: activityInfo.url,
+                window_title: activityInfo.title,
+                timestamp: timestamp.toISOString(),
+                final,
+            });
+            lastActiveWindow = activityInfo.application;
+            lastActiveInfo = activityInfo;
+            lastSampleTime = timestamp;
+        }
 
-                console.log('App usage log result:', result);
-                if (result.status === 'success') {
-                    currentAppUsageId = result.app_usage_id;
-                    lastActiveWindow = windowKey;
-                }
-            } catch (error) {
-                console.error('Failed to log app usage:', error);
+        /**
+         * Extend the current app usage session up to now, the next sample opens a new one
+         */
+        function endCurrentAppUsage() {
+            if (!currentTaskId || !lastActiveInfo) {
+                return;
             }
+            console.log('Ending current app usage:', lastActiveWindow);
+            pushSample(lastActiveInfo, new Date(), true);
+            lastActiveWindow = null;
+            lastActiveInfo = null;
         }
 
         /**
@@ -122,16 +180,10 @@ export const activityMonitorService = {
             }
 
             currentTaskId = taskId;
-            taskStopTime = stopTime;
+            lastInputTime = Date.now();
             
+            // The server stops the task at its stop time and pushes it on the bus
             console.log(`Activity monitoring started for task ${taskId}`);
-            if (taskStopTime) {
-                console.log('Will auto-stop monitoring at:', taskStopTime);
-                // Set up interval to check stop time every 10 seconds
-                stopTimeCheckInterval = setInterval(() => {
-                    checkStopTime();
-                }, 10000); // Check every 10 seconds
-            }
             
             // Set up activity check interval
             activityCheckInterval = setInterval(() => {
@@ -145,39 +197,29 @@ export const activityMonitorService = {
         }
 
         /**
-         * Check if stop time has been reached
+         * Follow a task for heartbeats and input counts only, app samples start with resumeMonitoring
          */
-        function checkStopTime() {
-            if (!taskStopTime) {
-                console.warn('checkStopTime called but taskStopTime is null');
+        function followTask(taskId) {
+            if (currentTaskId === taskId) {
                 return;
             }
-            
-            let stopDate;
-            if (typeof taskStopTime === 'string') {
-                stopDate = new Date(taskStopTime.replace(' ', 'T') + 'Z');
-            } else if (taskStopTime instanceof Date) {
-                stopDate = taskStopTime;
-            } else if (taskStopTime.ts) {
-                stopDate = new Date(taskStopTime.ts);
-            } else if (typeof taskStopTime === 'object' && taskStopTime !== null) {
-                // Handle DateTime-like objects
-                console.warn('taskStopTime is object but not recognized format:', taskStopTime);
-                return;
-            } else {
-                console.error('Unknown taskStopTime format:', typeof taskStopTime, taskStopTime);
+            stopMonitoring(false);
+            currentTaskId = taskId;
+        }
+
+        /**
+         * Task paused or stopped on the server (scheduler, restricted app, another tab)
+         */
+        function onTimerNotification(payload) {
+            if (!currentTaskId || payload.task_id !== currentTaskId) {
                 return;
             }
-            
-            const now = new Date();
-            const secondsRemaining = Math.floor((stopDate - now) / 1000);
-            
-            console.log('Stop time check - Time remaining:', secondsRemaining, 'seconds');
-            
-            if (secondsRemaining <= 0) {
-                console.log('=== STOP TIME REACHED - AUTO STOPPING MONITORING ===');
+            if (payload.event === 'stop') {
+                console.log('=== TASK STOPPED - STOPPING MONITORING ===');
                 // Don't reset permissions - user may reload the page after stop time
                 stopMonitoring(false);
+            } else if (payload.event === 'pause') {
+                pauseMonitoring();
             }
         }
 
@@ -195,22 +237,10 @@ export const activityMonitorService = {
                 activityCheckInterval = null;
             }
             
-            if (stopTimeCheckInterval) {
-                console.log('Clearing stop time check interval');
-                clearInterval(stopTimeCheckInterval);
-                stopTimeCheckInterval = null;
-            }
-
             // End current app usage
-            if (currentAppUsageId) {
-                console.log('Ending current app usage:', currentAppUsageId);
-                rpc('/api/productivity/end_app_usage/' + currentAppUsageId, {})
-                    .catch(error => console.error('Failed to end app usage:', error));
-                currentAppUsageId = null;
-            }
+            endCurrentAppUsage();
             
             currentTaskId = null;
-            taskStopTime = null;
             lastActiveWindow = null;
             
             console.log('Activity monitoring stopped');
@@ -226,48 +256,26 @@ export const activityMonitorService = {
                 clearInterval(activityCheckInterval);
                 activityCheckInterval = null;
             }
-            
-            // Note: Keep stopTimeCheckInterval running so auto-stop still works when paused
 
             // End current app usage
-            if (currentAppUsageId) {
-                rpc('/api/productivity/end_app_usage/' + currentAppUsageId, {})
-                    .catch(error => console.error('Failed to end app usage:', error));
-                currentAppUsageId = null;
-            }
+            endCurrentAppUsage();
         }
 
         /**
          * Resume monitoring (when user returns to Odoo)
          */
         function resumeMonitoring(stopTime = null) {
-            console.log('Resuming activity monitoring with stop time:', stopTime);
+            console.log('Resuming activity monitoring');
             
             // Note: currentTaskId might not be set if this is called from page reload
             // The monitoring will still work with intervals
 
-            // Update stop time if provided
-            if (stopTime) {
-                if (typeof stopTime === 'string') {
-                    taskStopTime = new Date(stopTime.replace(' ', 'T') + 'Z');
-                } else if (stopTime && stopTime.ts) {
-                    taskStopTime = new Date(stopTime.ts);
-                } else {
-                    taskStopTime = stopTime;
-                }
-                console.log('Updated task stop time on resume:', taskStopTime?.toISOString());
+            // Restart activity interval
+            if (activityCheckInterval) {
+                clearInterval(activityCheckInterval);
             }
-
-            // Restart screenshot and activity intervals
-            screenshotInterval = setInterval(captureScreenshot, SCREENSHOT_INTERVAL);
             activityCheckInterval = setInterval(logAppUsage, ACTIVITY_CHECK_INTERVAL);
             
-            // Restart stop time check interval if we have a stop time
-            if (taskStopTime) {
-                console.log('Restarting stop time check interval on resume');
-                stopTimeCheckInterval = setInterval(() => checkStopTime(), 10000);
-            }
-            
             // Immediate activity check
             logAppUsage();
         }
@@ -279,15 +287,33 @@ export const activityMonitorService = {
             return currentTaskId !== null;
         }
 
+        /**
+         * Check if app samples are being taken (monitoring and not paused)
+         */
+        function isSampling() {
+            return currentTaskId !== null && activityCheckInterval !== null;
+        }
+
         const serviceAPI = {
             startMonitoring,
+            followTask,
             stopMonitoring,
             pauseMonitoring,
             resumeMonitoring,
             isMonitoring,
+            isSampling,
             detectActivity,
         };
 
+        bus_service.subscribe('productivity.timer', onTimerNotification);
+
+        // Heartbeats keep going while paused, so input after an idle pause resumes the task
+        for (const eventName of INPUT_EVENTS) {
+            window.addEventListener(eventName, onUserInput, { passive: true, capture: true });
+        }
+        setInterval(sendHeartbeat, HEARTBEAT_INTERVAL);
+        setInterval(sendInputCounts, INPUT_REPORT_INTERVAL);
+
         // Export globally for timer widget access
         window.activityMonitorService = serviceAPI;
 
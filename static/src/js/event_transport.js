@@ -0,0 +1,192 @@
+/** @odoo-module **/
+
+import { registry } from "@web/core/registry";
+import { rpc } from "@web/core/network/rpc";
+
+/**
+ * Productivity Event Transport Service
+ * Buffers tracker events and sends them to /api/productivity/ingest in batches.
+ * Unsent events are kept in localStorage so they survive reloads and network
+ * failures; every event carries a client_event_id so replays are deduplicated
+ * by the server.
+ */
+export const productivityTransportService = {
+    dependencies: [],
+
+    start(env) {
+        const INGEST_URL = '/api/productivity/ingest';
+        const STORAGE_PREFIX = 'employee_productivity_tracker.event_queue.';
+        const MAX_BATCH_SIZE = 50;
+        const MAX_QUEUE_SIZE = 5000;
+        const MAX_FAILED_ATTEMPTS = 5;
+        const FLUSH_INTERVAL = 30 * 1000; // 30 seconds
+
+        const tabId = newEventId();
+        const storageKey = STORAGE_PREFIX + tabId;
+        let queue = adoptStoredQueues();
+        let inflight = null;
+        let failedAttempts = 0;
+        const beaconed = new Set(); // client_event_ids already handed to a beacon
+
+        /**
+         * Generate a unique id used as idempotency key
+         */
+        function newEventId() {
+            if (window.crypto && window.crypto.randomUUID) {
+                return window.crypto.randomUUID();
+            }
+            return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+        }
+
+        /**
+         * Collect events left behind by previous page loads (or closed tabs)
+         */
+        function adoptStoredQueues() {
+            const events = [];
+            try {
+                for (const key of Object.keys(window.localStorage)) {
+                    if (!key.startsWith(STORAGE_PREFIX)) {
+                        continue;
+                    }
+                    events.push(...JSON.parse(window.localStorage.getItem(key) || '[]'));
+                    window.localStorage.removeItem(key);
+                }
+            } catch (error) {
+                console.error('Failed to restore queued productivity events:', error);
+            }
+            events.sort((a, b) => (a.timestamp < b.timestamp ? -1 : a.timestamp > b.timestamp ? 1 : 0));
+            return events.slice(-MAX_QUEUE_SIZE);
+        }
+
+        function persist() {
+            try {
+                if (queue.length) {
+                    window.localStorage.setItem(storageKey, JSON.stringify(queue));
+                } else {
+                    window.localStorage.removeItem(storageKey);
+                }
+            } catch (error) {
+                console.error('Failed to persist productivity events:', error);
+            }
+        }
+
+        /**
+         * Queue an event, returns its client_event_id
+         */
+        function push(event) {
+            const queued = {
+                ...event,
+                client_event_id: event.client_event_id || newEventId(),
+                timestamp: event.timestamp || new Date().toISOString(),
+            };
+            queue.push(queued);
+            if (queue.length > MAX_QUEUE_SIZE) {
+                console.warn('Productivity event queue full, dropping oldest events');
+                for (const dropped of queue.splice(0, queue.length - MAX_QUEUE_SIZE)) {
+                    beaconed.delete(dropped.client_event_id);
+                }
+            }
+            persist();
+
+            if (document.visibilityState === 'hidden') {
+                // The page may never become visible again
+                flushWithBeacon();
+            } else if (queue.length >= MAX_BATCH_SIZE) {
+                flush();
+            }
+            return queued.client_event_id;
+        }
+
+        /**
+         * Send queued events in batches; resolves once the queue is drained or a batch failed
+         */
+        function flush() {
+            if (inflight) {
+                return inflight;
+            }
+            if (!queue.length) {
+                return Promise.resolve();
+            }
+            inflight = (async () => {
+                while (queue.length) {
+                    const batch = queue.slice(0, MAX_BATCH_SIZE);
+                    try {
+                        const result = await rpc(INGEST_URL, { events: batch });
+                        if (result.status !== 'success') {
+                            throw new Error(result.message);
+                        }
+                        failedAttempts = 0;
+                    } catch (error) {
+                        failedAttempts += 1;
+                        console.error('Failed to send productivity events:', error);
+                        if (failedAttempts < MAX_FAILED_ATTEMPTS) {
+                            break;
+                        }
+                        console.error('Dropping productivity event batch after repeated failures');
+                        failedAttempts = 0;
+                    }
+                    // Events pushed meanwhile are appended, so the batch is still the queue prefix
+                    queue.splice(0, batch.length);
+                    for (const event of batch) {
+                        beaconed.delete(event.client_event_id);
+                    }
+                    persist();
+                }
+            })().finally(() => {
+                inflight = null;
+            });
+            return inflight;
+        }
+
+        /**
+         * Hand the events not beaconed yet to the browser while the page is being
+         * hidden or unloaded. Events stay queued: if the beacon is lost they are
+         * replayed by the next flush and the server drops the ones it already stored.
+         */
+        function flushWithBeacon() {
+            if (!navigator.sendBeacon) {
+                return;
+            }
+            const events = queue.filter((event) => !beaconed.has(event.client_event_id)).slice(0, MAX_BATCH_SIZE * 4);
+            if (!events.length) {
+                return;
+            }
+            const body = JSON.stringify({
+                jsonrpc: '2.0',
+                method: 'call',
+                params: { events },
+            });
+            if (navigator.sendBeacon(INGEST_URL, new Blob([body], { type: 'application/json' }))) {
+                for (const event of events) {
+                    beaconed.add(event.client_event_id);
+                }
+            }
+        }
+
+        function pendingCount() {
+            return queue.length;
+        }
+
+        setInterval(flush, FLUSH_INTERVAL);
+        document.addEventListener('visibilitychange', () => {
+            if (document.visibilityState === 'hidden') {
+                flushWithBeacon();
+            }
+        });
+        window.addEventListener('pagehide', flushWithBeacon);
+        window.addEventListener('online', () => flush());
+
+        // Replay whatever was left over from a previous page load
+        persist();
+        flush();
+
+        return {
+            push,
+            flush,
+            newEventId,
+            pendingCount,
+        };
+    },
+};
+
+registry.category("services").add("productivityTransport", productivityTransportService);
@@ -1,140 +1,117 @@
 /** @odoo-module **/
 
 import { registry } from "@web/core/registry";
+import { rpc } from "@web/core/network/rpc";
 
 /**
  * Scheduled Timer Service
- * Handles automatic timer start/stop based on scheduled times
+ * Follows the timer state pushed on the bus, shows the timers started/stopped by the server-side scheduler
  * Detects window blur/focus to track time spent on other apps
  */
 export const scheduledTimerService = {
-    dependencies: ["activityMonitor"],
+    dependencies: ["bus_service", "notification", "activityMonitor", "productivityTransport"],
 
-    start(env, { activityMonitor }) {
-        const rpc = env.services.rpc;
-        const notification = env.services.notification;
-        
-        let checkInterval = null;
+    start(env, { bus_service, notification, activityMonitor, productivityTransport }) {
         let activeTasks = new Map(); // taskId -> task data
         let currentActiveTask = null;
         let windowBlurTime = null;
         let isWindowFocused = true;
+        let samplingPausedOnBlur = false;
 
         /**
-         * Check all scheduled tasks and start/stop as needed
+         * Timer state pushed by the server on every transition of the user's tasks
          */
-        async function checkScheduledTasks() {
-            try {
-                const now = new Date();
-                
-                // Fetch all draft and running tasks
-                const tasks = await rpc('/web/dataset/search_read', {
-                    model: 'productivity.task',
-                    domain: [['state', 'in', ['draft', 'running', 'paused']]],
-                    fields: ['id', 'name', 'state', 'start_time', 'stop_time', 'employee_id'],
-                });
-
-                for (const task of tasks) {
-                    const startTime = task.start_time ? new Date(task.start_time) : null;
-                    const stopTime = task.stop_time ? new Date(task.stop_time) : null;
-
-                    // Check if task should start
-                    if (task.state === 'draft' && startTime && now >= startTime) {
-                        await startTaskTimer(task);
-                    }
-
-                    // Check if task should stop
-                    if (task.state === 'running' && stopTime && now >= stopTime) {
-                        await stopTaskTimer(task);
-                    }
+        async function onTimerNotification(payload) {
+            if (payload.event === 'start' && payload.auto) {
+                await onTaskStarted(payload);
+            } else if (payload.event === 'stop') {
+                onTaskStopped(payload);
+            } else if (payload.state === 'running') {
+                // Started or resumed from a form or by input after an idle pause:
+                // the away tracking and the activity monitor follow that task
+                activeTasks.set(payload.task_id, payload);
+                currentActiveTask = payload.task_id;
+                monitorTask(payload);
+            } else if (payload.event === 'pause') {
+                // A paused task is not sampled again when the window gets the focus back
+                samplingPausedOnBlur = false;
+            }
+        }
 
-                    // Keep track of running tasks
-                    if (task.state === 'running') {
-                        activeTasks.set(task.id, task);
-                        if (!currentActiveTask) {
-                            currentActiveTask = task.id;
-                        }
-                    }
-                }
-            } catch (error) {
-                console.error('Error checking scheduled tasks:', error);
+        /**
+         * Send heartbeats for the user's running or paused task, and app samples while it runs
+         * and the window has the focus
+         */
+        function monitorTask(task) {
+            activityMonitor.followTask(task.task_id);
+            if (task.state !== 'running' || activityMonitor.isSampling()) {
+                return;
+            }
+            if (isWindowFocused) {
+                activityMonitor.resumeMonitoring();
+            } else {
+                samplingPausedOnBlur = true;
             }
         }
 
         /**
-         * Start a task timer automatically
+         * A scheduled task was started on the server
          */
-        async function startTaskTimer(task) {
-            try {
-                await rpc('/web/dataset/call_button', {
-                    model: 'productivity.task',
-                    method: 'action_start_timer',
-                    args: [[task.id]],
-                });
-
-                activeTasks.set(task.id, task);
-                currentActiveTask = task.id;
-
-                // Show notification popup
-                notification.add(
-                    `Timer Started: ${task.name}`,
-                    {
-                        title: 'Productivity Tracker',
-                        type: 'success',
-                        sticky: false,
-                        className: 'o_timer_notification',
-                    }
-                );
+        async function onTaskStarted(task) {
+            activeTasks.set(task.task_id, task);
+            currentActiveTask = task.task_id;
+
+            // Show notification popup
+            notification.add(
+                `Timer Started: ${task.name}`,
+                {
+                    title: 'Productivity Tracker',
+                    type: 'success',
+                    sticky: false,
+                    className: 'o_timer_notification',
+                }
+            );
 
-                console.log(`Timer auto-started for task: ${task.name} (ID: ${task.id})`);
+            console.log(`Timer auto-started for task: ${task.name} (ID: ${task.task_id})`);
 
-                // Start activity monitoring
-                console.log('Starting activity monitor for task:', task.id);
-                await activityMonitor.startMonitoring(task.id);
+            // Start activity monitoring
+            console.log('Starting activity monitor for task:', task.task_id);
+            await activityMonitor.startMonitoring(task.task_id);
 
-                // Show real-time popup
-                showTimerPopup(task);
-            } catch (error) {
-                console.error('Error starting task timer:', error);
-            }
+            // Show real-time popup
+            showTimerPopup(task);
         }
 
         /**
-         * Stop a task timer automatically
+         * A scheduled task was stopped on the server
          */
-        async function stopTaskTimer(task) {
-            try {
-                await rpc('/web/dataset/call_button', {
-                    model: 'productivity.task',
-                    method: 'action_stop_timer',
-                    args: [[task.id]],
-                });
-
-                activeTasks.delete(task.id);
-                if (currentActiveTask === task.id) {
-                    currentActiveTask = null;
-                }
+        function onTaskStopped(task) {
+            activeTasks.delete(task.task_id);
+            if (currentActiveTask !== task.task_id) {
+                return;
+            }
+            currentActiveTask = null;
+            if (!task.auto) {
+                return;
+            }
 
-                // Stop activity monitoring
-                console.log('Stopping activity monitor');
-                activityMonitor.stopMonitoring();
+            // Stop activity monitoring
+            console.log('Stopping activity monitor');
+            activityMonitor.stopMonitoring();
 
-                notification.add(
-                    `Timer Stopped: ${task.name}`,
-                    {
-                        title: 'Productivity Tracker',
-                        type: 'info',
-                        sticky: false,
-                    }
-                );
+            notification.add(
+                `Timer Stopped: ${task.name}`,
+                {
+                    title: 'Productivity Tracker',
+                    type: 'info',
+                    sticky: false,
+                }
+            );
 
-                console.log(`Timer auto-stopped for task: ${task.name} (ID: ${task.id})`);
+            console.log(`Timer auto-stopped for task: ${task.name} (ID: ${task.task_id})`);
 
-                // Hide popup
-                hideTimerPopup();
-            } catch (error) {
-                console.error('Error stopping task timer:', error);
-            }
+            // Hide popup
+            hideTimerPopup();
         }
 
         /**
@@ -174,7 +151,7 @@ export const scheduledTimerService = {
             const display = document.getElementById('popup-timer-display');
             if (!display) return;
 
-            const startTime = new Date(task.start_time);
+            const startTime = new Date(task.start_time.replace(' ', 'T') + 'Z');
             const updateDisplay = () => {
                 const now = new Date();
                 const elapsed = Math.floor((now - startTime) / 1000);
@@ -210,50 +187,24 @@ export const scheduledTimerService = {
         /**
          * Handle window blur (user switched away)
          */
-        async function handleWindowBlur() {
+        function handleWindowBlur() {
             if (!isWindowFocused) return; // Already blurred
             
             isWindowFocused = false;
             windowBlurTime = new Date();
-
-            // Capture current page info before user leaves
-            const currentPage = {
-                title: document.title,
-                url: window.location.href,
-                timestamp: windowBlurTime.toISOString()
-            };
-
             console.log('User switched away from Odoo at:', windowBlurTime);
-            console.log('Last known location:', currentPage);
-
-            // Pause current task if running
-            if (currentActiveTask) {
-                try {
-                    await rpc('/web/dataset/call_button', {
-                        model: 'productivity.task',
-                        method: 'action_pause_timer',
-                        args: [[currentActiveTask]],
-                    });
 
-                    // Log that user left Odoo
-                    await rpc('/api/productivity/log_app_usage', {
-                        task_id: currentActiveTask,
-                        app_name: 'Away from Odoo',
-                        app_path: 'External Application',
-                        window_title: `Left Odoo at ${windowBlurTime.toLocaleTimeString()}`,
-                    });
-
-                    console.log(`Task ${currentActiveTask} paused due to window blur`);
-                } catch (error) {
-                    console.error('Error pausing task:', error);
-                }
+            // The away period is recorded on return, stop extending the browser session meanwhile
+            if (activityMonitor.isSampling()) {
+                activityMonitor.pauseMonitoring();
+                samplingPausedOnBlur = true;
             }
         }
 
         /**
          * Handle window focus (user returned)
          */
-        async function handleWindowFocus() {
+        function handleWindowFocus() {
             if (isWindowFocused) return; // Already focused
             
             isWindowFocused = true;
@@ -263,46 +214,54 @@ export const scheduledTimerService = {
                 const timeAway = Math.floor((returnTime - windowBlurTime) / 1000); // seconds
                 console.log(`User returned to Odoo. Time away: ${timeAway} seconds`);
 
-                // Log the away time
+                // One queued event records the pause, the away app usage and the resume;
+                // the server merges rapid blur/focus flapping into a single away period
                 if (currentActiveTask && timeAway > 0) {
-                    try {
-                        // Get active window title (browser tab title when user left)
-                        const awayApp = document.title || 'Unknown Application';
-                        
-                        await rpc('/api/productivity/log_away_time', {
-                            task_id: currentActiveTask,
-                            away_start: windowBlurTime.toISOString(),
-                            away_end: returnTime.toISOString(),
-                            duration_seconds: timeAway,
-                            application_name: awayApp,
-                        });
-
-                        console.log(`Logged away time: ${timeAway}s on ${awayApp}`);
-
-                        // Resume task
-                        await rpc('/web/dataset/call_button', {
-                            model: 'productivity.task',
-                            method: 'action_resume_timer',
-                            args: [[currentActiveTask]],
-                        });
-
-                        console.log(`Task ${currentActiveTask} resumed`);
-                    } catch (error) {
-                        console.error('Error logging away time:', error);
-                    }
+                    productivityTransport.push({
+                        type: 'away',
+                        task_id: currentActiveTask,
+                        away_start: windowBlurTime.toISOString(),
+                        away_end: returnTime.toISOString(),
+                        application_name: document.title || 'Unknown Application',
+                        timestamp: returnTime.toISOString(),
+                    });
                 }
 
                 windowBlurTime = null;
             }
+
+            if (samplingPausedOnBlur) {
+                samplingPausedOnBlur = false;
+                if (activityMonitor.isMonitoring()) {
+                    activityMonitor.resumeMonitoring();
+                }
+            }
+        }
+
+        /**
+         * Pick up the task already running or paused when the page is loaded, later changes come from the bus
+         */
+        async function loadActiveTask() {
+            try {
+                const result = await rpc('/api/productivity/get_employee_active_task', {});
+                if (result.status === 'success' && result.task_id && !currentActiveTask) {
+                    if (result.state === 'running') {
+                        activeTasks.set(result.task_id, result);
+                        currentActiveTask = result.task_id;
+                    }
+                    monitorTask({ task_id: result.task_id, state: result.state });
+                }
+            } catch (error) {
+                console.error('Error loading the active task:', error);
+            }
         }
 
         /**
          * Initialize service
          */
         function initialize() {
-            // Check tasks every 10 seconds
-            checkInterval = setInterval(checkScheduledTasks, 10000);
-            checkScheduledTasks(); // Initial check
+            // Scheduled starts/stops are run by the server and pushed to this tab
+            bus_service.subscribe('productivity.timer', onTimerNotification);
 
             // Listen for window blur/focus events
             window.addEventListener('blur', handleWindowBlur);
@@ -317,6 +276,8 @@ export const scheduledTimerService = {
                 }
             });
 
+            loadActiveTask();
+
             console.log('Scheduled Timer Service initialized');
         }
 
@@ -324,9 +285,7 @@ export const scheduledTimerService = {
          * Cleanup
          */
         function cleanup() {
-            if (checkInterval) {
-                clearInterval(checkInterval);
-            }
+            bus_service.unsubscribe('productivity.timer', onTimerNotification);
             window.removeEventListener('blur', handleWindowBlur);
             window.removeEventListener('focus', handleWindowFocus);
         }
@@ -335,9 +294,6 @@ export const scheduledTimerService = {
         initialize();
 
         return {
-            checkScheduledTasks,
-            startTaskTimer,
-            stopTaskTimer,
             cleanup,
         };
     },
@@ -0,0 +1,182 @@
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import psycopg2
+
+from odoo import fields
+from odoo.sql_db import Cursor
+from odoo.tests import tagged
+from odoo.tests.common import TransactionCase
+from odoo.tools import SQL
+
+from odoo.addons.employee_productivity_tracker.controllers.main import EXPORT_SHEETS
+
+
+@tagged('post_install', '-at_install')
+class TestQueryPlans(TransactionCase):
+    """The queries run by the module must keep using the indexes declared for them"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.employees = cls.env['hr.employee'].create([{'name': f'Plan Employee {i}'} for i in range(5)])
+        start = datetime(2026, 1, 5, 8, 0)
+        task_vals = []
+        for employee in cls.employees:
+            for day in range(20):
+                task_start = start + timedelta(days=day)
+                task_vals.append({
+                    'name': f'Task {employee.id}-{day}',
+                    'employee_id': employee.id,
+                    'state': 'completed',
+                    'start_time': task_start,
+                    'stop_time': task_start + timedelta(hours=8),
+                })
+        cls.tasks = cls.env['productivity.task'].create(task_vals)
+        cls.task = cls.tasks[0]
+        cls.employee = cls.task.employee_id
+        cls.work_date = cls.task.work_date
+
+        activity_vals, usage_vals = [], []
+        for task in cls.tasks:
+            for hour in range(8):
+                moment = task.start_time + timedelta(hours=hour)
+                activity_vals += [{
+                    'task_id': task.id,
+                    'employee_id': task.employee_id.id,
+                    'activity_type': 'pause',
+                    'start_time': moment,
+                    'end_time': moment + timedelta(minutes=10),
+                }, {
+                    'task_id': task.id,
+                    'employee_id': task.employee_id.id,
+                    'activity_type': 'resume',
+                    'start_time': moment + timedelta(minutes=10),
+                }]
+                usage_vals.append({
+                    'task_id': task.id,
+                    'employee_id': task.employee_id.id,
+                    'app_name': 'Editor',
+                    'start_time': moment,
+                    'end_time': moment + timedelta(minutes=50),
+                })
+        cls.env['activity.log'].create(activity_vals)
+        cls.env['app.usage.log'].create(usage_vals)
+        cls.env['productivity.report'].create([{
+            'employee_id': task.employee_id.id,
+            'period_start': task.work_date,
+            'period_end': task.work_date,
+            'report_type': 'daily',
+        } for task in cls.tasks])
+        cls.env.flush_all()
+        for table in ('productivity_task', 'activity_log', 'app_usage_log', 'productivity_report'):
+            cls.env.cr.execute(SQL("ANALYZE %s", SQL.identifier(table)))
+
+    def setUp(self):
+        super().setUp()
+        # The synthetic tables are small enough for a sequential scan to win on cost, only
+        # the choice between the indexes is checked
+        self.env.cr.execute("SET LOCAL enable_seqscan = off")
+
+    @contextmanager
+    def capture_queries(self):
+        """Collect the ``(query, params)`` run on the test cursor"""
+        queries = []
+        execute = Cursor.execute
+        test_cr = self.env.cr
+
+        def capturing_execute(cr, query, params=None, *args, **kwargs):
+            if cr is test_cr:
+                queries.append((query.code, query.params) if isinstance(query, SQL) else (query, params))
+            return execute(cr, query, params, *args, **kwargs)
+
+        with patch.object(Cursor, 'execute', capturing_execute):
+            yield queries
+
+    def assertIndexUsed(self, queries, table, index_name):
+        """One of the captured queries reading ``table`` is planned with ``index_name``"""
+        plans = []
+        for query, params in queries:
+            if table not in query or query.lstrip().upper().startswith(('EXPLAIN', 'SAVEPOINT', 'RELEASE', 'SET')):
+                continue
+            try:
+                with self.env.cr.savepoint(flush=False):
+                    self.env.cr.execute(f"EXPLAIN {query}", params)
+            except psycopg2.Error:
+                # Not a single explainable statement
+                continue
+            plan = '\n'.join(row[0] for row in self.env.cr.fetchall())
+            if index_name in plan:
+                return
+            plans.append(plan)
+        self.fail(f"No query on {table} uses {index_name}:\n\n" + '\n\n'.join(plans))
+
+    def test_active_task(self):
+        with self.capture_queries() as queries:
+            self.env['productivity.task'].get_employee_active_task(self.employee)
+        self.assertIndexUsed(queries, 'productivity_task', 'productivity_task_employee_active_idx')
+
+    def test_scheduler_deadlines(self):
+        with self.capture_queries() as queries:
+            self.env['productivity.task']._cron_run_scheduled_timers(auto_commit=False)
+        self.assertIndexUsed(queries, 'productivity_task', 'productivity_task_scheduled_start_idx')
+        self.assertIndexUsed(queries, 'productivity_task', 'productivity_task_active_stop_idx')
+
+    def test_idle_detection(self):
+        with self.capture_queries() as queries:
+            self.env['productivity.task']._cron_detect_idle()
+        self.assertIndexUsed(queries, 'productivity_task', 'productivity_task_running_heartbeat_idx')
+
+    def test_open_activity_rows(self):
+        now = fields.Datetime.now()
+        with self.capture_queries() as queries:
+            self.task._close_open_logs('pause', now)
+        self.assertIndexUsed(queries, 'activity_log', 'activity_log_open_pause_idx')
+        with self.capture_queries() as queries:
+            self.task._close_open_logs('idle_detected', now)
+        self.assertIndexUsed(queries, 'activity_log', 'activity_log_task_type_start_idx')
+
+    def test_app_sessions(self):
+        with self.capture_queries() as queries:
+            self.env['app.usage.log'].record_app_samples([{
+                'task': self.task,
+                'app_name': 'Editor',
+                'app_path': False,
+                'window_title': False,
+                'timestamp': self.task.stop_time,
+                'final': False,
+            }])
+        self.assertIndexUsed(queries, 'app_usage_log', 'app_usage_log_task_start_idx')
+
+    def test_app_usage_analytics(self):
+        with self.capture_queries() as queries:
+            self.env['app.usage.log'].get_app_usage_analytics(
+                self.work_date, self.work_date, employee_ids=self.employee.ids, bucket='hour')
+        self.assertIndexUsed(queries, 'app_usage_log', 'app_usage_log_employee_work_date_idx')
+
+    def test_report_lookup(self):
+        with self.capture_queries() as queries:
+            self.env['productivity.report'].generate_report(self.employee.id, self.work_date, self.work_date)
+        self.assertIndexUsed(queries, 'productivity_report', 'productivity_report_employee_period_idx')
+
+    def test_report_metrics(self):
+        with self.capture_queries() as queries:
+            self.env['productivity.report']._read_period_metrics({(self.employee.id, self.work_date, self.work_date): 1})
+        self.assertIndexUsed(queries, 'productivity_task', 'productivity_task_employee_work_date_idx')
+
+    def test_export_sheets(self):
+        params = {
+            'employee_ids': self.employee.ids,
+            'date_from': self.work_date,
+            'date_to': self.work_date + timedelta(days=6),
+            'last_id': 0,
+            'limit': 500,
+        }
+        expected = {
+            'productivity_task': 'productivity_task_employee_work_date_idx',
+            'app_usage_log': 'app_usage_log_employee_work_date_idx',
+            'activity_log': 'activity_log_employee_work_date_idx',
+        }
+        for (__, __, query), (table, index_name) in zip(EXPORT_SHEETS, expected.items()):
+            self.assertIndexUsed([(query, params)], table, index_name)